@@ -1,6 +1,5 @@
 
 from flask import Flask, render_template, Response, request, send_file, jsonify
-import cv2
 import os
 os.environ['CUDA_VISIBLE_DEVICES'] = '-1'
 import numpy as np
@@ -8,8 +7,18 @@ import pandas as pd
 import glob 
 import json 
 
-from utils.query_processing import Translation
-from utils.faiss import Myfaiss
+# SEARCH_SERVER=unix:/tmp/myfaiss.sock: use the shared search_server.py instead of loading CLIP + index here
+SEARCH_SERVER = os.getenv("SEARCH_SERVER")
+if SEARCH_SERVER:
+    from utils.search_client import SearchClient
+else:
+    from utils.query_processing import Translation
+    from utils.faiss import Myfaiss
+    from utils.query_cache import QueryCache
+from utils.frame_render import FrameRenderer
+from utils.path_table import PathTable
+from utils.video_catalog import VideoCatalog
+from utils.keyframe_index import KeyframeIndex
 
 # http://0.0.0.0:5001/home?index=0
 
@@ -27,7 +36,26 @@ for key, value in json_dict.items():
 
 LenDictPath = len(DictImagePath)
 bin_file='faiss_normal_ViT.bin'
-MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32")
+# FAISS_LOAD_MODE=mmap: map the index read-only so every worker shares one page-cache copy
+if SEARCH_SERVER:
+    MyFaiss = SearchClient(SEARCH_SERVER)
+else:
+    MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32",
+                      load_mode=os.getenv("FAISS_LOAD_MODE", "mmap"),
+                      query_cache=QueryCache(os.getenv("QUERY_CACHE_PATH", "query_cache.sqlite3"), namespace="ViT-B/32"))
+# Annotated frames for /get_img: LRU of encoded JPEGs + bounded render pool
+Renderer = FrameRenderer(max_bytes=int(os.getenv("FRAME_CACHE_MB", "128")) * 1024 * 1024,
+                         max_workers=int(os.getenv("FRAME_RENDER_WORKERS", "4")))
+# Keyframe -> (frame index, seconds) for /get_time and /map; fps comes from the videos in VIDEO_FOLDER (comma separated)
+VIDEO_FOLDERS = [folder.strip() for folder in os.getenv("VIDEO_FOLDER", "").split(',') if folder.strip()]
+Videos = None
+if VIDEO_FOLDERS:
+    Videos = VideoCatalog(VIDEO_FOLDERS, cache_path=os.getenv("VIDEO_CATALOG_PATH", "video_catalog.json"))
+    Videos.refresh()
+Keyframes = KeyframeIndex.load_or_build(os.getenv("KEYFRAME_INDEX_PATH", "keyframe_index.npz"),
+                                        PathTable.from_dict(json_dict), Videos,
+                                        os.getenv("KEYFRAME_MAP_DIR", "map-keyframes"),
+                                        os.path.getmtime('image_path.json'))
 ########################
 
 @app.route('/home')
@@ -111,28 +139,39 @@ def text_search():
 def get_img():
     # print("get_img")
     fpath = request.args.get('fpath')
-    # fpath = fpath
-    list_image_name = fpath.split("/")
-    image_name = "/".join(list_image_name[-2:])
-
-    if os.path.exists(fpath):
-        img = cv2.imread(fpath)
-    else:
-        print("load 404.jph")
-        img = cv2.imread("./static/images/404.jpg")
-
-    img = cv2.resize(img, (1280,720))
-
-    # print(img.shape)
-    img = cv2.putText(img, image_name, (30, 80), cv2.FONT_HERSHEY_SIMPLEX, 
-                   3, (255, 0, 0), 4, cv2.LINE_AA)
-
-    ret, jpeg = cv2.imencode('.jpg', img)
-    return  Response((b'--frame\r\n'
-                     b'Content-Type: image/jpeg\r\n\r\n' + jpeg.tobytes() + b'\r\n\r\n'),
-                    mimetype='multipart/x-mixed-replace; boundary=frame')
-
-
+    # width / quality (optional) trade sharpness for bytes on the wire
+    width = request.args.get('width', 1280, type=int)
+    quality = request.args.get('quality', 95, type=int)
+
+    jpeg = Renderer.render(fpath, width=width, quality=quality)
+    if jpeg is None:
+        return Response("Image not found", status=404)
+    return Response(jpeg, mimetype='image/jpeg', headers={'Cache-Control': 'public, max-age=3600'})
+
+
+def keyframe_info(field):
+    video = request.args.get('video')
+    try:
+        image_id = Keyframes.find(video, int(request.args.get('id')))
+    except (TypeError, ValueError):
+        image_id = None
+    if image_id is None:
+        return Response("Keyframe not found", status=404)
+    return Response(str(Keyframes.lookup([image_id])[field][0]), mimetype='text/plain')
+
+@app.route('/get_time')
+def get_time():
+    return keyframe_info('seconds')
+
+@app.route('/map')
+def map_keyframe():
+    return keyframe_info('frame_idx')
+
+@app.route('/keyframes/lookup', methods=['POST'])
+def keyframes_lookup():
+    # {"ids": [...]} -> columnar {ids, video, frame_idx, seconds}
+    ids = (request.get_json(silent=True) or {}).get('ids', [])
+    return jsonify(Keyframes.lookup(ids))
 
 if __name__ == '__main__':
     app.run(debug=True, host="0.0.0.0", port=5001)
@@ -1,12 +1,18 @@
-from fastapi import FastAPI, Query, Response
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-import cv2
 import os
 import numpy as np
 import json
-from utils.query_processing import Translation
-from utils.faiss import Myfaiss
+# SEARCH_SERVER=unix:/tmp/myfaiss.sock: use the shared search_server.py instead of loading CLIP + index here
+SEARCH_SERVER = os.getenv("SEARCH_SERVER")
+if SEARCH_SERVER:
+    from utils.search_client import SearchClient
+else:
+    from utils.query_processing import Translation
+    from utils.faiss import Myfaiss
+    from utils.query_cache import QueryCache
+from utils.frame_render import FrameRenderer
 
 app = FastAPI(title="Image Search API")
 
@@ -25,7 +31,16 @@ with open('image_path.json') as json_file:
 DictImagePath = {int(key): value for key, value in json_dict.items()}
 LenDictPath = len(DictImagePath)
 bin_file = 'faiss_normal_ViT.bin'
-MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32")
+# FAISS_LOAD_MODE=mmap: map the index read-only so every worker shares one page-cache copy
+if SEARCH_SERVER:
+    MyFaiss = SearchClient(SEARCH_SERVER)
+else:
+    MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32",
+                      load_mode=os.getenv("FAISS_LOAD_MODE", "mmap"),
+                      query_cache=QueryCache(os.getenv("QUERY_CACHE_PATH", "query_cache.sqlite3"), namespace="ViT-B/32"))
+# Annotated frames for /get_img: LRU of encoded JPEGs + bounded render pool (off the event loop)
+Renderer = FrameRenderer(max_bytes=int(os.getenv("FRAME_CACHE_MB", "128")) * 1024 * 1024,
+                         max_workers=int(os.getenv("FRAME_RENDER_WORKERS", "4")))
 
 @app.get("/home")
 @app.get("/")
@@ -76,17 +91,12 @@ def text_search(textquery: str = Query(...)):
     return JSONResponse(content=data)
 
 @app.get("/get_img")
-def get_img(fpath: str = Query(...)):
-    list_image_name = fpath.split("/")
-    image_name = "/".join(list_image_name[-2:])
-    if os.path.exists(fpath):
-        img = cv2.imread(fpath)
-    else:
-        img = cv2.imread("./static/images/404.jpg")
-    img = cv2.resize(img, (1280,720))
-    img = cv2.putText(img, image_name, (30, 80), cv2.FONT_HERSHEY_SIMPLEX, 3, (255, 0, 0), 4, cv2.LINE_AA)
-    _, jpeg = cv2.imencode('.jpg', img)
-    return StreamingResponse(iter([jpeg.tobytes()]), media_type="image/jpeg")
+async def get_img(fpath: str = Query(...), width: int = Query(1280, ge=64, le=3840),
+                  quality: int = Query(95, ge=10, le=100)):
+    jpeg = await Renderer.arender(fpath, width=width, quality=quality)
+    if jpeg is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    return Response(content=jpeg, media_type="image/jpeg", headers={"Cache-Control": "public, max-age=3600"})
 
 # To run: uvicorn app_fastapi:app --reload --host 0.0.0.0 --port 8000
 
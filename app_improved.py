@@ -1,9 +1,10 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Request
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Query
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, Response, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.templating import Jinja2Templates
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List, Optional
 import json
 import cv2
 import numpy as np
@@ -12,11 +13,42 @@ from dotenv import load_dotenv
 from PIL import Image
 import logging
 import traceback
+import asyncio
+import gzip
+import base64
+import hashlib
+from email.utils import formatdate, parsedate_to_datetime
+from functools import lru_cache
+from utils.path_table import PathTable
+from utils.thumbnails import ThumbnailCache, THUMB_SIZES
+from utils.executor import InferenceExecutor, QueueFull
+from utils.video_catalog import VideoCatalog
+from utils.keyframe_index import KeyframeIndex
+from utils.video_frames import CapturePool, encode_jpeg
+from utils.keyframe_groups import KeyframeGroups
+from utils.temporal import temporal_join
+from utils.search_filter import make_filter
+from utils.result_cache import ResultCache
+from utils.embedding_store import VectorNotFound
+from utils.diversify import METHODS as DIVERSIFY_METHODS, diversify, similar_to
+from utils.refine import rocchio
+
+# Load .env
+load_dotenv()
+
+# SEARCH_SERVER=unix:/tmp/myfaiss.sock (or host:port): CLIP and the index live in search_server.py,
+# shared by every web worker; this process only loads a thin client
+SEARCH_SERVER = os.getenv("SEARCH_SERVER")
 
 # Try to import utils, with fallback
 try:
-    from utils.query_processing import Translation
-    from utils.faiss import Myfaiss
+    if SEARCH_SERVER:
+        from utils.search_client import SearchClient
+    else:
+        from utils.query_processing import translation_from_env
+        from utils.faiss import Myfaiss
+        from utils.batching import SearchBatcher
+        from utils.query_cache import QueryCache
     UTILS_AVAILABLE = True
 except ImportError as e:
     print(f"Warning: Could not import utils: {e}")
@@ -45,27 +77,70 @@ try:
     with open('image_path.json') as json_file:
         json_dict = json.load(json_file)
     
-    DictImagePath = {int(key): value for key, value in json_dict.items()}
+    # Array-backed id -> path table (a few bytes per keyframe instead of a Python dict entry)
+    DictImagePath = PathTable.from_dict(json_dict)
     LenDictPath = len(DictImagePath)
+    ImagePathsMtime = os.path.getmtime('image_path.json')
+    del json_dict
     logger.info(f"Loaded {LenDictPath} image paths")
 except Exception as e:
     logger.error(f"Error loading image_path.json: {e}")
-    DictImagePath = {}
+    DictImagePath = PathTable.from_dict({})
     LenDictPath = 0
+    ImagePathsMtime = 0.0
+
+# Grid thumbnails (built by make_thumbnails.py, missing ones are created on first request)
+Thumbnails = ThumbnailCache(DictImagePath, root=os.getenv("THUMBNAIL_DIR", "thumbnails"))
+
+# Near-duplicate keyframe groups written by rebuild_faiss_index.py --collapse-threshold: search hits are
+# group representatives, /api/groups/expand returns the keyframes behind them
+KEYFRAME_GROUPS_PATH = os.getenv("KEYFRAME_GROUPS_PATH", KeyframeGroups.default_path('faiss_normal_ViT.bin'))
+Groups = KeyframeGroups.load(KEYFRAME_GROUPS_PATH) if os.path.exists(KEYFRAME_GROUPS_PATH) else None
+if Groups is not None:
+    logger.info(f"Keyframe groups: {len(Groups)} representatives for {len(Groups.members)} keyframes")
 
 # Initialize FAISS
 MyFaiss = None
-if UTILS_AVAILABLE:
+SearchQueue = None
+if UTILS_AVAILABLE and SEARCH_SERVER:
+    # Same search API as Myfaiss + SearchBatcher; the server batches requests from all workers
+    MyFaiss = SearchQueue = SearchClient(SEARCH_SERVER, pool_size=int(os.getenv("SEARCH_CLIENT_POOL", "4")))
+    logger.info(f"Using search server at {SEARCH_SERVER}")
+elif UTILS_AVAILABLE:
     try:
         bin_file = 'faiss_normal_ViT.bin'
-        MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32")
+        # Translation backend (googletrans | translate | dictionary | none) with a time budget per query;
+        # when it is slow or down we search the untranslated text, or the offline dictionary if configured
+        translator = translation_from_env()
+        # Default search effort; each request can override it with nprobe / ef_search
+        MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', translator, "ViT-B/32",
+                          nprobe=int(os.getenv("FAISS_NPROBE", "32")),
+                          ef_search=int(os.getenv("FAISS_EF_SEARCH", "128")),
+                          load_mode=os.getenv("FAISS_LOAD_MODE", "mmap"),
+                          query_cache=QueryCache(os.getenv("QUERY_CACHE_PATH", "query_cache.sqlite3"),
+                                                 namespace="ViT-B/32"))
         logger.info("FAISS initialized successfully")
     except Exception as e:
         logger.error(f"Error initializing FAISS: {e}")
         MyFaiss = None
 
-# Load .env
-load_dotenv()
+# Paged search results: cursor -> query vector + ranking so far (LRU by bytes + TTL since last access)
+Results = ResultCache(max_bytes=int(os.getenv("RESULT_CACHE_MB", "64")) * 1024 * 1024,
+                      ttl=float(os.getenv("RESULT_CACHE_TTL", "900")))
+
+# Concurrent single-query searches are coalesced into one encode + one index.search
+if MyFaiss is not None and SearchQueue is None:
+    SearchQueue = SearchBatcher(MyFaiss,
+                                max_batch=int(os.getenv("SEARCH_BATCH_MAX", "32")),
+                                max_wait_ms=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5")),
+                                max_queue=int(os.getenv("SEARCH_QUEUE_MAX", "256")))
+
+# Blocking work never runs on the event loop: CLIP / FAISS calls go to Inference, OpenCV / PIL
+# file work (video metadata, thumbnails, upload decoding) to MediaPool. Both fail fast when full.
+Inference = InferenceExecutor(max_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+                              max_queue=int(os.getenv("INFERENCE_QUEUE", "32")), name="inference")
+MediaPool = InferenceExecutor(max_workers=int(os.getenv("MEDIA_WORKERS", "4")),
+                              max_queue=int(os.getenv("MEDIA_QUEUE", "128")), name="media")
 
 # Support multiple video folders - can be comma-separated in .env
 VIDEO_FOLDERS = ['/home/nguyennn263/Documents/AIC/Dataset/Videos/video', '/media/nguyennn263/Data-Trans/AIC/video']
@@ -74,9 +149,28 @@ VIDEO_FOLDERS = ['/home/nguyennn263/Documents/AIC/Dataset/Videos/video', '/media
 
 logger.info(f"Configured video folders: {VIDEO_FOLDERS}")
 
+# name -> path / fps / frame count / size, scanned once (only new or changed files are opened) and
+# persisted, so video lookups are dict hits instead of stat + cv2.VideoCapture per request
+Videos = VideoCatalog(VIDEO_FOLDERS, cache_path=os.getenv("VIDEO_CATALOG_PATH", "video_catalog.json"))
+_scan = Videos.refresh()
+logger.info(f"Video catalog: {_scan['videos']} videos ({_scan['probed']} probed) in {_scan['seconds']:.1f}s")
+
+# image id -> (video, frame_idx, pts seconds); uses map-keyframes/<video>.csv when present, else frame / fps
+KEYFRAME_INDEX_PATH = os.getenv("KEYFRAME_INDEX_PATH", "keyframe_index.npz")
+KEYFRAME_MAP_DIR = os.getenv("KEYFRAME_MAP_DIR", "map-keyframes")
+Keyframes = KeyframeIndex.load_or_build(KEYFRAME_INDEX_PATH, DictImagePath, Videos, KEYFRAME_MAP_DIR, ImagePathsMtime)
+logger.info(f"Keyframe index: {len(Keyframes)} keyframes in {len(Keyframes.videos)} videos")
+
+# Open VideoCapture handles reused by /api/frame (LRU, reads forward instead of re-seeking nearby frames)
+Captures = CapturePool(max_handles=int(os.getenv("VIDEO_CAPTURE_HANDLES", "16")))
+
 # Function to find video across all folders
 def find_video_path(video_name: str) -> str:
     """Find video file across all configured video folders"""
+    info = Videos.get(video_name, probe_missing=False)
+    if info is not None:
+        return info["path"]
+    # Added after the last scan
     for folder in VIDEO_FOLDERS:
         video_path = os.path.join(folder, f"{video_name}.mp4")
         if os.path.exists(video_path):
@@ -98,18 +192,214 @@ app.mount("/videos", StaticFiles(directory=get_primary_video_folder()), name="vi
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
 # Pydantic models-
-class ImageSearchRequest(BaseModel):
+class FilterOptions(BaseModel):
+    # search only these videos / videos starting with video_prefix (e.g. "L21_") / ids in [start, stop)
+    videos: Optional[List[str]] = None
+    video_prefix: Optional[str] = None
+    id_range: Optional[List[int]] = None
+
+class DiversifyOptions(BaseModel):
+    # "mmr" (relevance vs. similarity to results already picked) or "dedup" (drop near-duplicates)
+    diversify: Optional[str] = None
+    diversity: float = 0.3
+    dedup_threshold: float = 0.95
+
+class ImageSearchRequest(DiversifyOptions, FilterOptions):
     image_id: int
-    k: int = 500
+    k: int = Field(500, ge=1)
+    # IVF lists probed (clamped to nlist) / HNSW beam width; None: the deployment default
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    # set: return the first page_size hits + a cursor, next pages come from /api/results/{cursor}
+    page_size: Optional[int] = None
 
-class TextSearchRequest(BaseModel):
+class TextSearchRequest(DiversifyOptions, FilterOptions):
     query: str
-    k: int = 500
+    k: int = Field(500, ge=1)
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    page_size: Optional[int] = None
+
+class RemoveSimilarRequest(BaseModel):
+    image_id: int
+    k: int = Field(100, ge=1)
+    # current result list; when given, the near-duplicates of image_id are removed from it server-side
+    candidate_ids: List[int] = []
+    threshold: float = 0.9
+
+class VideoInfoBatchRequest(BaseModel):
+    names: List[str]
+
+class KeyframeLookupRequest(BaseModel):
+    ids: List[int]
+
+class GroupExpandRequest(BaseModel):
+    ids: List[int]
+
+class TemporalSearchRequest(FilterOptions):
+    # events in the order they happen, e.g. ["a man opens a door", "a car drives away"]
+    queries: List[str]
+    max_gap: float = 10.0  # seconds between consecutive events
+    min_gap: float = 0.0
+    k: int = Field(100, ge=1)  # sequences returned
+    candidates: int = Field(500, ge=1)  # hits per clause considered for the join
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+
+class RefineRequest(FilterOptions):
+    # the original query (text or image id, optional) plus ids marked relevant / not relevant
+    query: Optional[str] = None
+    image_id: Optional[int] = None
+    positive_ids: List[int] = []
+    negative_ids: List[int] = []
+    # Rocchio weights of the query, the positives' mean and the negatives' mean
+    alpha: float = 1.0
+    beta: float = 0.75
+    gamma: float = 0.15
+    k: int = Field(500, ge=1)
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+    page_size: Optional[int] = None
+
+class BatchSearchRequest(DiversifyOptions, FilterOptions):
+    queries: List[str] = []
+    image_ids: List[int] = []
+    k: int = Field(100, ge=1)
+    nprobe: Optional[int] = Field(None, ge=1)
+    ef_search: Optional[int] = Field(None, ge=1)
+
+# Upper bound on queries per /api/batch_search call
+MAX_BATCH_QUERIES = 1000
+
+def columnar_results(scores, list_ids, list_image_paths):
+    """Search hits as parallel arrays (no per-hit objects): ids[i], paths[i] and scores[i] belong together"""
+    results = {
+        "ids": np.asarray(list_ids).tolist(),
+        "paths": list(list_image_paths),
+        "scores": np.asarray(scores[0]).tolist(),
+    }
+    if Groups is not None:
+        # keyframes collapsed into each hit (1: not grouped), expand with /api/groups/expand
+        results["group_sizes"] = Groups.group_sizes(list_ids).tolist()
+    return results
+
+# Diversified searches rank this many times k candidates (capped), then keep k of them
+DIVERSIFY_OVERSAMPLE = 3
+MAX_DIVERSIFY_CANDIDATES = 3000
+
+def check_diversify(options: DiversifyOptions):
+    if options.diversify is not None and options.diversify not in DIVERSIFY_METHODS:
+        raise HTTPException(status_code=400, detail=f"diversify must be one of {', '.join(DIVERSIFY_METHODS)}")
+    if not 0.0 <= options.diversity <= 1.0:
+        raise HTTPException(status_code=400, detail="diversity must be between 0 and 1")
+
+def candidate_k(k: int, options: DiversifyOptions) -> int:
+    if options.diversify is None:
+        return k
+    return max(k, min(k * DIVERSIFY_OVERSAMPLE, MAX_DIVERSIFY_CANDIDATES))
+
+def diversify_results(result, k, options: DiversifyOptions):
+    """Re-rank one search result with the candidate vectors from the index / embedding store (no re-encoding)"""
+    scores, list_ids, infos, list_image_paths = result
+    if options.diversify is None or len(list_ids) == 0:
+        return result
+    keep = diversify(MyFaiss.get_vectors(list_ids), scores[0], k, options.diversify,
+                     options.diversity, options.dedup_threshold)
+    paths = [list_image_paths[i] for i in keep.tolist()]
+    return [np.asarray(scores[0])[keep]], np.asarray(list_ids)[keep], paths, paths
+
+def diversify_batch(results, k, options: DiversifyOptions):
+    return [diversify_results(result, k, options) for result in results]
+
+def request_filter(options: FilterOptions):
+    """SearchFilter applied inside FAISS (None: whole index)"""
+    if options.id_range is not None and len(options.id_range) != 2:
+        raise HTTPException(status_code=400, detail="id_range must be [start, stop]")
+    try:
+        return make_filter(options.videos, options.video_prefix, options.id_range)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+async def search_one(kind, query, k, nprobe, ef_search, options: DiversifyOptions, id_filter=None):
+    """One query through the micro-batcher, diversified on the inference pool when asked"""
+    result = await asyncio.wrap_future(SearchQueue.submit(kind, query, candidate_k(k, options), nprobe, ef_search,
+                                                          id_filter))
+    if options.diversify is None:
+        return result
+    return await Inference.run(diversify_results, result, k, options)
 
-class SearchResult(BaseModel):
-    id: int
-    path: str
-    score: float = 0.0
+# Deepest ranking a cursor can reach, and the largest page served at once
+MAX_CURSOR_DEPTH = 10000
+MAX_RESULTS_PAGE = 1000
+
+def check_page_size(page_size, options: DiversifyOptions):
+    if page_size is None:
+        return
+    if not 1 <= page_size <= MAX_RESULTS_PAGE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {MAX_RESULTS_PAGE}")
+    if options.diversify is not None:
+        raise HTTPException(status_code=400, detail="diversify cannot be combined with page_size")
+
+def query_vector(kind, query):
+    """CLIP vector of one query (text embeddings come from the query cache when seen before)"""
+    if kind == "text":
+        return MyFaiss.encode_texts([query])
+    if kind == "image_id":
+        return MyFaiss.get_vectors([query])
+    return MyFaiss.encode_images([query])
+
+def ranked_without(vector, k, nprobe, ef_search, id_filter, exclude=()):
+    """(ids, scores) of the top-k hits of a raw query vector, skipping the ids in `exclude`"""
+    scores, list_ids, _, _ = MyFaiss.vector_search(vector, k + len(exclude), nprobe, ef_search, id_filter)[0]
+    list_ids, scores = np.asarray(list_ids, dtype=np.int64), np.asarray(scores[0])
+    if len(exclude):
+        keep = ~np.isin(list_ids, exclude)
+        list_ids, scores = list_ids[keep], scores[keep]
+    return list_ids[:k], scores[:k]
+
+def results_page(cursor, entry, offset, limit):
+    all_ids, all_scores = entry.ranking
+    ids = all_ids[offset:offset + limit]
+    page = columnar_results([all_scores[offset:offset + limit]], ids, DictImagePath.paths(ids))
+    page.update({
+        "cursor": cursor,
+        "offset": offset,
+        "depth": len(all_ids),
+        "has_more": offset + len(ids) < len(all_ids) or (not entry.exhausted and len(all_ids) < MAX_CURSOR_DEPTH),
+    })
+    return page
+
+async def search_with_cursor(kind, query, k, nprobe, ef_search, id_filter, page_size):
+    """Search k deep once, cache the ranking and return its first page with the cursor"""
+    vector = await Inference.run(query_vector, kind, query)
+    return await vector_cursor(vector, k, nprobe, ef_search, id_filter, page_size)
+
+async def vector_cursor(vector, k, nprobe, ef_search, id_filter, page_size, exclude=()):
+    """Cursor over the ranking of a query vector; excluded ids stay out of deeper pages too"""
+    k = min(max(k, page_size), MAX_CURSOR_DEPTH)
+    exclude = np.asarray(exclude, dtype=np.int64)
+    list_ids, scores = await Inference.run(ranked_without, vector, k, nprobe, ef_search, id_filter, exclude)
+    cursor = Results.put(vector, list_ids, scores, (nprobe, ef_search, id_filter, exclude), exhausted=len(list_ids) < k)
+    return results_page(cursor, Results.get(cursor), 0, page_size)
+
+@app.exception_handler(QueueFull)
+async def queue_full_handler(request: Request, exc: QueueFull):
+    """Overloaded: tell the client to retry shortly instead of queueing without bound"""
+    logger.warning(f"Rejected {request.url.path}: {exc}")
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
+@app.exception_handler(VectorNotFound)
+async def vector_not_found_handler(request: Request, exc: VectorNotFound):
+    """An image id without an embedding (store incomplete, not indexed): a client error, not a crash"""
+    return JSONResponse(status_code=404, content={"detail": str(exc)})
+
+def decode_upload(contents: bytes):
+    """Uploaded file bytes -> RGB PIL image (None if it is not an image)"""
+    nparr = np.frombuffer(contents, np.uint8)
+    img_cv = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+    if img_cv is None:
+        return None
+    return Image.fromarray(cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB))
 
 # Routes
 @app.get("/", response_class=HTMLResponse)
@@ -148,13 +438,126 @@ async def serve_video(video_name: str):
         logger.error(f"Error serving video: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.get("/api/image_paths")
-async def get_image_paths():
-    """Get all image paths"""
+# Longest burst /api/frame decodes in one call
+MAX_FRAME_BURST = 32
+
+def read_video_frames(video_path, frame, t, count, step, width, quality):
+    read = Captures.read(video_path, frame=frame, seconds=t, count=count, step=step)
+    if read is None:
+        return None
+    fps, frames = read
+    return fps, [(idx, encode_jpeg(image, width, quality)) for idx, image in frames]
+
+@app.get("/api/frame/{video_name}")
+async def get_video_frame(video_name: str, frame: Optional[int] = None, t: Optional[float] = None,
+                          count: int = 1, step: int = 1, width: int = 1280, quality: int = 90):
+    """
+    Decoded frame(s) of a video at a frame number or a timestamp (seconds).
+    count=1 returns the JPEG itself; count>1 returns {video, fps, frames: [{frame, seconds, image}]}
+    with base64 JPEG data URLs, `step` frames apart.
+    """
+    if frame is None and t is None:
+        raise HTTPException(status_code=400, detail="Pass frame or t")
+    if not 1 <= count <= MAX_FRAME_BURST:
+        raise HTTPException(status_code=400, detail=f"count must be between 1 and {MAX_FRAME_BURST}")
+    video_path = find_video_path(video_name)
+    if not video_path:
+        raise HTTPException(status_code=404, detail=f"Video {video_name}.mp4 not found")
+    width = min(max(width, 64), 3840)
+    read = await MediaPool.run(read_video_frames, video_path, frame, t, count, step, width, quality)
+    if read is None or not read[1]:
+        raise HTTPException(status_code=404, detail=f"Frame not available in {video_name}")
+    fps, frames = read
+    if count == 1:
+        idx, jpeg = frames[0]
+        return Response(content=jpeg, media_type="image/jpeg",
+                        headers={"X-Frame-Index": str(idx), "Cache-Control": "public, max-age=3600"})
     return {
-        "image_paths": DictImagePath,
-        "total_count": LenDictPath
+        "video": video_name,
+        "fps": fps,
+        "frames": [
+            {"frame": idx, "seconds": idx / fps if fps > 0 else None,
+             "image": "data:image/jpeg;base64," + base64.b64encode(jpeg).decode("ascii")}
+            for idx, jpeg in frames
+        ],
+    }
+
+# Largest page /api/image_paths serves at once
+MAX_IMAGE_PATHS_PAGE = 10000
+
+@lru_cache(maxsize=256)
+def image_paths_page(offset: int, limit: int):
+    """gzip-compressed JSON of one catalog page (pages never change while the process runs)"""
+    page = DictImagePath.columns(offset, offset + limit)
+    page.update({"offset": offset, "limit": limit, "total_count": LenDictPath, "id_bound": DictImagePath.id_bound})
+    return gzip.compress(json.dumps(page, separators=(",", ":")).encode("utf-8"), compresslevel=6)
+
+def image_paths_body(offset: int, limit: int, gzipped: bool):
+    body = image_paths_page(offset, limit)
+    return body if gzipped else gzip.decompress(body)
+
+def not_modified(request: Request, etag: str, mtime=None):
+    """Whether the client's If-None-Match (or, without it, If-Modified-Since) still matches"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*"
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None and mtime is not None:
+        try:
+            return int(mtime) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            pass
+    return False
+
+@app.get("/api/thumb/{image_id}")
+async def get_thumbnail(request: Request, image_id: int, size: str = "small"):
+    """Downscaled keyframe for grids (small / medium), cached on disk by id and source mtime"""
+    if size not in THUMB_SIZES:
+        raise HTTPException(status_code=400, detail=f"size must be one of {sorted(THUMB_SIZES)}")
+    try:
+        # Decoding / resizing is CPU work, keep it off the event loop
+        thumb_path = await MediaPool.run(Thumbnails.get, image_id, size)
+    except QueueFull:
+        raise
+    except Exception as e:
+        logger.error(f"Error creating thumbnail {image_id}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    if thumb_path is None:
+        raise HTTPException(status_code=404, detail=f"Image {image_id} not found")
+    # The URL is not versioned, so browsers revalidate; the thumbnail name holds the source mtime,
+    # which makes it the ETag and a re-extracted keyframe a new one
+    etag = '"' + hashlib.md5(os.path.basename(thumb_path).encode()).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if not_modified(request, etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(thumb_path, media_type=Thumbnails.media_type, headers=headers)
+
+@app.get("/api/image_paths")
+async def get_image_paths(request: Request, offset: int = 0, limit: int = 1000):
+    """
+    One page of the keyframe catalog: ids in [offset, offset + limit) in columnar form
+    (videos/widths/exts table + ids, video_idx, frames; path = videos[v]/frame zero-padded to widths[v] + exts[v]).
+    Revalidated with ETag / Last-Modified and sent gzip-compressed.
+    """
+    if offset < 0 or limit < 1 or limit > MAX_IMAGE_PATHS_PAGE:
+        raise HTTPException(status_code=400, detail=f"offset must be >= 0 and limit in [1, {MAX_IMAGE_PATHS_PAGE}]")
+    
+    etag = '"' + hashlib.md5(f"{ImagePathsMtime}:{LenDictPath}:{offset}:{limit}".encode()).hexdigest() + '"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(ImagePathsMtime, usegmt=True),
+        "Cache-Control": "no-cache",
+        "Vary": "Accept-Encoding",
     }
+    if not_modified(request, etag, ImagePathsMtime):
+        return Response(status_code=304, headers=headers)
+    
+    gzipped = "gzip" in request.headers.get("accept-encoding", "")
+    if gzipped:
+        headers["Content-Encoding"] = "gzip"
+    # Serializing / compressing a page is CPU work, keep it off the event loop (cached after the first call)
+    body = await MediaPool.run(image_paths_body, offset, limit, gzipped)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 @app.post("/api/image_search")
 async def image_search(request: ImageSearchRequest):
@@ -165,18 +568,20 @@ async def image_search(request: ImageSearchRequest):
     if request.image_id < 0 or request.image_id >= LenDictPath:
         raise HTTPException(status_code=400, detail="Invalid image ID")
     
+    check_diversify(request)
+    check_page_size(request.page_size, request)
+    id_filter = request_filter(request)
+    
     try:
-        scores, list_ids, _, list_image_paths = MyFaiss.image_search(request.image_id, k=request.k)
-        
-        results = []
-        for i, (img_path, img_id, score) in enumerate(zip(list_image_paths, list_ids, scores[0])):
-            results.append(SearchResult(
-                id=int(img_id),
-                path=img_path,
-                score=float(score)
-            ))
+        if request.page_size:
+            return JSONResponse(await search_with_cursor("image_id", request.image_id, request.k, request.nprobe,
+                                                         request.ef_search, id_filter, request.page_size))
+        scores, list_ids, _, list_image_paths = await search_one(
+            "image_id", request.image_id, request.k, request.nprobe, request.ef_search, request, id_filter)
         
-        return {"results": results}
+        return JSONResponse(columnar_results(scores, list_ids, list_image_paths))
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
     except Exception as e:
         logger.error(f"Error in image search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -190,92 +595,287 @@ async def text_search(request: TextSearchRequest):
     if not request.query.strip():
         raise HTTPException(status_code=400, detail="Query cannot be empty")
     
+    check_diversify(request)
+    check_page_size(request.page_size, request)
+    id_filter = request_filter(request)
+    
     try:
-        scores, list_ids, _, list_image_paths = MyFaiss.text_search(request.query, k=request.k)
-        
-        results = []
-        for i, (img_path, img_id, score) in enumerate(zip(list_image_paths, list_ids, scores[0])):
-            results.append(SearchResult(
-                id=int(img_id),
-                path=img_path,
-                score=float(score)
-            ))
+        if request.page_size:
+            return JSONResponse(await search_with_cursor("text", request.query, request.k, request.nprobe,
+                                                         request.ef_search, id_filter, request.page_size))
+        scores, list_ids, _, list_image_paths = await search_one(
+            "text", request.query, request.k, request.nprobe, request.ef_search, request, id_filter)
         
-        return {"results": results}
+        return JSONResponse(columnar_results(scores, list_ids, list_image_paths))
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
     except Exception as e:
         logger.error(f"Error in text search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/results/{cursor}")
+async def get_results_page(cursor: str, offset: int = 0, limit: int = 100):
+    """
+    One page of a cursor's ranking. Pages inside the cached depth are slices; deeper pages re-run
+    the index search with a larger k from the cached query vector (no re-encoding)
+    """
+    if offset < 0 or not 1 <= limit <= MAX_RESULTS_PAGE:
+        raise HTTPException(status_code=400, detail=f"Need offset >= 0 and 1 <= limit <= {MAX_RESULTS_PAGE}")
+    entry = Results.get(cursor)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Cursor expired, run the search again")
+    need = min(offset + limit, MAX_CURSOR_DEPTH)
+    if need > entry.depth and not entry.exhausted:
+        nprobe, ef_search, id_filter, exclude = entry.params
+
+        def search(k):
+            return ranked_without(entry.vector[None], k, nprobe, ef_search, id_filter, exclude)
+
+        # grow geometrically so paging forward page by page does not search at every step
+        depth = min(max(need, 2 * entry.depth), MAX_CURSOR_DEPTH)
+        await Inference.run(Results.ensure_depth, cursor, entry, depth, search)
+    return JSONResponse(results_page(cursor, entry, offset, limit))
+
 @app.post("/api/upload_search")
-async def upload_search(image: UploadFile = File(...), k: int = 500):
+async def upload_search(image: UploadFile = File(...), k: int = Query(500, ge=1),
+                        nprobe: Optional[int] = Query(None, ge=1), ef_search: Optional[int] = Query(None, ge=1),
+                        diversify: Optional[str] = None, diversity: float = 0.3, dedup_threshold: float = 0.95,
+                        videos: Optional[List[str]] = Query(None), video_prefix: Optional[str] = None,
+                        id_range: Optional[List[int]] = Query(None), page_size: Optional[int] = None):
     """Search similar images by uploading an image"""
     if MyFaiss is None:
         raise HTTPException(status_code=500, detail="FAISS not initialized")
+    options = DiversifyOptions(diversify=diversify, diversity=diversity, dedup_threshold=dedup_threshold)
+    check_diversify(options)
+    check_page_size(page_size, options)
+    id_filter = request_filter(FilterOptions(videos=videos, video_prefix=video_prefix, id_range=id_range))
     
     try:
-        # Read uploaded image
+        # Read uploaded image, decode off the event loop
         contents = await image.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        img_cv = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        pil_image = await MediaPool.run(decode_upload, contents)
         
-        if img_cv is None:
+        if pil_image is None:
             raise HTTPException(status_code=400, detail="Invalid image file")
         
-        # Convert to PIL Image
-        img_rgb = cv2.cvtColor(img_cv, cv2.COLOR_BGR2RGB)
-        pil_image = Image.fromarray(img_rgb)
-        
-        # Get image features using CLIP
-        import torch
-        image_input = MyFaiss.preprocess(pil_image).unsqueeze(0).to(MyFaiss.device)
-        with torch.no_grad():
-            image_features = MyFaiss.model.encode_image(image_input).cpu().numpy().astype(np.float32)
+        # Get image features using CLIP and search in FAISS
+        if page_size:
+            return JSONResponse(await search_with_cursor("image", pil_image, k, nprobe, ef_search, id_filter, page_size))
+        scores, list_ids, _, list_image_paths = await search_one("image", pil_image, k, nprobe, ef_search, options,
+                                                                 id_filter)
         
-        # Search in FAISS
-        scores, idx_image = MyFaiss.index.search(image_features, k=k)
-        idx_image = idx_image.flatten()
-        
-        # Get image paths
-        list_image_paths = [MyFaiss.id2img_fps.get(int(idx), "") for idx in idx_image]
+        return JSONResponse(columnar_results(scores, list_ids, list_image_paths))
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
+    except Exception as e:
+        logger.error(f"Error in upload search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/api/batch_search")
+async def batch_search(request: BatchSearchRequest):
+    """Search many text queries and/or image IDs in one CLIP forward pass and one FAISS search"""
+    if MyFaiss is None:
+        raise HTTPException(status_code=500, detail="FAISS not initialized")
+    
+    num_queries = len(request.queries) + len(request.image_ids)
+    if num_queries == 0:
+        raise HTTPException(status_code=400, detail="No queries given")
+    if num_queries > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} queries per batch")
+    if any(not query.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    if any(image_id < 0 or image_id >= LenDictPath for image_id in request.image_ids):
+        raise HTTPException(status_code=400, detail="Invalid image ID")
+    check_diversify(request)
+    id_filter = request_filter(request)
+    
+    try:
+        batch_results = await Inference.run(MyFaiss.batch_search, texts=request.queries,
+                                            image_ids=request.image_ids, k=candidate_k(request.k, request),
+                                            nprobe=request.nprobe, ef_search=request.ef_search, id_filter=id_filter)
+        if request.diversify is not None:
+            batch_results = await Inference.run(diversify_batch, batch_results, request.k, request)
         
-        results = []
-        for i, (img_path, img_id, score) in enumerate(zip(list_image_paths, idx_image, scores[0])):
-            if img_path:  # Only include valid paths
-                results.append(SearchResult(
-                    id=int(img_id),
-                    path=img_path,
-                    score=float(score)
-                ))
+        per_query = [
+            columnar_results(scores, list_ids, list_image_paths)
+            for scores, list_ids, _, list_image_paths in batch_results
+        ]
         
-        return {"results": results}
+        num_texts = len(request.queries)
+        return JSONResponse({
+            "text_results": [
+                {"query": query, "results": results}
+                for query, results in zip(request.queries, per_query[:num_texts])
+            ],
+            "image_results": [
+                {"image_id": image_id, "results": results}
+                for image_id, results in zip(request.image_ids, per_query[num_texts:])
+            ]
+        })
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
     except Exception as e:
-        logger.error(f"Error in upload search: {e}")
+        logger.error(f"Error in batch search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+def near_duplicates_of(image_id, candidate_ids, threshold):
+    """Split candidate_ids into (kept, removed): removed are the ones whose vector is within `threshold` cosine of image_id's"""
+    candidates = np.asarray(candidate_ids, dtype=np.int64)
+    candidates = candidates[DictImagePath.valid(candidates)]
+    vectors = MyFaiss.get_vectors(np.concatenate([[image_id], candidates]))
+    similar = similar_to(vectors[0], vectors[1:], threshold)
+    return candidates[~similar].tolist(), candidates[similar].tolist()
+
+# Clauses and per-clause hits a temporal search may ask for
+MAX_TEMPORAL_CLAUSES = 8
+MAX_TEMPORAL_CANDIDATES = 5000
+
+def temporal_results(batch_results, request: TemporalSearchRequest):
+    """Join per-clause hits into ranked sequences, columnar: one row per sequence, one column per clause"""
+    ids, step_scores, totals = temporal_join([(ids, scores[0]) for scores, ids, _, _ in batch_results],
+                                             Keyframes.video_idx, Keyframes.pts, request.max_gap,
+                                             request.k, request.min_gap)
+    flat = ids.reshape(-1)
+    paths = DictImagePath.paths(flat)
+    info = Keyframes.lookup(flat)
+    steps = len(request.queries)
+
+    def rows(values):
+        return [list(values[i:i + steps]) for i in range(0, len(values), steps)]
+
+    return {
+        "queries": request.queries,
+        "video": info["video"][::steps] if steps else [],
+        "ids": ids.tolist(),
+        "paths": rows(paths),
+        "seconds": rows(info["seconds"]),
+        "scores": step_scores.tolist(),
+        "total": totals.tolist(),
+    }
+
+@app.post("/api/temporal_search")
+async def temporal_search(request: TemporalSearchRequest):
+    """
+    Events in order within one video: every clause is encoded and searched in one batch, then hits
+    are joined per video so each event follows the previous one within max_gap seconds
+    """
+    if MyFaiss is None:
+        raise HTTPException(status_code=500, detail="FAISS not initialized")
+    if not 1 <= len(request.queries) <= MAX_TEMPORAL_CLAUSES:
+        raise HTTPException(status_code=400, detail=f"Give between 1 and {MAX_TEMPORAL_CLAUSES} queries")
+    if any(not query.strip() for query in request.queries):
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    if request.max_gap <= 0 or request.min_gap < 0 or request.min_gap >= request.max_gap:
+        raise HTTPException(status_code=400, detail="Need 0 <= min_gap < max_gap")
+    candidates = min(max(request.candidates, request.k), MAX_TEMPORAL_CANDIDATES)
+    id_filter = request_filter(request)
+    
+    try:
+        batch_results = await Inference.run(MyFaiss.batch_search, texts=request.queries, k=candidates,
+                                            nprobe=request.nprobe, ef_search=request.ef_search, id_filter=id_filter)
+        return JSONResponse(await Inference.run(temporal_results, batch_results, request))
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
+    except Exception as e:
+        logger.error(f"Error in temporal search: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+# Feedback ids a refine request may carry
+MAX_FEEDBACK_IDS = 1000
+
+def refined_query(request: RefineRequest):
+    """Rocchio query vector: the original query's vector and all feedback vectors come from one bulk read, not re-encoded"""
+    positives = np.asarray(request.positive_ids, dtype=np.int64)
+    negatives = np.asarray(request.negative_ids, dtype=np.int64)
+    lead = [request.image_id] if request.image_id is not None else []
+    ids = np.concatenate([np.asarray(lead, dtype=np.int64), positives, negatives])
+    vectors = MyFaiss.get_vectors(ids) if len(ids) else None
+    if request.query is not None:
+        query = MyFaiss.encode_texts([request.query])[0]
+    elif lead:
+        query = vectors[0]
+    else:
+        query = None
+    vectors = vectors[len(lead):] if vectors is not None else np.empty((0, 0), dtype=np.float32)
+    return rocchio(query, vectors[:len(positives)], vectors[len(positives):],
+                   request.alpha, request.beta, request.gamma)
+
+@app.post("/api/refine")
+async def refine_search(request: RefineRequest):
+    """
+    Relevance feedback: move the query towards the images marked relevant and away from the ones
+    marked not relevant (Rocchio), then run one search. Negative ids are left out of the results
+    """
+    if MyFaiss is None:
+        raise HTTPException(status_code=500, detail="FAISS not initialized")
+    if request.query is not None and not request.query.strip():
+        raise HTTPException(status_code=400, detail="Query cannot be empty")
+    if request.query is not None and request.image_id is not None:
+        raise HTTPException(status_code=400, detail="Give either query or image_id, not both")
+    if request.query is None and request.image_id is None and not request.positive_ids:
+        raise HTTPException(status_code=400, detail="Need a query, an image_id or at least one positive id")
+    if len(request.positive_ids) + len(request.negative_ids) > MAX_FEEDBACK_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_FEEDBACK_IDS} feedback ids")
+    feedback = request.positive_ids + request.negative_ids + ([request.image_id] if request.image_id is not None else [])
+    if any(i < 0 or i >= LenDictPath for i in feedback):
+        raise HTTPException(status_code=400, detail="Invalid image ID")
+    if request.page_size is not None and not 1 <= request.page_size <= MAX_RESULTS_PAGE:
+        raise HTTPException(status_code=400, detail=f"page_size must be between 1 and {MAX_RESULTS_PAGE}")
+    id_filter = request_filter(request)
+    exclude = np.unique(np.asarray(request.negative_ids, dtype=np.int64))
+    if Groups is not None:
+        # hits are group representatives
+        exclude = np.unique(Groups.representative(exclude))
+    
+    try:
+        vector = await Inference.run(refined_query, request)
+        if request.page_size:
+            return JSONResponse(await vector_cursor(vector, request.k, request.nprobe, request.ef_search,
+                                                    id_filter, request.page_size, exclude))
+        list_ids, scores = await Inference.run(ranked_without, vector, request.k, request.nprobe,
+                                               request.ef_search, id_filter, exclude)
+        return JSONResponse(columnar_results([scores], list_ids, DictImagePath.paths(list_ids)))
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
+    except Exception as e:
+        logger.error(f"Error in refine search: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/remove_similar")
-async def remove_similar(request: ImageSearchRequest):
-    """Remove similar images from current results - removes about 1/3 of similar images to the target image"""
+async def remove_similar(request: RemoveSimilarRequest):
+    """
+    Remove the near-duplicates of an image from the current results (candidate_ids) in one call:
+    vectors come from the index / embedding store, no search is run. Without candidate_ids the
+    top-k similar ids are returned for the client to filter.
+    """
     if MyFaiss is None:
         raise HTTPException(status_code=500, detail="FAISS not initialized")
     
     if request.image_id < 0 or request.image_id >= LenDictPath:
         raise HTTPException(status_code=400, detail="Invalid image ID")
+    if len(request.candidate_ids) > MAX_DIVERSIFY_CANDIDATES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_DIVERSIFY_CANDIDATES} candidate ids")
     
     try:
-        # Get similar images to the target image
-        scores, similar_ids, _, similar_paths = MyFaiss.image_search(request.image_id, k=300)
+        if request.candidate_ids:
+            kept_ids, removed_ids = await Inference.run(near_duplicates_of, request.image_id,
+                                                        request.candidate_ids, request.threshold)
+            return {
+                "target_image_id": request.image_id,
+                "kept_ids": kept_ids,
+                "similar_image_ids": removed_ids,
+            }
         
-        # Convert to set for faster lookup
-        similar_ids_set = set(int(img_id) for img_id in similar_ids)
-        
-        # This will be called with current search results from frontend
-        # For now, return the similar IDs so frontend can filter current results
+        scores, similar_ids, _, similar_paths = await asyncio.wrap_future(SearchQueue.submit(
+            "image_id", request.image_id, request.k))
         return {
             "target_image_id": request.image_id,
-            "similar_image_ids": [int(img_id) for img_id in similar_ids[:100]],  # Top 100 most similar
-            "message": "Use this list to filter current results on frontend"
+            "similar_image_ids": [int(img_id) for img_id in similar_ids],
+            "message": "Pass candidate_ids to filter the current results server-side"
         }
         
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
     except Exception as e:
         logger.error(f"Error getting similar images: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -284,45 +884,140 @@ async def remove_similar(request: ImageSearchRequest):
 async def get_video_info(video_name: str):
     """Get video metadata including FPS"""
     try:
-        video_path = find_video_path(video_name)
-        if not video_path:
+        # Catalog hit; a video added after the last scan is probed once (off the event loop) and remembered
+        info = await MediaPool.run(Videos.get, video_name)
+        if info is None:
             raise HTTPException(status_code=404, detail=f"Video {video_name}.mp4 not found in any configured folder")
         
-        # Use opencv to get video info
-        cap = cv2.VideoCapture(video_path)
-        if not cap.isOpened():
-            raise HTTPException(status_code=500, detail="Cannot open video")
-        
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        duration = frame_count / fps if fps > 0 else 0
-        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-        
-        cap.release()
-        
-        return {
-            "video_name": video_name,
-            "video_path": video_path,
-            "fps": fps,
-            "frame_count": frame_count,
-            "duration": duration,
-            "width": width,
-            "height": height
-        }
+        return video_info_response(video_name, info)
+    except (HTTPException, QueueFull, VectorNotFound):
+        raise
     except Exception as e:
         logger.error(f"Error getting video info: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+def video_info_response(video_name, info):
+    return {
+        "video_name": video_name,
+        "video_path": info["path"],
+        "fps": info["fps"],
+        "frame_count": info["frame_count"],
+        "duration": info["duration"],
+        "width": info["width"],
+        "height": info["height"]
+    }
+
+@app.post("/api/video_info/batch")
+async def get_video_info_batch(request: VideoInfoBatchRequest):
+    """Metadata of many videos in one call (null for unknown names), straight from the catalog"""
+    infos = Videos.get_many(request.names)
+    return {
+        "videos": {
+            name: video_info_response(name, info) if info is not None else None
+            for name, info in infos.items()
+        }
+    }
+
+@app.post("/api/video_catalog/refresh")
+async def refresh_video_catalog():
+    """Rescan the video folders (new / replaced files are probed, the rest is reused)"""
+    global Keyframes
+    scan = await MediaPool.run(Videos.refresh)
+    # fps may have changed: rebuild the keyframe -> time mapping too
+    Keyframes = await MediaPool.run(KeyframeIndex.build, DictImagePath, Videos, KEYFRAME_MAP_DIR, ImagePathsMtime)
+    await MediaPool.run(Keyframes.save, KEYFRAME_INDEX_PATH)
+    scan["keyframes"] = len(Keyframes)
+    return scan
+
+# Upper bound on ids per /api/keyframes/lookup call
+MAX_KEYFRAME_LOOKUP = 100000
+
+@app.post("/api/keyframes/lookup")
+async def keyframes_lookup(request: KeyframeLookupRequest):
+    """Many image ids -> columnar {ids, video, frame_idx, seconds} in one call (null / -1 for unknown ids)"""
+    if len(request.ids) > MAX_KEYFRAME_LOOKUP:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_KEYFRAME_LOOKUP} ids per lookup")
+    return JSONResponse(Keyframes.lookup(request.ids))
+
+def find_keyframe(video: str, keyframe: str):
+    """Image id of keyframe <keyframe> (file name number, e.g. "00000025") of a video"""
+    try:
+        image_id = Keyframes.find(video, int(keyframe))
+    except ValueError:
+        image_id = None
+    if image_id is None:
+        raise HTTPException(status_code=404, detail=f"Keyframe {video}/{keyframe} not found")
+    return image_id
+
+@app.get("/get_time", response_class=PlainTextResponse)
+async def get_time(video: str, id: str):
+    """Timestamp (seconds) of a keyframe, used by main.js to open the video at that moment"""
+    return str(Keyframes.lookup([find_keyframe(video, id)])["seconds"][0])
+
+@app.get("/map", response_class=PlainTextResponse)
+async def map_keyframe(video: str, id: str):
+    """Frame index in the video of a keyframe, used by main.js for CSV export"""
+    return str(Keyframes.lookup([find_keyframe(video, id)])["frame_idx"][0])
+
+@app.post("/api/groups/expand")
+async def expand_groups(request: GroupExpandRequest):
+    """Keyframes (frame order) behind each representative id: {ids, members: [[id, ...]], paths: [[path, ...]]}"""
+    if len(request.ids) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUERIES} ids per call")
+    if Groups is None:
+        members = [np.asarray([image_id]) for image_id in request.ids]
+    else:
+        members = Groups.expand(request.ids)
+    return JSONResponse({
+        "ids": list(request.ids),
+        "members": [m.tolist() for m in members],
+        "paths": [DictImagePath.paths(m[DictImagePath.valid(m)]) for m in members],
+    })
+
+def get_resident_memory_mb():
+    """Resident set size of this worker process in MB (None if /proc is not available)"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return None
+
+@app.get("/api/search_stats")
+async def search_stats():
+    """Queue depth, batch-size histogram and queue-wait / exec latency of the search pools"""
+    if SearchQueue is None:
+        raise HTTPException(status_code=500, detail="FAISS not initialized")
+    stats = await Inference.run(SearchQueue.stats)
+    stats["inference"] = Inference.stats()
+    stats["media"] = MediaPool.stats()
+    stats["video_captures"] = Captures.stats()
+    stats["result_cursors"] = Results.stats()
+    if getattr(MyFaiss, "query_cache", None) is not None:
+        stats["query_cache"] = MyFaiss.query_cache.stats()
+    return stats
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint"""
+    index_info = {}
+    if MyFaiss is not None:
+        try:
+            index_info = await Inference.run(MyFaiss.index_info)
+        except Exception as e:
+            logger.error(f"Error getting index info: {e}")
     return {
         "status": "healthy",
         "faiss_initialized": MyFaiss is not None,
+        "search_server": SEARCH_SERVER,
+        **index_info,
+        "process_rss_mb": get_resident_memory_mb(),
         "total_images": LenDictPath,
         "video_folders": VIDEO_FOLDERS,
-        "video_folders_exist": [os.path.exists(folder) for folder in VIDEO_FOLDERS]
+        "video_folders_exist": [os.path.exists(folder) for folder in VIDEO_FOLDERS],
+        "catalog_videos": len(Videos)
     }
 
 if __name__ == "__main__":
@@ -3,8 +3,14 @@ import cv2
 import os
 import numpy as np
 import json
-from utils.query_processing import Translation
-from utils.faiss import Myfaiss
+# SEARCH_SERVER=unix:/tmp/myfaiss.sock: use the shared search_server.py instead of loading CLIP + index here
+SEARCH_SERVER = os.getenv("SEARCH_SERVER")
+if SEARCH_SERVER:
+    from utils.search_client import SearchClient
+else:
+    from utils.query_processing import Translation
+    from utils.faiss import Myfaiss
+    from utils.query_cache import QueryCache
 
 # Load image paths
 with open('image_path.json') as json_file:
@@ -13,7 +19,13 @@ with open('image_path.json') as json_file:
 DictImagePath = {int(key): value for key, value in json_dict.items()}
 LenDictPath = len(DictImagePath)
 bin_file = 'faiss_normal_ViT.bin'
-MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32")
+# FAISS_LOAD_MODE=mmap: map the index read-only so every worker shares one page-cache copy
+if SEARCH_SERVER:
+    MyFaiss = SearchClient(SEARCH_SERVER)
+else:
+    MyFaiss = Myfaiss(bin_file, DictImagePath, 'cpu', Translation(), "ViT-B/32",
+                      load_mode=os.getenv("FAISS_LOAD_MODE", "mmap"),
+                      query_cache=QueryCache(os.getenv("QUERY_CACHE_PATH", "query_cache.sqlite3"), namespace="ViT-B/32"))
 
 st.set_page_config(page_title="Image Search App", layout="wide")
 st.title("Image Search and Browsing")
@@ -2,7 +2,7 @@ import glob
 import os
 import json
 
-def create_image_json(image_dir, output_file):
+def create_image_json(image_dir, output_file, keep_existing_ids=True):
     # Use recursive glob to find all image files in the directory and subdirectories
     image_files = glob.glob(os.path.join(image_dir, "**", "*.jpg"), recursive=True) + \
                   glob.glob(os.path.join(image_dir, "**", "*.png"), recursive=True) + \
@@ -12,15 +12,31 @@ def create_image_json(image_dir, output_file):
     image_files = [os.path.relpath(f, start=os.path.dirname(output_file)).replace("\\", "/") for f in image_files]
     image_files.sort()
 
-    # Create dictionary with index as key and file path as value
-    data = {str(i): fname for i, fname in enumerate(image_files)}
+    # Giữ nguyên id của các ảnh đã có, ảnh mới (batch L-xx mới) được thêm vào cuối với id tiếp theo
+    # để embedding store và FAISS index không phải build lại từ đầu
+    data = {}
+    if keep_existing_ids and os.path.exists(output_file):
+        with open(output_file, encoding="utf-8") as f:
+            data = json.load(f)
+    # Ảnh đã bị xóa khỏi thư mục thì bỏ khỏi JSON; id của chúng không được dùng lại,
+    # update_index_from_images sẽ xóa vector tương ứng khỏi embedding store và index
+    next_id = max((int(k) for k in data), default=-1) + 1
+    current = set(image_files)
+    removed = [k for k, fname in data.items() if fname not in current]
+    for k in removed:
+        del data[k]
+    known = set(data.values())
+    new_files = [fname for fname in image_files if fname not in known]
+    for fname in new_files:
+        data[str(next_id)] = fname
+        next_id += 1
 
     # Write to JSON file
     with open(output_file, "w", encoding="utf-8") as f:
         json.dump(data, f, indent=4, ensure_ascii=False)
 
     print(f"✅ JSON đã được tạo: {output_file}")
-    print(f"Tổng số ảnh: {len(image_files)}")
+    print(f"Tổng số ảnh: {len(data)} ({len(new_files)} ảnh mới, {len(removed)} ảnh đã xóa)")
     
 if __name__ == "__main__":
     create_image_json("images", "image_path.json")
@@ -0,0 +1,22 @@
+import argparse
+import json
+import os
+from utils.path_table import PathTable
+from utils.thumbnails import ThumbnailCache, THUMB_SIZES
+
+parser = argparse.ArgumentParser(description="Tạo trước thumbnail (small / medium) cho toàn bộ keyframe")
+parser.add_argument("--image-json", default="image_path.json")
+parser.add_argument("--out", default=os.getenv("THUMBNAIL_DIR", "thumbnails"),
+                    help="Thư mục lưu thumbnail (giống THUMBNAIL_DIR của app_improved.py)")
+parser.add_argument("--sizes", nargs="+", default=list(THUMB_SIZES), choices=list(THUMB_SIZES))
+parser.add_argument("--workers", type=int, default=os.cpu_count() or 4,
+                    help="Số thread decode / resize song song")
+args = parser.parse_args()
+
+with open(args.image_json) as json_file:
+    json_dict = json.load(json_file)
+
+# Chỉ tạo ảnh còn thiếu hoặc ảnh gốc đã thay đổi (theo mtime), chạy lại nhiều lần vẫn an toàn
+thumbs = ThumbnailCache(PathTable.from_dict(json_dict), root=args.out)
+failed = thumbs.build_all(sizes=args.sizes, num_workers=args.workers)
+print("Done!" if failed == 0 else f"Done with {failed} errors.")
@@ -1,7 +1,39 @@
+import argparse
 import json
+import os
 from utils.query_processing import Translation
 from utils.faiss import Myfaiss
 image_path = "/home/nguyennn263/Documents/AIC/Dataset/MyKeyframes"
+
+parser = argparse.ArgumentParser(description="Build / update the FAISS index from keyframes")
+parser.add_argument("--full", action="store_true",
+                    help="Xoá index cũ và encode lại toàn bộ ảnh")
+parser.add_argument("--from-store", action="store_true",
+                    help="Chỉ build lại index từ embedding store, không chạy CLIP")
+parser.add_argument("--index-spec", default=None,
+                    help="flat | ivf-flat | ivf-pq | hnsw | opq-ivf-pq hoặc chuỗi faiss.index_factory "
+                         "(mặc định giữ loại index hiện tại, chưa có index thì ivf-flat)")
+parser.add_argument("--metric", default=None, choices=["l2", "ip", "cosine"],
+                    help="ip/cosine: chuẩn hoá vector và dùng inner product (nên dùng với ivf-sq8 / ivf-fp16); "
+                         "mặc định giữ metric của index hiện tại")
+parser.add_argument("--nlist", type=int, default=None,
+                    help="Số cluster IVF (mặc định tự chọn theo số ảnh)")
+parser.add_argument("--batch-size", type=int, default=64)
+parser.add_argument("--checkpoint-every", type=int, default=20,
+                    help="Flush embedding store sau mỗi N batch để có thể resume")
+parser.add_argument("--workers", type=int, default=4,
+                    help="Số thread decode/preprocess ảnh song song với CLIP")
+parser.add_argument("--prefetch", type=int, default=2,
+                    help="Số batch được decode trước")
+parser.add_argument("--collapse-threshold", type=float, default=None,
+                    help="Gộp các keyframe liên tiếp gần giống nhau (cosine >= ngưỡng, vd 0.95) trong mỗi video, "
+                         "chỉ index ảnh đại diện của mỗi nhóm")
+parser.add_argument("--max-group", type=int, default=32,
+                    help="Số keyframe tối đa trong một nhóm")
+parser.add_argument("--no-collapse", action="store_true",
+                    help="Bỏ các nhóm đã gộp, index lại toàn bộ keyframe")
+args = parser.parse_args()
+
 # Load image paths
 with open('image_path.json') as json_file:
     json_dict = json.load(json_file)
@@ -11,14 +43,37 @@ bin_file = 'faiss_normal_ViT.bin'
 
 # Khởi tạo Myfaiss
 MyFaiss = Myfaiss(bin_file, DictImagePath, 'cuda', Translation(), "ViT-B/32")
+collapse = {"collapse_threshold": args.collapse_threshold, "max_group": args.max_group}
 
-# Xoá index cũ (clear)
-print("Clearing old FAISS index...")
-MyFaiss.clear_index(dim=512)  # 512 là số chiều của ViT-B/32
+if args.no_collapse and MyFaiss.groups is not None:
+    print(f"Removing keyframe groups {MyFaiss.groups_file}, every keyframe will be indexed")
+    os.remove(MyFaiss.groups_file)
+    MyFaiss.groups = None
+    if not args.full:
+        args.from_store = True
 
-# Nạp lại toàn bộ hình ảnh vào FAISS
-print("Building new FAISS index from images...")
-MyFaiss.build_index_from_images()
+if args.full:
+    # Giữ loại index / metric hiện tại trước khi xoá index cũ
+    args.index_spec, args.metric = MyFaiss.index_config(args.index_spec, args.metric)
+    print(f"Index spec: {args.index_spec}, metric: {args.metric}")
+    # Xoá index cũ (clear)
+    print("Clearing old FAISS index...")
+    MyFaiss.clear_index(dim=512)  # 512 là số chiều của ViT-B/32
 
-print("Done! FAISS index has been rebuilt and saved.")
+    # Nạp lại toàn bộ hình ảnh vào FAISS
+    print("Building new FAISS index from images...")
+    MyFaiss.build_index_from_images(batch_size=args.batch_size, checkpoint_every=args.checkpoint_every,
+                                    num_workers=args.workers, prefetch=args.prefetch,
+                                    index_spec=args.index_spec, nlist=args.nlist, metric=args.metric, **collapse)
+elif args.from_store:
+    print(f"Building new FAISS index from stored embeddings in {MyFaiss.embedding_dir}...")
+    MyFaiss.build_index_from_store(index_spec=args.index_spec, nlist=args.nlist, metric=args.metric, **collapse)
+else:
+    # Chỉ encode ảnh mới / đã thay đổi và thêm vào index theo id trong image_path.json.
+    # Nếu job bị dừng giữa chừng, chạy lại lệnh này sẽ tiếp tục từ checkpoint cuối.
+    print("Updating FAISS index with new or changed images...")
+    MyFaiss.update_index_from_images(batch_size=args.batch_size, checkpoint_every=args.checkpoint_every,
+                                     num_workers=args.workers, prefetch=args.prefetch,
+                                     index_spec=args.index_spec, nlist=args.nlist, metric=args.metric, **collapse)
 
+print("Done! FAISS index has been rebuilt and saved.")
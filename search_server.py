@@ -0,0 +1,170 @@
+import argparse
+import asyncio
+import json
+import os
+import stat
+import numpy as np
+from dotenv import load_dotenv
+from utils.query_processing import translation_from_env
+from utils.faiss import Myfaiss
+from utils.batching import SearchBatcher
+from utils.query_cache import QueryCache
+from utils.path_table import PathTable
+from utils.executor import InferenceExecutor
+from utils.search_filter import make_filter
+from utils.search_protocol import FRAME, check_sizes, decode_frame, encode_frame, parse_address
+
+# Một process duy nhất giữ CLIP + FAISS index; các web worker (app_improved.py, app.py, ...) kết nối
+# qua utils/search_client.py khi đặt SEARCH_SERVER. Chạy: python search_server.py --listen unix:/tmp/myfaiss.sock
+load_dotenv()
+
+parser = argparse.ArgumentParser(description="Search server: CLIP + FAISS dùng chung cho nhiều web worker")
+parser.add_argument("--listen", default=os.getenv("SEARCH_SERVER", "unix:/tmp/myfaiss.sock"),
+                    help="unix:/đường/dẫn.sock hoặc host:port")
+parser.add_argument("--image-json", default="image_path.json")
+parser.add_argument("--bin-file", default="faiss_normal_ViT.bin")
+parser.add_argument("--device", default="cpu")
+args = parser.parse_args()
+
+# Ops a client may call; anything else is rejected
+OPS = {"search", "batch_search", "vector_search", "encode_texts", "encode_images", "get_vectors", "index_info", "stats"}
+
+
+def build_searcher():
+    with open(args.image_json) as json_file:
+        image_paths = PathTable.from_dict(json.load(json_file))
+    return Myfaiss(args.bin_file, image_paths, args.device, translation_from_env(), "ViT-B/32",
+                   nprobe=int(os.getenv("FAISS_NPROBE", "32")),
+                   ef_search=int(os.getenv("FAISS_EF_SEARCH", "128")),
+                   load_mode=os.getenv("FAISS_LOAD_MODE", "mmap"),
+                   query_cache=QueryCache(os.getenv("QUERY_CACHE_PATH", "query_cache.sqlite3"), namespace="ViT-B/32"))
+
+
+MyFaiss = build_searcher()
+SearchQueue = SearchBatcher(MyFaiss,
+                            max_batch=int(os.getenv("SEARCH_BATCH_MAX", "32")),
+                            max_wait_ms=float(os.getenv("SEARCH_BATCH_WAIT_MS", "5")),
+                            max_queue=int(os.getenv("SEARCH_QUEUE_MAX", "256")))
+Inference = InferenceExecutor(max_workers=int(os.getenv("INFERENCE_WORKERS", "2")),
+                              max_queue=int(os.getenv("INFERENCE_QUEUE", "32")), name="inference")
+
+
+def pack_results(results):
+    """Myfaiss result tuples -> (header result, arrays): scores / ids travel as raw arrays, paths as JSON."""
+    arrays = []
+    paths = []
+    for scores, ids, _, image_paths in results:
+        arrays.append(np.asarray(scores[0], dtype=np.float32))
+        arrays.append(np.asarray(ids, dtype=np.int64))
+        paths.append(list(image_paths))
+    return {"paths": paths}, arrays
+
+
+def search_kwargs(params):
+    return {"k": int(params.get("k", 100)), "nprobe": params.get("nprobe"), "ef_search": params.get("ef_search"),
+            "id_filter": make_filter(**params["filter"]) if params.get("filter") else None}
+
+
+async def dispatch(op, params, arrays):
+    if op == "search":
+        # Single query through the micro-batcher, so requests from every web worker share batches
+        if params.get("texts"):
+            kind, query = "text", params["texts"][0]
+        elif params.get("image_ids"):
+            kind, query = "image_id", int(params["image_ids"][0])
+        elif arrays:
+            kind, query = "image", arrays[0]
+        else:
+            raise ValueError("search needs a text, an image id or an image")
+        kw = search_kwargs(params)
+        result = await asyncio.wrap_future(SearchQueue.submit(kind, query, kw["k"], kw["nprobe"], kw["ef_search"],
+                                                              kw["id_filter"]))
+        return pack_results([result])
+    if op == "batch_search":
+        results = await Inference.run(MyFaiss.batch_search, texts=params.get("texts", []),
+                                      image_ids=params.get("image_ids", []), images=arrays, **search_kwargs(params))
+        return pack_results(results)
+    if op == "vector_search":
+        return pack_results(await Inference.run(MyFaiss.vector_search, arrays[0], **search_kwargs(params)))
+    if op == "encode_texts":
+        return {}, [await Inference.run(MyFaiss.encode_texts, params.get("texts", []))]
+    if op == "encode_images":
+        return {}, [await Inference.run(MyFaiss.encode_images, arrays)]
+    if op == "get_vectors":
+        return {}, [await Inference.run(MyFaiss.get_vectors, arrays[0])]
+    if op == "index_info":
+        return MyFaiss.index_info(), []
+    if op == "stats":
+        stats = SearchQueue.stats()
+        stats["server_inference"] = Inference.stats()
+        if MyFaiss.query_cache is not None:
+            stats["query_cache"] = MyFaiss.query_cache.stats()
+        return stats, []
+    raise ValueError(f"Unknown op {op!r}")
+
+
+async def respond(header, arrays, writer, write_lock):
+    request_id = header.get("id")
+    op = header.get("op")
+    try:
+        if op not in OPS:
+            raise ValueError(f"Op {op!r} is not allowed")
+        result, out_arrays = await dispatch(op, header.get("args") or {}, arrays)
+        frame = encode_frame({"id": request_id, "ok": True, "result": result}, out_arrays)
+    except Exception as e:
+        frame = encode_frame({"id": request_id, "ok": False, "error": str(e), "error_type": type(e).__name__})
+    async with write_lock:
+        if writer.is_closing():
+            return
+        try:
+            writer.write(frame)
+            await writer.drain()
+        except ConnectionError:
+            # ConnectionResetError / BrokenPipeError: the client went away mid-pipeline
+            pass
+
+
+async def serve_connection(reader, writer):
+    # Requests on one connection are handled concurrently (pipelining); answers carry the request id
+    write_lock = asyncio.Lock()
+    tasks = set()
+    try:
+        while True:
+            head_len, body_len = FRAME.unpack(await reader.readexactly(FRAME.size))
+            check_sizes(head_len, body_len)
+            header, arrays = decode_frame(await reader.readexactly(head_len), await reader.readexactly(body_len))
+            task = asyncio.create_task(respond(header, arrays, writer, write_lock))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+    except (asyncio.IncompleteReadError, ConnectionError):
+        pass
+    except Exception as e:
+        print(f"[Myfaiss] Dropping search client: {e}")
+    finally:
+        pending = list(tasks)
+        for task in pending:
+            task.cancel()
+        # retrieve every outcome, so a failed write is not reported as "Task exception was never retrieved"
+        await asyncio.gather(*pending, return_exceptions=True)
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except ConnectionError:
+            pass
+
+
+async def main():
+    family, target = parse_address(args.listen)
+    if family == "unix":
+        if os.path.exists(target) and stat.S_ISSOCK(os.stat(target).st_mode):
+            os.unlink(target)
+        server = await asyncio.start_unix_server(serve_connection, path=target, limit=2**20)
+    else:
+        server = await asyncio.start_server(serve_connection, host=target[0], port=target[1], limit=2**20)
+    print(f"[Myfaiss] Search server listening on {args.listen} ({MyFaiss.index_info()['index_vectors']} vectors)")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -5,9 +5,18 @@ class ImageSearchApp {
         this.imagesPerPage = 100;
         this.selectedList = this.loadSelectedList();
         this.totalImages = 0;
-        this.imageData = {};
+        this.imageData = {}; // id -> path, filled one browse page at a time
+        this.loadedPages = new Set();
+        this.useMockData = false;
         this.searchResults = [];
         this.searchCache = new Map(); // Cache cho search results
+        // Server-side ranking of the current search: {cursor, offset, hasMore}, pages via /api/results/{cursor}
+        this.resultCursor = null;
+        this.searchCursors = new Map(); // cache key -> resultCursor
+        this.videoInfoCache = new Map(); // video name -> fps / duration / size
+        // Relevance feedback: the last text / image-id query and the results marked not relevant
+        this.lastQuery = null;
+        this.rejectedIds = new Set();
         
         this.initEventListeners();
         this.loadInitialData();
@@ -100,6 +109,10 @@ class ImageSearchApp {
             this.clearSelectedList();
         });
 
+        document.getElementById('refine-btn').addEventListener('click', () => {
+            this.refineSearch();
+        });
+
         // Modal close with better UX
         document.querySelector('.close').addEventListener('click', () => {
             this.closeModal();
@@ -165,17 +178,14 @@ class ImageSearchApp {
             
             // Use fallback if API fails
             try {
-                const response = await fetch('/api/image_paths');
-                if (!response.ok) throw new Error(`HTTP ${response.status}`);
-                const data = await response.json();
-                
-                this.imageData = data.image_paths;
-                this.totalImages = Object.keys(this.imageData).length;
+                // Only the page being displayed is downloaded; the response tells us the catalog size
+                await this.fetchBrowsePage(this.currentPage);
             } catch (apiError) {
                 console.warn('API failed, using mock data:', apiError);
                 // Fallback to mock data for demo
                 this.imageData = this.generateMockData();
                 this.totalImages = Object.keys(this.imageData).length;
+                this.useMockData = true;
             }
             
             this.updateStatus(`Loaded ${this.totalImages} images`);
@@ -183,6 +193,7 @@ class ImageSearchApp {
         } catch (error) {
             console.error('Error loading initial data:', error);
             this.updateStatus('Error loading data - using demo mode');
+            this.useMockData = true;
             this.imageData = this.generateMockData();
             this.totalImages = Object.keys(this.imageData).length;
             this.loadBrowseMode();
@@ -191,6 +202,27 @@ class ImageSearchApp {
         }
     }
 
+    // Fetch one browse page of the catalog (columnar: video table + ids, video_idx, frames).
+    // The server sends ETag / Last-Modified, so revisiting a page is a cheap 304 revalidation.
+    async fetchBrowsePage(page) {
+        if (this.useMockData || this.loadedPages.has(page)) return;
+        const offset = (page - 1) * this.imagesPerPage;
+        const response = await fetch(`/api/image_paths?offset=${offset}&limit=${this.imagesPerPage}`);
+        if (!response.ok) throw new Error(`HTTP ${response.status}`);
+        const data = await response.json();
+
+        data.ids.forEach((id, i) => {
+            const v = data.video_idx[i];
+            const frame = String(data.frames[i]).padStart(data.widths[v], '0');
+            this.imageData[id] = `${data.videos[v]}/${frame}${data.exts[v]}`;
+        });
+        Object.entries(data.overrides).forEach(([id, path]) => {
+            this.imageData[id] = path;
+        });
+        this.totalImages = data.id_bound;
+        this.loadedPages.add(page);
+    }
+
     // Mock data for demo when API is not available
     generateMockData() {
         const mockData = {};
@@ -252,7 +284,7 @@ class ImageSearchApp {
         this.goToPage(this.currentPage);
     }
 
-    goToPage(page) {
+    async goToPage(page) {
         if (page < 1) page = 1;
         const maxPage = Math.ceil(this.totalImages / this.imagesPerPage);
         if (page > maxPage) page = maxPage;
@@ -265,6 +297,13 @@ class ImageSearchApp {
         document.getElementById('prev-page-btn').disabled = (page <= 1);
         document.getElementById('next-page-btn').disabled = (page >= maxPage);
 
+        try {
+            await this.fetchBrowsePage(page);
+        } catch (error) {
+            console.error('Error loading page:', error);
+            this.updateStatus(`Error loading page ${page}`);
+            return;
+        }
         this.displayImages(this.getBrowseImages(page));
         this.updateStatus(`Showing images ${(page-1) * this.imagesPerPage + 1} to ${Math.min(page * this.imagesPerPage, this.totalImages)}`);
     }
@@ -289,10 +328,12 @@ class ImageSearchApp {
     // Enhanced search methods with caching
     async searchById(imageId) {
         const cacheKey = `id_${imageId}`;
+        this.setLastQuery({ image_id: imageId });
         
         // Check cache first
         if (this.searchCache.has(cacheKey)) {
             this.searchResults = this.searchCache.get(cacheKey);
+            this.resultCursor = this.searchCursors.get(cacheKey) || null;
             this.displayResults(this.searchResults);
             this.updateStatus(`Found ${this.searchResults.length} similar images to ID ${imageId} (cached)`);
             return;
@@ -309,25 +350,25 @@ class ImageSearchApp {
                     },
                     body: JSON.stringify({
                         image_id: imageId,
-                        k: 500
+                        k: 500,
+                        page_size: this.imagesPerPage
                     })
                 });
 
                 if (!response.ok) throw new Error(`HTTP ${response.status}`);
                 const data = await response.json();
                 
-                this.searchResults = data.results.map(result => ({
-                    id: result.id,
-                    path: result.path,
-                    score: result.score
-                }));
+                this.searchResults = this.resultsFromColumns(data);
+                this.resultCursor = this.cursorFromPage(data);
             } catch (apiError) {
                 console.warn('API search failed, using mock results:', apiError);
                 this.searchResults = this.generateMockSearchResults(imageId);
+                this.resultCursor = null;
             }
 
             // Cache results
             this.searchCache.set(cacheKey, this.searchResults);
+            this.searchCursors.set(cacheKey, this.resultCursor);
             
             this.displayResults(this.searchResults);
             this.updateStatus(`Found ${this.searchResults.length} similar images to ID ${imageId}`);
@@ -343,10 +384,12 @@ class ImageSearchApp {
         if (!query.trim()) return;
 
         const cacheKey = `text_${query}`;
+        this.setLastQuery({ query: query });
         
         // Check cache first
         if (this.searchCache.has(cacheKey)) {
             this.searchResults = this.searchCache.get(cacheKey);
+            this.resultCursor = this.searchCursors.get(cacheKey) || null;
             this.displayResults(this.searchResults);
             this.updateStatus(`Found ${this.searchResults.length} images for query: "${query}" (cached)`);
             return;
@@ -363,25 +406,25 @@ class ImageSearchApp {
                     },
                     body: JSON.stringify({
                         query: query,
-                        k: 500
+                        k: 500,
+                        page_size: this.imagesPerPage
                     })
                 });
 
                 if (!response.ok) throw new Error(`HTTP ${response.status}`);
                 const data = await response.json();
                 
-                this.searchResults = data.results.map(result => ({
-                    id: result.id,
-                    path: result.path,
-                    score: result.score
-                }));
+                this.searchResults = this.resultsFromColumns(data);
+                this.resultCursor = this.cursorFromPage(data);
             } catch (apiError) {
                 console.warn('API text search failed, using mock results:', apiError);
                 this.searchResults = this.generateMockSearchResults(0, query);
+                this.resultCursor = null;
             }
 
             // Cache results
             this.searchCache.set(cacheKey, this.searchResults);
+            this.searchCursors.set(cacheKey, this.resultCursor);
 
             this.displayResults(this.searchResults);
             this.updateStatus(`Found ${this.searchResults.length} images for query: "${query}"`);
@@ -393,6 +436,119 @@ class ImageSearchApp {
         }
     }
 
+    // Search API returns parallel arrays {ids, paths, scores}; build one object per hit here
+    resultsFromColumns(data) {
+        return data.ids.map((id, i) => ({
+            id: id,
+            path: data.paths[i],
+            score: data.scores[i],
+            // > 1: this hit stands for a run of near-identical keyframes (see expandGroup)
+            groupSize: data.group_sizes ? data.group_sizes[i] : 1
+        }));
+    }
+
+    cursorFromPage(data) {
+        return data.cursor ? { cursor: data.cursor, offset: data.offset + data.ids.length, hasMore: data.has_more } : null;
+    }
+
+    // Next page of the current search from the server-side ranking (no new search)
+    async loadMoreResults() {
+        const state = this.resultCursor;
+        if (!state || !state.hasMore) return;
+        try {
+            this.showLoading(true, 'Loading more results...');
+            const response = await fetch(`/api/results/${state.cursor}?offset=${state.offset}&limit=${this.imagesPerPage}`);
+            if (response.status === 404) {
+                state.hasMore = false;
+                this.updateStatus('These results expired, run the search again to see more');
+                return;
+            }
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            this.searchResults.push(...this.resultsFromColumns(data));
+            state.offset = data.offset + data.ids.length;
+            state.hasMore = data.has_more;
+            this.displayResults(this.searchResults);
+            this.updateStatus(`Loaded ${this.searchResults.length} results`);
+        } catch (error) {
+            console.error('Error loading more results:', error);
+            this.updateStatus('Error loading more results');
+        } finally {
+            this.showLoading(false);
+        }
+    }
+
+    // A new query starts a new round of feedback
+    setLastQuery(query) {
+        this.lastQuery = query;
+        this.rejectedIds.clear();
+    }
+
+    // Drop a result and use it as a negative example for refineSearch
+    markNotRelevant(imageId) {
+        this.rejectedIds.add(imageId);
+        this.searchResults = this.searchResults.filter(result => result.id !== imageId);
+        this.displayResults(this.searchResults);
+        this.updateStatus(`Marked ID ${imageId} as not relevant (${this.rejectedIds.size} so far)`);
+    }
+
+    // Rocchio refinement: the last query moved towards the selected list and away from rejected results
+    async refineSearch() {
+        const positiveIds = this.selectedList.map(item => item.id);
+        if (!this.lastQuery && positiveIds.length === 0) {
+            this.updateStatus('Search first or add relevant images to the list to refine');
+            return;
+        }
+        try {
+            this.showLoading(true, 'Refining search...');
+            const response = await fetch('/api/refine', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({
+                    ...(this.lastQuery || {}),
+                    positive_ids: positiveIds,
+                    negative_ids: [...this.rejectedIds],
+                    k: 500,
+                    page_size: this.imagesPerPage
+                })
+            });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            this.searchResults = this.resultsFromColumns(data);
+            this.resultCursor = this.cursorFromPage(data);
+            this.displayResults(this.searchResults);
+            this.updateStatus(`Refined with ${positiveIds.length} relevant and ${this.rejectedIds.size} not relevant images`);
+        } catch (error) {
+            console.error('Error refining search:', error);
+            this.updateStatus('Error refining search');
+        } finally {
+            this.showLoading(false);
+        }
+    }
+
+    // Replace a group representative by all keyframes of its group, in frame order
+    async expandGroup(imageId) {
+        try {
+            const response = await fetch('/api/groups/expand', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ ids: [imageId] })
+            });
+            if (!response.ok) throw new Error(`HTTP ${response.status}`);
+            const data = await response.json();
+            const pos = this.searchResults.findIndex(result => result.id === imageId);
+            if (pos < 0) return;
+            const score = this.searchResults[pos].score;
+            const members = data.members[0].map((id, i) => ({ id: id, path: data.paths[0][i], score: score, groupSize: 1 }));
+            this.searchResults.splice(pos, 1, ...members);
+            this.displayResults(this.searchResults);
+            this.updateStatus(`Expanded ID ${imageId} into ${members.length} keyframes`);
+        } catch (error) {
+            console.error('Error expanding group:', error);
+            this.updateStatus('Error expanding group');
+        }
+    }
+
     // Mock search results for demo
     generateMockSearchResults(baseId, query = '') {
         const results = [];
@@ -428,6 +584,8 @@ class ImageSearchApp {
 
         try {
             this.showLoading(true);
+            // uploaded images are not in the index: refine from the selected list only
+            this.setLastQuery(null);
             const formData = new FormData();
             formData.append('image', file);
             formData.append('k', 500);
@@ -438,10 +596,8 @@ class ImageSearchApp {
             });
 
             const data = await response.json();
-            this.searchResults = data.results.map(result => ({
-                id: result.id,
-                path: result.path
-            }));
+            this.searchResults = this.resultsFromColumns(data);
+            this.resultCursor = null;
 
             this.displayResults(this.searchResults);
             this.updateStatus(`Found ${this.searchResults.length} similar images to uploaded image`);
@@ -508,16 +664,28 @@ class ImageSearchApp {
             const image = {
                 id: result.id,
                 path: result.path,
-                score: result.score
+                score: result.score,
+                groupSize: result.groupSize || 1
             };
             const card = this.createImageCard(image, index);
             fragment.appendChild(card);
         });
         
         grid.appendChild(fragment);
+
+        const hasMore = this.resultCursor && this.resultCursor.hasMore;
+        if (hasMore) {
+            const more = document.createElement('button');
+            more.className = 'btn-view';
+            more.textContent = 'Load more results';
+            more.onclick = () => this.loadMoreResults();
+            grid.appendChild(more);
+        }
         
         // Update status
-        document.getElementById('page-info').textContent = `Showing all ${results.length} search results`;
+        document.getElementById('page-info').textContent = hasMore
+            ? `Showing first ${results.length} search results`
+            : `Showing all ${results.length} search results`;
         
         // Initialize lazy loading
         this.initLazyLoading();
@@ -558,9 +726,11 @@ class ImageSearchApp {
         
         // Ensure correct image path - add leading slash if not present
         const imagePath = image.path.startsWith('/') ? image.path : '/' + image.path;
+        // Grid shows the small cached thumbnail; View opens the full-resolution keyframe
+        const thumbPath = this.useMockData ? imagePath : `/api/thumb/${image.id}?size=small`;
         
         card.innerHTML = `
-            <img data-src="${imagePath}" 
+            <img data-src="${thumbPath}" 
                  src="data:image/svg+xml,%3Csvg xmlns='http://www.w3.org/2000/svg' width='250' height='200'%3E%3Crect width='100%25' height='100%25' fill='%23f0f0f0'/%3E%3Ctext x='50%25' y='50%25' text-anchor='middle' dy='.3em' fill='%23999'%3ELoading...%3C/text%3E%3C/svg%3E"
                  alt="Image ${image.id}" 
                  class="lazy"
@@ -581,9 +751,15 @@ class ImageSearchApp {
                     <button class="btn-remove-similar" onclick="app.removeSimilar(${image.id})">
                         🗑️ Remove similar
                     </button>
+                    <button class="btn-remove-similar" onclick="app.markNotRelevant(${image.id})">
+                        👎 Not relevant
+                    </button>
                     <button class="btn-view" onclick="app.viewImage('${image.path}')">
                         👁️ View
                     </button>
+                    ${image.groupSize > 1 ? `<button class="btn-view" onclick="app.expandGroup(${image.id})">
+                        🎞️ +${image.groupSize - 1} frames
+                    </button>` : ''}
                 </div>
             </div>
         `;
@@ -733,6 +909,7 @@ class ImageSearchApp {
 
             this.updateStatus('Finding similar images to remove...');
             
+            // The server compares the stored vectors and returns which of the current results to keep
             const response = await fetch('/api/remove_similar', {
                 method: 'POST',
                 headers: {
@@ -740,39 +917,16 @@ class ImageSearchApp {
                 },
                 body: JSON.stringify({
                     image_id: imageId,
-                    k: 100  // Get top 100 similar images
+                    candidate_ids: this.searchResults.map(result => result.id)
                 })
             });
 
             if (!response.ok) throw new Error(`HTTP ${response.status}`);
             const data = await response.json();
 
-            // Filter current search results by removing similar images
-            const similarIdsSet = new Set(data.similar_image_ids);
+            const keptIds = new Set(data.kept_ids);
             const originalCount = this.searchResults.length;
-            
-            // Remove similar images from current results (keep about 2/3)
-            // Sort by similarity and remove top 1/3 most similar
-            const currentResults = [...this.searchResults];
-            const resultsWithSimilarity = currentResults.map(result => ({
-                ...result,
-                isSimilar: similarIdsSet.has(result.id)
-            }));
-            
-            // Separate similar and non-similar images
-            const similarImages = resultsWithSimilarity.filter(r => r.isSimilar);
-            const nonSimilarImages = resultsWithSimilarity.filter(r => !r.isSimilar);
-            
-            // Remove about 1/3 of the most similar images
-            const toRemove = Math.floor(similarImages.length * 0.33);
-            const keptSimilarImages = similarImages.slice(toRemove); // Keep the less similar ones
-            
-            // Combine kept images
-            const filteredResults = [...nonSimilarImages, ...keptSimilarImages].map(item => ({
-                id: item.id,
-                path: item.path,
-                score: item.score
-            }));
+            const filteredResults = this.searchResults.filter(result => keptIds.has(result.id));
 
             // Display filtered results
             this.searchResults = filteredResults;
@@ -795,14 +949,37 @@ class ImageSearchApp {
 
     async viewClip(imageId, video, frame) {
         try {
+            // Keyframe index gives the real timestamp (map-keyframes CSV or frame / video fps)
+            try {
+                const response = await fetch('/api/keyframes/lookup', {
+                    method: 'POST',
+                    headers: { 'Content-Type': 'application/json' },
+                    body: JSON.stringify({ ids: [imageId] })
+                });
+                if (response.ok) {
+                    const data = await response.json();
+                    const seconds = data.seconds[0];
+                    if (data.video[0] && seconds >= 0) {
+                        window.open(`/vid?video=${video}&frame=${frame}&time=${seconds}`, '_blank');
+                        this.updateStatus(`Opening video ${video} at frame ${data.frame_idx[0]} (${seconds.toFixed(2)}s)`);
+                        return;
+                    }
+                }
+            } catch (error) {
+                console.warn('Keyframe lookup failed, using FPS estimate:', error);
+            }
+
             // Get actual video FPS from API
             let fps = 25; // Default fallback
             try {
-                const response = await fetch(`/api/video_info/${video}`);
-                if (response.ok) {
-                    const videoInfo = await response.json();
-                    fps = videoInfo.fps || 25;
+                if (!this.videoInfoCache.has(video)) {
+                    const response = await fetch(`/api/video_info/${video}`);
+                    if (response.ok) {
+                        this.videoInfoCache.set(video, await response.json());
+                    }
                 }
+                const videoInfo = this.videoInfoCache.get(video);
+                fps = (videoInfo && videoInfo.fps) || 25;
             } catch (error) {
                 console.warn('Could not get video FPS, using default 25:', error);
             }
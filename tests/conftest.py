@@ -0,0 +1,5 @@
+import os
+import sys
+
+# tests import the repo's modules as `utils.x`, like the apps do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,86 @@
+import threading
+
+import numpy as np
+import pytest
+
+from utils.batching import SearchBatcher
+from utils.executor import QueueFull
+
+
+class FakeSearcher:
+    """batch_search that records its calls; a negative image id fails the whole call."""
+    def __init__(self):
+        self.calls = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def batch_search(self, texts=(), image_ids=(), images=(), k=100, nprobe=None, ef_search=None, id_filter=None):
+        self.release.wait()
+        self.calls.append({"texts": list(texts), "image_ids": list(image_ids), "k": k, "nprobe": nprobe})
+        if any(i < 0 for i in image_ids):
+            raise KeyError("unknown image id")
+        results = []
+        for query in list(texts) + list(image_ids):
+            ids = np.arange(k, dtype=np.int64)
+            paths = [f"{query}/{i}" for i in range(k)]
+            results.append(([np.linspace(1, 0, k)], ids, paths, paths))
+        return results
+
+
+@pytest.fixture
+def searcher():
+    return FakeSearcher()
+
+
+def test_requests_with_the_same_parameters_share_one_call(searcher):
+    batcher = SearchBatcher(searcher, max_batch=8, max_wait_ms=200)
+    try:
+        futures = [batcher.submit("text", "cat", 5), batcher.submit("image_id", 3, 2), batcher.submit("text", "dog", 3)]
+        results = [future.result(timeout=5) for future in futures]
+    finally:
+        batcher.close()
+    assert len(searcher.calls) == 1
+    assert searcher.calls[0]["texts"] == ["cat", "dog"] and searcher.calls[0]["k"] == 5
+    # every caller gets its own query's hits, cut to its own k
+    assert results[0][3] == ["cat/0", "cat/1", "cat/2", "cat/3", "cat/4"]
+    assert results[1][3] == ["3/0", "3/1"]
+    assert len(results[2][1]) == 3 and results[2][3][0] == "dog/0"
+    assert batcher.stats()["requests"] == 3
+
+
+def test_different_search_parameters_are_not_mixed(searcher):
+    batcher = SearchBatcher(searcher, max_batch=8, max_wait_ms=200)
+    try:
+        futures = [batcher.submit("text", "a", 2, nprobe=8), batcher.submit("text", "b", 2, nprobe=64)]
+        for future in futures:
+            future.result(timeout=5)
+    finally:
+        batcher.close()
+    assert sorted(call["nprobe"] for call in searcher.calls) == [8, 64]
+
+
+def test_a_failing_query_does_not_fail_the_batch(searcher):
+    batcher = SearchBatcher(searcher, max_batch=8, max_wait_ms=200)
+    try:
+        good, bad = batcher.submit("image_id", 1, 2), batcher.submit("image_id", -1, 2)
+        assert good.result(timeout=5)[3] == ["1/0", "1/1"]
+        with pytest.raises(KeyError):
+            bad.result(timeout=5)
+    finally:
+        batcher.close()
+    # one batched call, then one retry per request
+    assert [call["image_ids"] for call in searcher.calls] == [[1, -1], [1], [-1]]
+
+
+def test_full_queue_rejects_new_requests(searcher):
+    searcher.release.clear()
+    batcher = SearchBatcher(searcher, max_batch=1, max_wait_ms=0, max_queue=1)
+    try:
+        batcher.submit("text", "busy", 1)  # taken by the worker, which is held
+        with pytest.raises(QueueFull):
+            for _ in range(3):
+                batcher.submit("text", "waiting", 1)
+        assert batcher.stats()["rejected"] == 1
+    finally:
+        searcher.release.set()
+        batcher.close()
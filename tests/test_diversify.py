@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from utils.diversify import diversify, mmr, near_duplicates, similar_to
+
+
+@pytest.fixture
+def candidates():
+    """Ranked hits: three near-copies of one shot first, then two other shots."""
+    rng = np.random.default_rng(0)
+    shot_a, shot_b, shot_c = rng.normal(size=(3, 16)).astype(np.float32)
+    vectors = np.stack([shot_a, shot_a + 0.01, shot_a + 0.02, shot_b, shot_c])
+    scores = np.array([0.9, 0.89, 0.88, 0.8, 0.7], dtype=np.float32)
+    return vectors, scores
+
+
+def test_mmr_spreads_picks_across_shots(candidates):
+    vectors, scores = candidates
+    picks = mmr(vectors, scores, 3, diversity=0.5)
+    assert picks.tolist() == [0, 3, 4]
+    # without diversity it is the plain ranking
+    assert mmr(vectors, scores, 3, diversity=0.0).tolist() == [0, 1, 2]
+
+
+def test_mmr_understands_distances(candidates):
+    vectors, scores = candidates
+    distances = 1.0 - scores  # L2 indexes: lower is better
+    assert mmr(vectors, distances, 1).tolist() == [0]
+
+
+def test_near_duplicates_keep_the_best_ranked_copy(candidates):
+    vectors, _ = candidates
+    assert near_duplicates(vectors, threshold=0.95).tolist() == [0, 3, 4]
+    assert near_duplicates(vectors, threshold=0.95, k=2).tolist() == [0, 3]
+    assert similar_to(vectors[0], vectors, threshold=0.95).tolist() == [True, True, True, False, False]
+
+
+def test_diversify_dispatches_and_rejects_unknown_methods(candidates):
+    vectors, scores = candidates
+    assert diversify(vectors, scores, 2, method="dedup").tolist() == [0, 3]
+    assert len(diversify(vectors, scores, 10)) == 5
+    with pytest.raises(ValueError):
+        diversify(vectors, scores, 2, method="random")
@@ -0,0 +1,93 @@
+import threading
+
+import numpy as np
+import pytest
+
+from utils.embedding_store import EmbeddingStore, VectorNotFound
+from utils.index_factory import make_index
+
+DIM = 8
+
+
+@pytest.fixture
+def store(tmp_path):
+    return EmbeddingStore(str(tmp_path / "store"), dim=DIM, shard_size=16)
+
+
+def test_rows_round_trip_across_shards(store, tmp_path):
+    ids = np.array([3, 15, 16, 40], dtype=np.int64)
+    feats = np.arange(len(ids) * DIM, dtype=np.float32).reshape(len(ids), DIM)
+    store.write(ids, feats)
+    store.flush()
+    assert store.read(ids[::-1]).tolist() == feats[::-1].tolist()
+    assert store.contains([3, 4, 40, 100]).tolist() == [True, False, True, False]
+    assert store.ids().tolist() == ids.tolist()
+    assert len(store) == 4
+
+    reopened = EmbeddingStore(str(tmp_path / "store"), readonly=True)
+    assert (reopened.dim, reopened.shard_size) == (DIM, 16)
+    assert reopened.read(ids).tolist() == feats.tolist()
+    with pytest.raises(PermissionError):
+        reopened.write(ids, feats)
+    with pytest.raises(KeyError):
+        reopened.read([4])
+
+
+def test_written_rows_stay_dirty_until_marked_clean(store):
+    store.write([1, 2], np.ones((2, DIM)))
+    assert store.dirty_ids().tolist() == [1, 2]
+    store.mark_clean([1])
+    assert store.dirty_ids().tolist() == [2]
+    store.mark_clean()
+    assert store.dirty_ids().tolist() == []
+    # re-encoding a clean row makes it dirty again
+    store.write([1], np.zeros((1, DIM)))
+    assert store.dirty_ids().tolist() == [1]
+
+
+def _myfaiss(store, index):
+    pytest.importorskip("clip")
+    from utils.faiss import Myfaiss
+    myfaiss = object.__new__(Myfaiss)
+    myfaiss.store, myfaiss.index, myfaiss.groups = store, index, None
+    myfaiss._reconstruct_lock = threading.Lock()
+    return myfaiss
+
+
+def test_get_vectors_reconstructs_ids_missing_from_the_store(store):
+    rng = np.random.default_rng(0)
+    feats = rng.normal(size=(64, DIM)).astype(np.float32)
+    ids = np.arange(64, dtype=np.int64)
+    index = make_index("ivf-flat", DIM, len(feats), nlist=4)
+    index.train(feats)
+    index.add_with_ids(feats, ids)
+    store.write(ids[:32], feats[:32])
+    myfaiss = _myfaiss(store, index)
+
+    # IVF indexes have no direct map until get_vectors needs one
+    assert np.allclose(myfaiss.get_vectors([5, 40, 63]), feats[[5, 40, 63]])
+    with pytest.raises(VectorNotFound, match="1000"):
+        myfaiss.get_vectors([1, 1000])
+
+
+def test_get_vectors_without_an_index_needs_a_complete_store(store):
+    store.write([0], np.ones((1, DIM)))
+    myfaiss = _myfaiss(store, None)
+    assert myfaiss.get_vectors([0]).shape == (1, DIM)
+    with pytest.raises(VectorNotFound):
+        myfaiss.get_vectors([0, 1])
+
+
+def test_stamps_tell_which_rows_need_encoding(store):
+    store.write([0, 1], np.ones((2, DIM)), stamps=[100, 200])
+    store.write([2], np.ones((1, DIM)))  # written before stamps were kept
+    assert store.stamps([0, 1, 2, 3]).tolist() == [100, 200, 0, -1]
+
+
+def test_discarded_rows_leave_the_store(store):
+    store.write([0, 1, 20], np.ones((3, DIM)), stamps=[1, 2, 3])
+    store.mark_clean()
+    store.discard([1, 20])
+    assert store.ids().tolist() == [0]
+    assert store.stamps([1, 20]).tolist() == [-1, -1]
+    assert store.dirty_ids().tolist() == []
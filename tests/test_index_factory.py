@@ -0,0 +1,72 @@
+import faiss
+import numpy as np
+import pytest
+
+from utils.index_factory import (INDEX_SPECS, auto_nlist, describe_index, make_index, normalize, read_index,
+                                 search_parameters, uses_inner_product, write_index)
+
+DIM = 16
+
+
+@pytest.mark.parametrize("metric", ["l2", "cosine"])
+@pytest.mark.parametrize("index_spec", sorted(INDEX_SPECS))
+def test_describe_index_names_every_spec(tmp_path, index_spec, metric):
+    index = make_index(index_spec, DIM, 10000, metric=metric)
+    assert describe_index(index) == (index_spec, metric)
+    # a loaded index has lost the wrapper types (OPQ comes back as a plain LinearTransform)
+    path = str(tmp_path / "index.bin")
+    write_index(index, path)
+    loaded, _ = read_index(path)
+    assert describe_index(loaded) == (index_spec, metric)
+
+
+def test_describe_index_keeps_other_factory_strings():
+    index = faiss.index_factory(DIM, "IVF64,SQ4", faiss.METRIC_L2)
+    assert describe_index(index) == ("IVF{nlist},SQ4", "l2")
+
+
+def test_describe_index_without_a_real_index():
+    assert describe_index(None) == (None, None)
+    # clear_index() placeholder
+    assert describe_index(faiss.IndexFlatIP(DIM)) == (None, "cosine")
+
+
+def test_describe_index_refuses_to_guess():
+    with pytest.raises(ValueError, match="--index-spec"):
+        describe_index(faiss.IndexPreTransform(faiss.RandomRotationMatrix(DIM, DIM), faiss.IndexFlatL2(DIM)))
+
+
+def test_auto_nlist_scales_with_the_corpus():
+    assert auto_nlist(0) == 1
+    assert auto_nlist(100) == 2  # capped: every centroid needs 39 training points
+    assert auto_nlist(1_000_000) == 4096
+    sizes = [auto_nlist(n) for n in (10_000, 100_000, 1_000_000, 10_000_000)]
+    assert sizes == sorted(sizes)
+    assert all(size & (size - 1) == 0 for size in sizes)
+
+
+def test_search_parameters_per_index_type():
+    assert search_parameters(make_index("flat", DIM, 1000)) is None
+    ivf = make_index("ivf-flat", DIM, 1000, nlist=16)
+    assert search_parameters(ivf) is None
+    # nprobe cannot exceed the number of lists
+    assert search_parameters(ivf, nprobe=64).nprobe == 16
+    assert search_parameters(ivf, nprobe=4).nprobe == 4
+    assert search_parameters(make_index("hnsw", DIM, 1000), ef_search=256).efSearch == 256
+    with pytest.raises(ValueError):
+        search_parameters(ivf, nprobe=0)
+
+
+@pytest.mark.parametrize("index_spec", ["flat", "flat-fp16", "hnsw"])
+def test_cosine_indexes_rank_by_cosine_similarity(index_spec):
+    rng = np.random.default_rng(0)
+    # raw CLIP-like vectors of very different norms
+    feats = (rng.normal(size=(500, DIM)) * rng.uniform(0.1, 10, size=(500, 1))).astype(np.float32)
+    query = rng.normal(size=(1, DIM)).astype(np.float32)
+    index = make_index(index_spec, DIM, len(feats), metric="cosine")
+    assert uses_inner_product(index)
+    index.add_with_ids(normalize(feats), np.arange(len(feats), dtype=np.int64))
+    _, hits = index.search(normalize(query), 5)
+    cosine = (feats @ query[0]) / np.linalg.norm(feats, axis=1)
+    assert hits[0].tolist() == np.argsort(-cosine)[:5].tolist()
+    assert not uses_inner_product(make_index(index_spec, DIM, len(feats), metric="l2"))
@@ -0,0 +1,39 @@
+import numpy as np
+
+from utils.embedding_store import EmbeddingStore
+from utils.keyframe_groups import KeyframeGroups
+from utils.path_table import PathTable
+
+
+def test_runs_of_similar_frames_collapse_per_video(tmp_path):
+    rng = np.random.default_rng(0)
+    shot_a, shot_b, shot_c = rng.normal(size=(3, 16)).astype(np.float32)
+    noise = rng.normal(size=(9, 16)).astype(np.float32) * 0.01
+    # ids 0-5 are video 1 (shots a a a b b a); 6-8 video 2 continues shot a, so it groups on its own
+    vectors = np.stack([shot_a, shot_a, shot_a, shot_b, shot_b, shot_a, shot_a, shot_a, shot_c]) + noise
+    paths = {i: f"images/L01_V001/{i:04d}.jpg" for i in range(6)}
+    paths.update({i: f"images/L01_V002/{i:04d}.jpg" for i in range(6, 9)})
+    store = EmbeddingStore(str(tmp_path / "store"), dim=16)
+    store.write(np.arange(9), vectors)
+    groups = KeyframeGroups.build(PathTable.from_dict(paths), store, threshold=0.95, verbose=False)
+
+    assert [sorted(members.tolist()) for members in groups.expand(groups.reps)] == [[0, 1, 2], [3, 4], [5], [6, 7], [8]]
+    rep = groups.representative(np.arange(9))
+    assert len(set(rep[:3].tolist())) == 1 and rep[0] in (0, 1, 2)
+    assert groups.indexed(np.arange(9)).sum() == 5
+    assert groups.group_sizes(groups.reps).tolist() == [3, 2, 1, 2, 1]
+    # ids outside the groups stand for themselves
+    assert groups.representative([100]).tolist() == [100] and groups.expand([100])[0].tolist() == [100]
+
+    path = str(tmp_path / "groups.npz")
+    groups.save(path)
+    loaded = KeyframeGroups.load(path)
+    assert loaded.reps.tolist() == groups.reps.tolist() and loaded.threshold == 0.95
+
+
+def test_max_group_bounds_slow_pans(tmp_path):
+    paths = {i: f"images/L01_V001/{i:04d}.jpg" for i in range(10)}
+    store = EmbeddingStore(str(tmp_path / "store"), dim=4)
+    store.write(np.arange(10), np.ones((10, 4)))
+    groups = KeyframeGroups.build(PathTable.from_dict(paths), store, max_group=4, verbose=False)
+    assert groups.group_sizes(groups.reps).tolist() == [4, 4, 2]
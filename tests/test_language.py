@@ -0,0 +1,19 @@
+import pytest
+
+from utils.language import is_vietnamese
+
+
+@pytest.mark.parametrize("text", ["người đàn ông đang chạy", "xe máy", "Đường phố", "bản tin thời sự"])
+def test_vietnamese_letters_decide(text):
+    assert is_vietnamese(text)
+
+
+@pytest.mark.parametrize("text", ["a man riding a bicycle", "news anchor in a studio", "café", "東京タワー", "cat"])
+def test_other_queries_are_not_vietnamese(text):
+    assert not is_vietnamese(text)
+
+
+def test_vietnamese_without_diacritics():
+    assert is_vietnamese("nguoi dan ong dang chay tren duong")
+    assert is_vietnamese("mot chiec xe mau do")
+    assert not is_vietnamese("nguoi dan ong dang chay tren duong", ascii_fallback=False)
@@ -0,0 +1,25 @@
+import json
+
+from make_json_dir import create_image_json
+
+
+def _touch(root, *names):
+    for name in names:
+        path = root / "images" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"")
+
+
+def test_ids_stay_stable_when_images_come_and_go(tmp_path):
+    output = tmp_path / "image_path.json"
+    _touch(tmp_path, "L01_V001/0001.jpg", "L01_V001/0002.jpg", "L01_V002/0001.jpg")
+    create_image_json(str(tmp_path / "images"), str(output))
+    first = json.loads(output.read_text(encoding="utf-8"))
+    assert first == {"0": "images/L01_V001/0001.jpg", "1": "images/L01_V001/0002.jpg", "2": "images/L01_V002/0001.jpg"}
+
+    (tmp_path / "images" / "L01_V002" / "0001.jpg").unlink()
+    _touch(tmp_path, "L01_V001/0003.jpg")
+    create_image_json(str(tmp_path / "images"), str(output))
+    second = json.loads(output.read_text(encoding="utf-8"))
+    # the deleted image is dropped and its id is not reused
+    assert second == {"0": "images/L01_V001/0001.jpg", "1": "images/L01_V001/0002.jpg", "3": "images/L01_V001/0003.jpg"}
@@ -0,0 +1,35 @@
+import numpy as np
+
+from utils.path_table import PathTable
+
+PATHS = {
+    "0": "images/keyframes/L01_V001/000000.jpg",
+    "1": "images/keyframes/L01_V001/000025.jpg",
+    "3": "images/keyframes/L01_V002/0125.jpg",
+    "4": "images/keyframes/L01_V002/0150.png",  # another extension than its directory
+    "5": "images/extra/poster.jpg",
+}
+
+
+def test_reads_like_the_dict_it_replaces():
+    table = PathTable.from_dict(PATHS)
+    assert dict(table.items()) == {int(k): v for k, v in PATHS.items()}
+    assert len(table) == 5 and table.keys().tolist() == [0, 1, 3, 4, 5]
+    assert 2 not in table and table.get(2) is None and table.get(99, "missing") == "missing"
+    assert table.id_bound == 6
+    assert table.overrides == {4: PATHS["4"], 5: PATHS["5"]}
+
+
+def test_vectorized_lookups_of_search_results():
+    table = PathTable.from_dict(PATHS)
+    hits = np.array([[3, -1, 2, 5, 100]])
+    assert table.valid(hits).tolist() == [[True, False, False, True, False]]
+    assert table.paths([3, 0, 5]) == [PATHS["3"], PATHS["0"], PATHS["5"]]
+
+
+def test_columns_of_a_page():
+    page = PathTable.from_dict(PATHS).columns(1, 5)
+    assert page["videos"] == ["images/keyframes/L01_V001", "images/keyframes/L01_V002"]
+    assert page["widths"] == [6, 4] and page["exts"] == [".jpg", ".jpg"]
+    assert page["ids"] == [1, 3] and page["video_idx"] == [0, 1] and page["frames"] == [25, 125]
+    assert page["overrides"] == {"4": PATHS["4"]}
@@ -0,0 +1,67 @@
+import sqlite3
+
+import numpy as np
+
+from utils.query_cache import QueryCache
+
+
+def test_memory_level_is_an_lru():
+    cache = QueryCache(max_memory_items=2)
+    cache.put_translation("con mèo", "cat")
+    cache.put_translation("con chó", "dog")
+    assert cache.get_translation("  Con   MÈO ") == "cat"  # keys are normalized
+    cache.put_translation("con gà", "chicken")  # evicts "con chó", the least recently used
+    assert cache.get_translation("con chó") is None
+    assert cache.get_translation("con mèo") == "cat"
+    stats = cache.stats()
+    assert stats["evictions"]["memory"] == 1
+
+
+def test_disk_level_survives_restarts_and_is_namespaced(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    embedding = np.arange(4, dtype=np.float32)
+    first = QueryCache(path, namespace="ViT-B/32")
+    first.put_translation("con mèo", "cat")
+    first.put_embedding("cat", embedding)
+
+    second = QueryCache(path, namespace="ViT-B/32")
+    assert second.get_translation("con mèo") == "cat"
+    assert second.get_embedding("cat").tolist() == embedding.tolist()
+    assert QueryCache(path, namespace="ViT-L/14").get_embedding("cat") is None
+
+
+def test_disk_level_evicts_least_recently_used_rows(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = QueryCache(path, max_memory_items=1, max_disk_items=10, touch_after=0)
+    for i in range(10):
+        cache.put_translation(f"q{i}", f"t{i}")
+    cache.get_translation("q0")  # queues a new access time for q0
+    cache.put_translation("q10", "t10")  # over the limit: the oldest 10% go
+    assert cache.stats()["evictions"]["disk"] == 2
+    reopened = QueryCache(path)
+    assert reopened.get_translation("q0") == "t0"
+    assert reopened.get_translation("q1") is None
+    assert reopened.get_translation("q2") is None
+    assert reopened.get_translation("q3") == "t3"
+
+
+def test_locked_database_falls_back_to_memory(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = QueryCache(path, touch_after=0)
+    cache.put_translation("q0", "t0")
+    cache._memory.clear()
+    assert cache.get_translation("q0") == "t0"  # queues an access time
+    other = sqlite3.connect(path)
+    other.execute("BEGIN EXCLUSIVE")
+    cache._disk.execute("PRAGMA busy_timeout=50")
+    try:
+        cache.put_translation("q1", "t1")
+        assert cache.get_translation("q1") == "t1"
+        assert cache.stats()["disk_errors"] == 1
+        # the rolled-back insert keeps the queued access time for the next one
+        assert "q0" in cache._touched["translation"]
+    finally:
+        other.rollback()
+        other.close()
+    cache.put_translation("q2", "t2")
+    assert cache._touched["translation"] == {}
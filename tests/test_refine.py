@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+from utils.refine import rocchio
+
+
+def _cos(a, b):
+    a, b = np.ravel(a), np.ravel(b)
+    return float(a @ b / (np.linalg.norm(a) * np.linalg.norm(b)))
+
+
+def test_feedback_moves_the_query_toward_positives_and_away_from_negatives():
+    rng = np.random.default_rng(0)
+    query, positive, negative = rng.normal(size=(3, 16)).astype(np.float32)
+    refined = rocchio(query, positives=[positive], negatives=[negative])
+    assert refined.shape == (1, 16) and refined.dtype == np.float32
+    assert _cos(refined, positive) > _cos(query, positive)
+    assert _cos(refined, negative) < _cos(query, negative)
+    # scaled back to the norm of the query, so L2 indexes of raw vectors still fit
+    assert np.linalg.norm(refined) == pytest.approx(np.linalg.norm(query), rel=1e-5)
+
+
+def test_long_vectors_do_not_dominate():
+    a, b = np.eye(2, dtype=np.float32)
+    refined = rocchio(positives=[a * 100, b])
+    assert _cos(refined, a) == pytest.approx(_cos(refined, b))
+    assert np.linalg.norm(refined) == pytest.approx(50.5)
+
+
+def test_refinement_needs_a_query_or_a_positive():
+    with pytest.raises(ValueError):
+        rocchio(negatives=[np.ones(4)])
@@ -0,0 +1,58 @@
+import types
+
+import numpy as np
+import pytest
+
+import utils.result_cache
+from utils.result_cache import ENTRY_OVERHEAD_BYTES, ResultCache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = types.SimpleNamespace(value=1000.0)
+    monkeypatch.setattr(utils.result_cache, "time", types.SimpleNamespace(monotonic=lambda: now.value))
+    return now
+
+
+def _put(cache, n=10):
+    return cache.put(np.zeros(4), np.arange(n), np.linspace(1, 0, n))
+
+
+def test_ttl_restarts_on_every_access(clock):
+    cache = ResultCache(ttl=60)
+    cursor = _put(cache)
+    clock.value += 50
+    assert cache.get(cursor) is not None
+    clock.value += 50  # 100 s after put, 50 s after the last access
+    assert cache.get(cursor).depth == 10
+    clock.value += 61
+    assert cache.get(cursor) is None
+    assert cache.stats()["expired"] == 1 and cache.stats()["cursors"] == 0
+
+
+def test_least_recently_used_cursors_are_evicted_by_size(clock):
+    entry_bytes = 4 * 4 + 10 * 8 + 10 * 4 + ENTRY_OVERHEAD_BYTES
+    cache = ResultCache(max_bytes=2 * entry_bytes)
+    first, second = _put(cache), _put(cache)
+    cache.get(first)
+    third = _put(cache)
+    assert cache.get(second) is None
+    assert cache.get(first) is not None and cache.get(third) is not None
+    assert cache.stats()["evicted"] == 1 and cache.stats()["bytes"] == 2 * entry_bytes
+
+
+def test_deeper_pages_append_only_new_hits(clock):
+    cache = ResultCache()
+    cursor = cache.put(np.zeros(4), [5, 3, 9], [0.9, 0.8, 0.7])
+    calls = []
+
+    def search(k):
+        calls.append(k)
+        # the deeper search ranks the top differently and returns fewer than asked
+        return [3, 5, 7, 9, 1], [0.85, 0.84, 0.75, 0.7, 0.6]
+
+    entry = cache.ensure_depth(cursor, cache.get(cursor), 6, search)
+    assert entry.ids.tolist() == [5, 3, 9, 7, 1]
+    assert entry.exhausted
+    cache.ensure_depth(cursor, entry, 8, search)
+    assert calls == [6]
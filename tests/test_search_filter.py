@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from utils.embedding_store import EmbeddingStore
+from utils.index_factory import make_index, set_default_search_parameters
+from utils.path_table import PathTable
+from utils.search_filter import VideoIdRanges, filtered_search, make_filter
+
+NUM_VIDEOS = 20
+FRAMES = 100
+DIM = 32
+K = 10
+
+
+@pytest.fixture(scope="module")
+def corpus(tmp_path_factory):
+    """Keyframes of each video clustered around their own direction, like shots of one video."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(NUM_VIDEOS, DIM)).astype(np.float32) * 10
+    feats = np.repeat(centers, FRAMES, axis=0) + rng.normal(size=(NUM_VIDEOS * FRAMES, DIM)).astype(np.float32)
+    ids = np.arange(len(feats), dtype=np.int64)
+    paths = {int(i): f"images/keyframes/L01_V{i // FRAMES:03d}/{i % FRAMES:06d}.jpg" for i in ids}
+    store = EmbeddingStore(str(tmp_path_factory.mktemp("store")), dim=DIM)
+    store.write(ids, feats)
+    store.flush()
+    return feats, ids, store, VideoIdRanges(PathTable.from_dict(paths)), centers
+
+
+@pytest.mark.parametrize("index_spec", ["ivf-flat", "hnsw"])
+def test_single_video_filter_returns_k_hits(corpus, index_spec):
+    feats, ids, store, video_ids, centers = corpus
+    index = make_index(index_spec, DIM, len(feats))
+    index.train(feats)
+    index.add_with_ids(feats, ids)
+    set_default_search_parameters(index, nprobe=32, ef_search=64)
+    # query next to video 0, filtered to video 7: unfiltered probing never reaches video 7
+    query = centers[:1] + 0.1
+    search_filter = make_filter(videos=["L01_V007"])
+    allowed = video_ids.ids(search_filter)
+    scores, hits = filtered_search(index, query, K, video_ids.selector(search_filter), allowed, read=store.read)
+    assert (hits >= 0).sum() == K
+    assert set(hits[0].tolist()) <= set(allowed.tolist())
+    exact = allowed[np.argsort(((feats[allowed] - query) ** 2).sum(axis=1))[:K]]
+    assert hits[0].tolist() == exact.tolist()
+
+
+@pytest.mark.parametrize("index_spec", ["ivf-flat", "hnsw"])
+def test_broad_filter_uses_the_index(corpus, index_spec):
+    feats, ids, store, video_ids, centers = corpus
+    index = make_index(index_spec, DIM, len(feats))
+    index.train(feats)
+    index.add_with_ids(feats, ids)
+    search_filter = make_filter(prefix="L01_V00")  # half of the videos
+    allowed = video_ids.ids(search_filter)
+    _, hits = filtered_search(index, centers[12:13], K, video_ids.selector(search_filter), allowed, read=store.read)
+    assert (hits >= 0).sum() == K
+    assert set(hits[0].tolist()) <= set(allowed.tolist())
@@ -0,0 +1,118 @@
+import socket
+import threading
+
+import numpy as np
+import pytest
+
+from utils.executor import QueueFull
+from utils.search_client import SearchClient, SearchServerError, _recv_exact
+from utils.search_protocol import FRAME, check_sizes, decode_frame, encode_frame, parse_address
+
+
+def _split(frame):
+    head_len, body_len = FRAME.unpack(frame[:FRAME.size])
+    head = frame[FRAME.size:FRAME.size + head_len]
+    return head, frame[FRAME.size + head_len:FRAME.size + head_len + body_len]
+
+
+def test_frames_round_trip_arrays():
+    scores = np.linspace(0, 1, 6, dtype=np.float32).reshape(2, 3)
+    ids = np.arange(3, dtype=np.int64)
+    image = np.zeros((0, 4, 3), dtype=np.uint8)
+    header, arrays = decode_frame(*_split(encode_frame({"id": 7, "op": "search"}, (scores, ids, image))))
+    assert header == {"id": 7, "op": "search"}
+    assert [a.dtype for a in arrays] == [scores.dtype, ids.dtype, image.dtype]
+    assert arrays[0].tolist() == scores.tolist() and arrays[1].tolist() == ids.tolist()
+    assert arrays[2].shape == (0, 4, 3)
+
+
+def test_malformed_frames_are_rejected():
+    head, body = _split(encode_frame({"id": 1}, (np.arange(4, dtype=np.int64),)))
+    with pytest.raises(ValueError):
+        decode_frame(head, body[:-8])
+    with pytest.raises(ValueError):
+        decode_frame(b'{"arrays": [["|O", [1]]]}', b"")
+    with pytest.raises(ValueError):
+        check_sizes(2 ** 31, 0)
+
+
+def test_parse_address():
+    assert parse_address("unix:/tmp/myfaiss.sock") == ("unix", "/tmp/myfaiss.sock")
+    assert parse_address("/tmp/myfaiss.sock") == ("unix", "/tmp/myfaiss.sock")
+    assert parse_address(":9000") == ("tcp", ("127.0.0.1", 9000))
+    assert parse_address("10.0.0.2:9000") == ("tcp", ("10.0.0.2", 9000))
+
+
+@pytest.fixture
+def server(tmp_path):
+    """Answers "echo" with its arrays, "busy" with a QueueFull error, and never answers "hang"."""
+    path = str(tmp_path / "search.sock")
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen()
+
+    def serve(conn):
+        with conn:
+            try:
+                while True:
+                    head_len, body_len = FRAME.unpack(_recv_exact(conn, FRAME.size))
+                    header, arrays = decode_frame(_recv_exact(conn, head_len), _recv_exact(conn, body_len))
+                    if header["op"] == "echo":
+                        conn.sendall(encode_frame({"id": header["id"], "ok": True, "result": header["args"]}, arrays))
+                    elif header["op"] == "busy":
+                        conn.sendall(encode_frame({"id": header["id"], "ok": False, "error_type": "QueueFull",
+                                                   "error": "search queue is full"}))
+                    elif header["op"] != "hang":
+                        conn.sendall(encode_frame({"id": header["id"], "ok": False, "error_type": "ValueError",
+                                                   "error": "unknown op"}))
+            except (ConnectionError, OSError):
+                pass
+
+    def accept():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return
+            threading.Thread(target=serve, args=(conn,), daemon=True).start()
+
+    threading.Thread(target=accept, daemon=True).start()
+    yield "unix:" + path
+    listener.close()
+
+
+def test_client_pipelines_requests_and_maps_errors(server):
+    client = SearchClient(server, pool_size=2, timeout=5)
+    try:
+        futures = [client.call_async("echo", {"n": i}, (np.full(3, i, dtype=np.int64),)) for i in range(20)]
+        for i, future in enumerate(futures):
+            result, arrays = future.result(timeout=5)
+            assert result == {"n": i} and arrays[0].tolist() == [i, i, i]
+        with pytest.raises(QueueFull):
+            client.call("busy")
+        with pytest.raises(SearchServerError, match="ValueError"):
+            client.call("nope")
+    finally:
+        client.close()
+
+
+def test_unanswered_requests_time_out_and_leave_the_pending_table(server):
+    client = SearchClient(server, pool_size=1, timeout=0.5)
+    try:
+        with pytest.raises(TimeoutError):
+            client.call("hang")
+        connection = client._connections[0]
+        assert connection.pending == {}
+        # a request nobody waits on is expired by the connection itself
+        future = client.call_async("hang")
+        assert isinstance(future.exception(timeout=5), TimeoutError)
+        assert connection.pending == {}
+        assert client.call("echo", {"still": "alive"})[0] == {"still": "alive"}
+    finally:
+        client.close()
+
+
+def test_unreachable_server_fails_the_request(tmp_path):
+    client = SearchClient("unix:" + str(tmp_path / "missing.sock"), timeout=1)
+    with pytest.raises(ConnectionError):
+        client.call("echo")
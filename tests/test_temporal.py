@@ -0,0 +1,67 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from utils.temporal import temporal_join
+
+# ids 0-4: video 0 at 0, 10, 20, 30, 40 s; ids 5-9: video 1 at the same times
+VIDEO_IDX = np.repeat([0, 1], 5)
+PTS = np.tile(np.arange(0, 50, 10, dtype=np.float64), 2)
+
+
+def test_sequences_stay_in_one_video_and_in_order():
+    candidates = [
+        (np.array([1, 6, 3]), np.array([0.9, 0.8, 0.7])),  # "a man opens a door"
+        (np.array([5, 2, 8]), np.array([0.95, 0.6, 0.5])),  # "then walks outside"
+    ]
+    ids, scores, totals = temporal_join(candidates, VIDEO_IDX, PTS, max_gap=30)
+    # id 5 is in video 1 but before id 6, so it cannot follow it
+    assert ids.tolist() == [[1, 2], [6, 8]]
+    assert np.allclose(scores, [[0.9, 0.6], [0.8, 0.5]])
+    assert totals.tolist() == pytest.approx([1.5, 1.3])
+
+
+def test_gaps_bound_the_next_step():
+    candidates = [(np.array([0]), np.array([1.0])), (np.array([1, 4]), np.array([0.5, 0.9]))]
+    ids, _, _ = temporal_join(candidates, VIDEO_IDX, PTS, max_gap=15)
+    assert ids.tolist() == [[0, 1]]
+    ids, _, _ = temporal_join(candidates, VIDEO_IDX, PTS, max_gap=60, min_gap=15)
+    assert ids.tolist() == [[0, 4]]
+    ids, _, _ = temporal_join(candidates, VIDEO_IDX, PTS, max_gap=5)
+    assert ids.shape == (0, 2)
+
+
+def test_l2_distances_rank_lower_first():
+    candidates = [(np.array([0, 5]), np.array([0.1, 0.5])), (np.array([6, 1]), np.array([0.2, 0.3]))]
+    ids, scores, _ = temporal_join(candidates, VIDEO_IDX, PTS, max_gap=30)
+    assert ids[0].tolist() == [0, 1]
+    assert scores[0].tolist() == pytest.approx([0.1, 0.3])
+
+
+def test_matches_brute_force():
+    rng = np.random.default_rng(0)
+    num_ids = 400
+    video_idx = rng.integers(0, 5, size=num_ids)
+    pts = rng.uniform(0, 300, size=num_ids)
+    candidates = []
+    for _ in range(3):
+        ids = rng.choice(num_ids, size=60, replace=False)
+        candidates.append((ids, np.sort(rng.uniform(0, 1, size=60))[::-1]))
+    max_gap, min_gap = 40.0, 2.0
+    ids, _, totals = temporal_join(candidates, video_idx, pts, max_gap=max_gap, k=10, min_gap=min_gap)
+
+    best = {}
+    for chain in itertools.product(*[list(zip(*c)) for c in candidates]):
+        hits = [i for i, _ in chain]
+        if len(set(video_idx[hits])) != 1:
+            continue
+        gaps = np.diff(pts[hits])
+        if np.all(gaps > min_gap) and np.all(gaps <= max_gap):
+            total = sum(s for _, s in chain)
+            best[hits[-1]] = max(best.get(hits[-1], -np.inf), total)
+    expected = sorted(best.values(), reverse=True)[:10]
+    assert totals.tolist() == pytest.approx(expected)
+    for row in ids:
+        assert len(set(video_idx[row])) == 1
+        assert np.all(np.diff(pts[row]) > min_gap)
@@ -0,0 +1,82 @@
+import threading
+
+import cv2
+import numpy as np
+import pytest
+
+from utils.executor import QueueFull
+from utils.video_frames import CapturePool
+
+
+@pytest.fixture(scope="module")
+def videos(tmp_path_factory):
+    """Two 100-frame videos whose frames get brighter by 2 levels each, with the mean of every decoded frame."""
+    paths = []
+    for name in ("a", "b"):
+        path = str(tmp_path_factory.mktemp("videos") / f"{name}.avi")
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"MJPG"), 25, (64, 48))
+        if not writer.isOpened():
+            pytest.skip("OpenCV cannot write MJPG videos here")
+        for i in range(100):
+            writer.write(np.full((48, 64, 3), 2 * i, dtype=np.uint8))
+        writer.release()
+        paths.append(path)
+    cap = cv2.VideoCapture(paths[0])
+    means = [cap.read()[1].mean() for _ in range(100)]
+    cap.release()
+    return paths, np.array(means)
+
+
+def test_reads_exact_frames_and_reuses_handles(videos):
+    videos, means = videos
+    pool = CapturePool(max_handles=2)
+    fps, frames = pool.read(videos[0], frame=10, count=3, step=2)
+    assert fps == pytest.approx(25)
+    assert [idx for idx, _ in frames] == [10, 12, 14]
+    # the pixels of the frame a sequential decode gives at that index
+    assert [int(np.argmin(np.abs(means - image.mean()))) for _, image in frames] == [10, 12, 14]
+    # a little further on: the same handle reads forward instead of seeking; going back seeks
+    _, frames = pool.read(videos[0], seconds=0.8)
+    assert frames[0][0] == 20
+    assert pool.stats()["seeks"] == 0
+    _, frames = pool.read(videos[0], frame=5)
+    assert int(np.argmin(np.abs(means - frames[0][1].mean()))) == 5
+    stats = pool.stats()
+    assert stats["opens"] == 1 and stats["seeks"] == 1 and stats["open_handles"] == 1
+    assert pool.read(videos[0] + ".missing") is None
+    pool.close()
+
+
+def test_open_handles_never_exceed_the_limit(videos):
+    videos, _ = videos
+    pool = CapturePool(max_handles=2, wait_timeout=5)
+    peak = [0]
+    done = threading.Event()
+
+    def watch():
+        while not done.is_set():
+            peak[0] = max(peak[0], pool.stats()["open_handles"])
+
+    threads = [threading.Thread(target=pool.read, args=(videos[i % 2],), kwargs={"frame": 50, "count": 5})
+               for i in range(8)]
+    watcher = threading.Thread(target=watch)
+    watcher.start()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    done.set()
+    watcher.join()
+    assert peak[0] <= 2 and pool.stats()["busy_handles"] == 0
+    pool.close()
+
+
+def test_all_handles_busy_raises_queue_full(videos):
+    videos, _ = videos
+    pool = CapturePool(max_handles=1, wait_timeout=0.2)
+    handle = pool._checkout(videos[0], 0)
+    with pytest.raises(QueueFull):
+        pool.read(videos[1], frame=0)
+    pool._checkin(videos[0], handle)
+    assert pool.read(videos[1], frame=0)[1][0][0] == 0
+    pool.close()
@@ -0,0 +1,170 @@
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+from utils.executor import LatencyStats, QueueFull
+
+
+class _Request:
+    __slots__ = ("kind", "query", "k", "params", "future", "enqueued")
+
+    def __init__(self, kind, query, k, params):
+        self.kind = kind
+        self.query = query
+        self.k = k
+        self.params = params
+        self.future = Future()
+        self.enqueued = time.perf_counter()
+
+
+class SearchBatcher:
+    """
+    Micro-batch scheduler in front of Myfaiss.
+
+    Concurrent single-query searches (text, image id or uploaded image) are queued; a worker
+    thread waits up to `max_wait_ms` after the first one arrives, collects at most `max_batch`
+    requests, and runs them as one Myfaiss.batch_search call (one CLIP forward per query kind,
+    one index.search). Each caller gets a concurrent.futures.Future with its own result tuple,
+    so async endpoints can await it with asyncio.wrap_future.
+    With `max_queue`, submit raises QueueFull once that many requests are waiting.
+    Requests only share an index.search when their nprobe / ef_search / id_filter match.
+    """
+    KINDS = ("text", "image_id", "image")
+
+    def __init__(self, searcher, max_batch=32, max_wait_ms=5.0, max_queue=None):
+        self.searcher = searcher
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue = max_queue
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._batch_sizes = Counter()
+        self._requests = 0
+        self._batches = 0
+        self._max_queue_depth = 0
+        self._rejected = 0
+        self._latency = LatencyStats()
+        self._closed = False
+        self._worker = threading.Thread(target=self._run, name="search-batcher", daemon=True)
+        self._worker.start()
+
+    def submit(self, kind, query, k, nprobe=None, ef_search=None, id_filter=None) -> Future:
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown query kind {kind!r}")
+        if self._closed:
+            raise RuntimeError("SearchBatcher is closed")
+        if self.max_queue is not None and self._queue.qsize() >= self.max_queue:
+            with self._lock:
+                self._rejected += 1
+            raise QueueFull(f"search queue is full ({self.max_queue} waiting)")
+        request = _Request(kind, query, k, (nprobe, ef_search, id_filter))
+        self._queue.put(request)
+        with self._lock:
+            self._max_queue_depth = max(self._max_queue_depth, self._queue.qsize())
+        return request.future
+
+    # Blocking helpers with the same signatures as Myfaiss
+    def text_search(self, text, k, nprobe=None, ef_search=None, id_filter=None):
+        return self.submit("text", text, k, nprobe, ef_search, id_filter).result()
+
+    def image_search(self, query, k, is_path=True, nprobe=None, ef_search=None, id_filter=None):
+        return self.submit("image_id" if is_path else "image", query, k, nprobe, ef_search, id_filter).result()
+
+    def close(self):
+        self._closed = True
+        self._queue.put(None)
+        self._worker.join()
+
+    def stats(self):
+        with self._lock:
+            latency = self._latency.summary()
+            histogram = {}
+            for size, count in sorted(self._batch_sizes.items()):
+                bucket = self._bucket(size)
+                histogram[bucket] = histogram.get(bucket, 0) + count
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "max_queue": self.max_queue,
+                "rejected": self._rejected,
+                "requests": self._requests,
+                "batches": self._batches,
+                "avg_batch_size": self._requests / self._batches if self._batches else 0.0,
+                "batch_size_histogram": histogram,
+                "max_batch": self.max_batch,
+                "max_wait_ms": self.max_wait * 1000.0,
+                **latency,
+            }
+
+    @staticmethod
+    def _bucket(size):
+        """Power-of-two bucket label: 1, 2, 3-4, 5-8, 9-16, ..."""
+        upper = 1
+        while upper < size:
+            upper *= 2
+        lower = upper // 2 + 1
+        return str(upper) if lower >= upper else f"{lower}-{upper}"
+
+    def _collect(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                request = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if request is None:
+                self._queue.put(None)
+                break
+            batch.append(request)
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            with self._lock:
+                self._batch_sizes[len(batch)] += 1
+                self._requests += len(batch)
+                self._batches += 1
+            # Requests with different nprobe / ef_search / filter cannot share an index.search call
+            groups = {}
+            for request in batch:
+                groups.setdefault(request.params, []).append(request)
+            started = time.perf_counter()
+            for (nprobe, ef_search, id_filter), requests in groups.items():
+                self._run_group(requests, nprobe, ef_search, id_filter)
+            # Queue wait: submit -> batch start (includes the max_wait collection window); exec: whole batch
+            exec_ms = (time.perf_counter() - started) * 1000.0
+            with self._lock:
+                for request in batch:
+                    self._latency.add((started - request.enqueued) * 1000.0, exec_ms)
+
+    def _run_group(self, requests, nprobe, ef_search, id_filter=None):
+        ordered = [r for kind in self.KINDS for r in requests if r.kind == kind]
+        queries = {kind: [r.query for r in ordered if r.kind == kind] for kind in self.KINDS}
+        k = max(r.k for r in ordered)
+        try:
+            results = self.searcher.batch_search(texts=queries["text"], image_ids=queries["image_id"],
+                                                 images=queries["image"], k=k, nprobe=nprobe, ef_search=ef_search,
+                                                 id_filter=id_filter)
+        except Exception as e:
+            if len(ordered) == 1:
+                ordered[0].future.set_exception(e)
+                return
+            # Retry one by one so a single bad query (e.g. unknown id) does not fail the others
+            for request in ordered:
+                self._run_group([request], nprobe, ef_search, id_filter)
+            return
+        for request, (scores, ids, infos, paths) in zip(ordered, results):
+            k = request.k
+            request.future.set_result(([scores[0][:k]], ids[:k], infos[:k], paths[:k]))
@@ -0,0 +1,77 @@
+import numpy as np
+
+METHODS = ("mmr", "dedup")
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def _relevance(scores):
+    """FAISS scores (best first, cosine or L2) -> relevance in [0, 1], higher is better."""
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) > 1 and scores[0] < scores[-1]:
+        scores = -scores  # distances: lower is better
+    span = scores.max() - scores.min() if len(scores) else 0.0
+    return (scores - scores.min()) / span if span > 0 else np.ones_like(scores)
+
+
+def mmr(vectors, scores, k, diversity=0.3):
+    """
+    Maximal marginal relevance over ranked candidates: each pick maximizes
+    (1 - diversity) * relevance - diversity * (max cosine to the picks so far).
+    Returns the positions of the `k` picks in pick order. One mat-vec per pick.
+    """
+    n = len(scores)
+    k = min(int(k), n)
+    if k <= 0:
+        return np.zeros(0, dtype=np.int64)
+    unit = _unit(vectors)
+    gain_base = (1.0 - diversity) * _relevance(scores)
+    max_sim = np.zeros(n, dtype=np.float32)
+    taken = np.zeros(n, dtype=bool)
+    picks = np.empty(k, dtype=np.int64)
+    for step in range(k):
+        gain = gain_base - diversity * max_sim
+        gain[taken] = -np.inf
+        pick = int(np.argmax(gain))
+        picks[step] = pick
+        taken[pick] = True
+        np.maximum(max_sim, unit @ unit[pick], out=max_sim)
+    return picks
+
+
+def near_duplicates(vectors, threshold=0.95, k=None):
+    """
+    Greedy near-duplicate suppression in rank order: a candidate is dropped when its cosine
+    similarity to an already kept, better-ranked candidate is >= `threshold`.
+    Returns the positions kept (at most `k`), in rank order.
+    """
+    unit = _unit(vectors)
+    n = len(unit)
+    removed = np.zeros(n, dtype=bool)
+    kept = []
+    for i in range(n):
+        if removed[i]:
+            continue
+        kept.append(i)
+        if k is not None and len(kept) >= k:
+            break
+        removed[i + 1:] |= unit[i + 1:] @ unit[i] >= threshold
+    return np.asarray(kept, dtype=np.int64)
+
+
+def similar_to(target, vectors, threshold=0.9):
+    """Mask of the rows of `vectors` whose cosine similarity to `target` is >= `threshold`."""
+    return _unit(vectors) @ _unit(np.reshape(target, (1, -1)))[0] >= threshold
+
+
+def diversify(vectors, scores, k, method="mmr", diversity=0.3, threshold=0.95):
+    """Positions (into the candidate list) of the `k` results to keep, in display order."""
+    if method == "mmr":
+        return mmr(vectors, scores, k, diversity)
+    if method == "dedup":
+        return near_duplicates(vectors, threshold, k)
+    raise ValueError(f"Unknown diversification method {method!r} (expected one of {', '.join(METHODS)})")
@@ -0,0 +1,220 @@
+import json
+import os
+
+import numpy as np
+
+
+class VectorNotFound(KeyError):
+    """No embedding for an image id: neither in the embedding store nor in the index."""
+
+    def __str__(self):
+        # KeyError quotes its message
+        return str(self.args[0]) if self.args else ""
+
+
+class EmbeddingStore:
+    """
+    On-disk, memory-mapped store for raw CLIP embeddings.
+
+    Row `i` holds the vector of image id `i` from image_path.json. Rows are split
+    into fixed-size shards (shard_00000.npy, shard_00001.npy, ...) so the store can
+    grow and every encoded batch goes straight to disk instead of a Python list.
+    Per shard, a `.valid.npy` byte mask marks filled rows (1 = in sync with the index,
+    2 = written since the index last picked it up) and a `.stamp.npy` array keeps the
+    source file mtime (ns) each row was encoded from, so incremental builds can skip it.
+    """
+    CLEAN = 1
+    DIRTY = 2
+    META_FILE = "meta.json"
+
+    def __init__(self, root: str, dim=None, shard_size=65536, dtype="float32", readonly=False):
+        self.root = root
+        self.readonly = readonly
+        self._shards = {}
+        meta_path = os.path.join(root, self.META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.shard_size = meta["shard_size"]
+            self.dtype = np.dtype(meta["dtype"])
+        else:
+            if readonly:
+                raise FileNotFoundError(f"No embedding store found at {root}")
+            self.dim = dim
+            self.shard_size = shard_size
+            self.dtype = np.dtype(dtype)
+            if dim is not None:
+                self._write_meta()
+
+    @classmethod
+    def exists(cls, root: str) -> bool:
+        return os.path.exists(os.path.join(root, cls.META_FILE))
+
+    def _write_meta(self):
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, self.META_FILE), "w") as f:
+            json.dump({"dim": self.dim, "shard_size": self.shard_size, "dtype": self.dtype.name}, f)
+
+    def _shard_paths(self, shard_no):
+        base = os.path.join(self.root, f"shard_{shard_no:05d}")
+        return base + ".npy", base + ".valid.npy", base + ".stamp.npy"
+
+    def _shard_numbers(self):
+        if not os.path.isdir(self.root):
+            return []
+        numbers = []
+        for name in os.listdir(self.root):
+            if name.startswith("shard_") and name.endswith(".valid.npy"):
+                numbers.append(int(name[len("shard_"):-len(".valid.npy")]))
+        return sorted(numbers)
+
+    def _get_shard(self, shard_no, create=False):
+        """Return (vectors, valid, stamp) memmaps of a shard, or None if it does not exist."""
+        if shard_no in self._shards:
+            return self._shards[shard_no]
+        vec_path, valid_path, stamp_path = self._shard_paths(shard_no)
+        if os.path.exists(valid_path):
+            mode = "r" if self.readonly else "r+"
+            if os.path.exists(stamp_path):
+                stamp = np.load(stamp_path, mmap_mode=mode)
+            elif self.readonly:
+                stamp = np.zeros(self.shard_size, dtype=np.int64)
+            else:
+                # Shards written before stamps existed: 0 means "unknown", treated as up to date
+                stamp = np.lib.format.open_memmap(stamp_path, mode="w+", dtype=np.int64, shape=(self.shard_size,))
+            shard = (np.load(vec_path, mmap_mode=mode), np.load(valid_path, mmap_mode=mode), stamp)
+        elif create:
+            shard = (
+                np.lib.format.open_memmap(vec_path, mode="w+", dtype=self.dtype, shape=(self.shard_size, self.dim)),
+                np.lib.format.open_memmap(valid_path, mode="w+", dtype=np.uint8, shape=(self.shard_size,)),
+                np.lib.format.open_memmap(stamp_path, mode="w+", dtype=np.int64, shape=(self.shard_size,)),
+            )
+        else:
+            return None
+        self._shards[shard_no] = shard
+        return shard
+
+    def _group_by_shard(self, ids):
+        ids = np.asarray(ids, dtype=np.int64)
+        shard_nos = ids // self.shard_size
+        for shard_no in np.unique(shard_nos):
+            positions = np.nonzero(shard_nos == shard_no)[0]
+            yield int(shard_no), positions, ids[positions] - shard_no * self.shard_size
+
+    def write(self, ids, feats, stamps=None):
+        """
+        Write `feats[i]` to row `ids[i]` and mark the rows dirty; rows are persisted by flush().
+        `stamps` are the source file mtimes the vectors were encoded from.
+        """
+        if self.readonly:
+            raise PermissionError("Embedding store is opened read-only")
+        feats = np.asarray(feats)
+        if self.dim is None:
+            self.dim = int(feats.shape[1])
+            self._write_meta()
+        if stamps is not None:
+            stamps = np.asarray(stamps, dtype=np.int64)
+        for shard_no, positions, rows in self._group_by_shard(ids):
+            vectors, valid, stamp = self._get_shard(shard_no, create=True)
+            vectors[rows] = feats[positions]
+            if stamps is not None:
+                stamp[rows] = stamps[positions]
+            valid[rows] = self.DIRTY
+
+    def flush(self):
+        if self.readonly:
+            return
+        # Vectors first, so a crash never leaves a row marked valid without its data
+        for vectors, _, _ in self._shards.values():
+            vectors.flush()
+        for _, valid, stamp in self._shards.values():
+            stamp.flush()
+            valid.flush()
+
+    def stamps(self, ids) -> np.ndarray:
+        """Source mtimes the rows of `ids` were encoded from; -1 for rows not in the store."""
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.full(len(ids), -1, dtype=np.int64)
+        for shard_no, positions, rows in self._group_by_shard(ids):
+            shard = self._get_shard(shard_no)
+            if shard is not None:
+                filled = shard[1][rows].astype(bool)
+                out[positions[filled]] = shard[2][rows[filled]]
+        return out
+
+    def dirty_ids(self) -> np.ndarray:
+        """Ids written since the last mark_clean(), i.e. not yet added to the index."""
+        chunks = []
+        for shard_no in self._shard_numbers():
+            valid = self._get_shard(shard_no)[1]
+            chunks.append(np.flatnonzero(valid == self.DIRTY) + shard_no * self.shard_size)
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def mark_clean(self, ids=None):
+        """Mark `ids` (default: every dirty row) as in sync with the index and persist it."""
+        if ids is None:
+            ids = self.dirty_ids()
+        for shard_no, _, rows in self._group_by_shard(ids):
+            valid = self._get_shard(shard_no)[1]
+            valid[rows] = np.where(valid[rows] == self.DIRTY, self.CLEAN, valid[rows])
+        self.flush()
+
+    def discard(self, ids):
+        """Drop the rows of `ids` (e.g. images deleted from image_path.json) and persist it."""
+        if self.readonly:
+            raise PermissionError("Embedding store is opened read-only")
+        for shard_no, _, rows in self._group_by_shard(ids):
+            shard = self._get_shard(shard_no)
+            if shard is not None:
+                shard[1][rows] = 0
+                shard[2][rows] = 0
+        self.flush()
+
+    def contains(self, ids) -> np.ndarray:
+        ids = np.asarray(ids, dtype=np.int64)
+        mask = np.zeros(len(ids), dtype=bool)
+        for shard_no, positions, rows in self._group_by_shard(ids):
+            shard = self._get_shard(shard_no)
+            if shard is not None:
+                mask[positions] = shard[1][rows].astype(bool)
+        return mask
+
+    def read(self, ids) -> np.ndarray:
+        """Return the float32 vectors of `ids` as an (len(ids), dim) array."""
+        ids = np.asarray(ids, dtype=np.int64)
+        out = np.empty((len(ids), self.dim), dtype=np.float32)
+        for shard_no, positions, rows in self._group_by_shard(ids):
+            shard = self._get_shard(shard_no)
+            if shard is None or not shard[1][rows].all():
+                raise KeyError(f"Embedding store has no vector for some ids in shard {shard_no}")
+            out[positions] = shard[0][rows]
+        return out
+
+    def ids(self) -> np.ndarray:
+        """All ids that have a stored vector, in ascending order."""
+        chunks = [ids for ids, _ in self.iter_valid_ids()]
+        return np.concatenate(chunks) if chunks else np.empty(0, dtype=np.int64)
+
+    def iter_valid_ids(self):
+        for shard_no in self._shard_numbers():
+            valid = self._get_shard(shard_no)[1]
+            rows = np.flatnonzero(valid)
+            if len(rows):
+                yield rows + shard_no * self.shard_size, shard_no
+
+    def iter_batches(self):
+        """Yield (ids, float32 vectors) one shard at a time, so peak RAM stays at one shard."""
+        for ids, shard_no in self.iter_valid_ids():
+            vectors = self._get_shard(shard_no)[0]
+            yield ids, np.asarray(vectors[ids - shard_no * self.shard_size], dtype=np.float32)
+
+    def sample(self, n, seed=1234) -> np.ndarray:
+        """Random subset of at most `n` stored vectors, e.g. for training an IVF quantizer."""
+        ids = self.ids()
+        if len(ids) > n:
+            ids = np.sort(np.random.default_rng(seed).choice(ids, size=n, replace=False))
+        return self.read(ids)
+
+    def __len__(self):
+        return sum(len(ids) for ids, _ in self.iter_valid_ids())
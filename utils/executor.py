@@ -0,0 +1,100 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+
+class QueueFull(Exception):
+    """Raised instead of queueing more work than a pool accepts; the web layer answers 503."""
+    pass
+
+
+class LatencyStats:
+    """Rolling queue-wait and execution times (last `window` jobs), in milliseconds."""
+    def __init__(self, window=1024):
+        self.wait_ms = deque(maxlen=window)
+        self.exec_ms = deque(maxlen=window)
+
+    def add(self, wait_ms, exec_ms):
+        self.wait_ms.append(wait_ms)
+        self.exec_ms.append(exec_ms)
+
+    @staticmethod
+    def _summary(samples):
+        if not samples:
+            return {"avg": 0.0, "p50": 0.0, "p95": 0.0, "max": 0.0}
+        ordered = sorted(samples)
+        return {
+            "avg": sum(ordered) / len(ordered),
+            "p50": ordered[len(ordered) // 2],
+            "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+            "max": ordered[-1],
+        }
+
+    def summary(self):
+        return {"queue_wait_ms": self._summary(self.wait_ms), "exec_ms": self._summary(self.exec_ms)}
+
+
+class InferenceExecutor:
+    """
+    Bounded worker pool for blocking work called from async endpoints (CLIP encoding, FAISS
+    search, OpenCV). At most `max_workers` jobs run at once and at most `max_queue` more wait;
+    anything beyond that fails fast with QueueFull instead of piling up behind a slow query.
+    Time spent waiting for a worker and time spent running are tracked separately.
+    """
+    def __init__(self, max_workers=2, max_queue=64, name="inference"):
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._latency = LatencyStats()
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self._rejected += 1
+                raise QueueFull(f"{self.name} queue is full ({self.max_queue} waiting)")
+            self._pending += 1
+        return self._pool.submit(self._call, time.perf_counter(), fn, args, kwargs)
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def _call(self, enqueued, fn, args, kwargs):
+        started = time.perf_counter()
+        with self._lock:
+            self._running += 1
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            finished = time.perf_counter()
+            with self._lock:
+                self._running -= 1
+                self._pending -= 1
+                self._completed += ok
+                self._failed += not ok
+                self._latency.add((started - enqueued) * 1000.0, (finished - started) * 1000.0)
+
+    def stats(self):
+        with self._lock:
+            stats = {
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+            stats.update(self._latency.summary())
+            return stats
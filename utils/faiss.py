@@ -1,10 +1,25 @@
 from PIL import Image
 import faiss
+import os
+import threading
 import matplotlib.pyplot as plt
 import math
 import numpy as np 
 import clip
-from langdetect import detect
+from utils.language import is_vietnamese
+from utils.path_table import PathTable
+from utils.embedding_store import EmbeddingStore, VectorNotFound
+from utils.keyframe_groups import KeyframeGroups
+from utils.search_filter import VideoIdRanges, filtered_search, EXACT_FILTER_MAX_IDS
+from utils.image_pipeline import PrefetchLoader
+from utils.index_factory import (make_index, resolve_spec, default_train_size, search_parameters,
+                                 set_default_search_parameters, uses_inner_product, normalize,
+                                 read_index, write_index, describe_index, index_metric,
+                                 enable_reconstruct, drop_direct_map)
+
+# Index type and metric of a first build (later builds keep those of the existing index)
+DEFAULT_INDEX_SPEC = "ivf-flat"
+DEFAULT_METRIC = "l2"
 
 class Myfaiss:
     def clear_index(self, save_path=None, dim=None, verbose=True):
@@ -21,86 +36,302 @@ class Myfaiss:
         self.index = index
         if save_path is None:
             save_path = self.bin_file
-        faiss.write_index(index, save_path)
+        write_index(index, save_path)
         if verbose:
             print(f"[Myfaiss] FAISS index cleared and saved to {save_path}")
         return index
-    def __init__(self, bin_file : str, id2img_fps, device, translater, clip_backbone="ViT-B/32"):
+    def __init__(self, bin_file : str, id2img_fps, device, translater, clip_backbone="ViT-B/32", embedding_dir=None,
+                 nprobe=32, ef_search=128, load_mode="heap", query_cache=None):
         self.bin_file = bin_file
-        self.id2img_fps = id2img_fps
+        # Plain {id: path} dicts are packed into an array-backed table for vectorized result lookups
+        self.id2img_fps = id2img_fps if isinstance(id2img_fps, PathTable) else PathTable.from_dict(id2img_fps)
         self.device = device
         self.model, self.preprocess = clip.load(clip_backbone, device=device)
         self.translater = translater
+        # Optional QueryCache: repeated text queries skip translation and encode_text
+        self.query_cache = query_cache
+        # Raw embeddings live next to the index (faiss_normal_ViT.bin -> faiss_normal_ViT_embeddings/)
+        if embedding_dir is None:
+            embedding_dir = os.path.splitext(bin_file)[0] + "_embeddings"
+        self.embedding_dir = embedding_dir
+        # load_mode="mmap": index and embeddings are mapped read-only and shared between worker processes
+        self.load_mode = load_mode
+        self.index_load_mode = None
+        self.store = None
+        if EmbeddingStore.exists(embedding_dir):
+            self.store = EmbeddingStore(embedding_dir, readonly=(load_mode == "mmap"))
+        # Near-duplicate keyframe groups (faiss_normal_ViT_groups.npz): only representatives are indexed
+        self.groups_file = KeyframeGroups.default_path(bin_file)
+        self.groups = KeyframeGroups.load(self.groups_file) if os.path.exists(self.groups_file) else None
+        self._video_ids = None
+        self._reconstruct_lock = threading.Lock()
         # Try to load index, if not found, set to None
+        # Default search effort for this deployment; requests can override it per call
+        self.nprobe = nprobe
+        self.ef_search = ef_search
         try:
             self.index = self.load_bin_file(bin_file)
+            set_default_search_parameters(self.index, nprobe, ef_search)
         except Exception as e:
             print(f"[Myfaiss] Warning: Cannot load index from {bin_file}: {e}")
             self.index = None
 
-    def build_index_from_images(self, save_path=None, verbose=True, batch_size=64, use_gpu=True, nlist=256):
+    def build_index_from_images(self, save_path=None, verbose=True, batch_size=64, use_gpu=True, nlist=None, checkpoint_every=20,
+                                num_workers=4, prefetch=2, index_spec=None, metric=None, collapse_threshold=None,
+                                max_group=32):
+        """
+        Encode all images in self.id2img_fps into the embedding store, then build the FAISS index from it.
+        - Batch encode images for speed; each batch is written to the memory-mapped store right away.
+        - Images that fail to load are left out of the store (and the index) instead of indexing a blank frame.
+        - `num_workers` threads decode/preprocess up to `prefetch` batches ahead of the CLIP forward pass.
+        """
+        if self.store is None or self.store.readonly:
+            self.store = EmbeddingStore(self.embedding_dir)
+        ids = self.id2img_fps.keys().tolist()
+        self._encode_into_store(ids, self._source_stamps(ids), batch_size, checkpoint_every, verbose, num_workers, prefetch)
+        return self.build_index_from_store(save_path=save_path, verbose=verbose, use_gpu=use_gpu, nlist=nlist,
+                                           index_spec=index_spec, metric=metric, collapse_threshold=collapse_threshold,
+                                           max_group=max_group)
+
+    def update_index_from_images(self, save_path=None, verbose=True, batch_size=64, use_gpu=True, nlist=None, checkpoint_every=20,
+                                 num_workers=4, prefetch=2, index_spec=None, metric=None, collapse_threshold=None,
+                                 max_group=32):
+        """
+        Incremental build: encode only images that are new or whose file changed since they were stored,
+        then add them to the existing index under their image_path.json ids.
+        The store is flushed every `checkpoint_every` batches, so a killed job resumes where it stopped.
+        Falls back to a full build from the store (see index_config) when there is no index yet
+        or the index type cannot remove vectors (HNSW), or when `collapse_threshold` asks for regrouping.
+        With existing keyframe groups and no regrouping, new images are indexed ungrouped.
+        """
+        if self.store is None or self.store.readonly:
+            self.store = EmbeddingStore(self.embedding_dir)
+        ids = self.id2img_fps.keys()
+        stamps = self._source_stamps(ids)
+        stored = self.store.stamps(ids)
+        # stored == -1: not encoded yet, stored == 0: encoded before stamps were kept, assume current
+        todo = (stamps >= 0) & (stored != stamps) & (stored != 0)
+        removed = self._removed_ids()
+        if verbose:
+            print(f"[Myfaiss] {int(todo.sum())}/{len(ids)} images are new or changed, {len(removed)} were removed")
+        self._encode_into_store(ids[todo].tolist(), stamps[todo], batch_size, checkpoint_every, verbose, num_workers, prefetch)
+
+        if self.index is None or self.index.ntotal == 0 or collapse_threshold is not None:
+            return self.build_index_from_store(save_path=save_path, verbose=verbose, use_gpu=use_gpu, nlist=nlist,
+                                               index_spec=index_spec, metric=metric,
+                                               collapse_threshold=collapse_threshold, max_group=max_group)
+        if self.index_load_mode == "mmap":
+            # A read-only mapping cannot be modified, work on a heap copy
+            self.index = self.load_bin_file(self.bin_file, mode="heap")
+        try:
+            return self.sync_index_with_store(save_path=save_path, verbose=verbose, removed=removed)
+        except RuntimeError as e:
+            print(f"[Myfaiss] Cannot update the index in place ({e}), rebuilding it from the store")
+            return self.build_index_from_store(save_path=save_path, verbose=verbose, use_gpu=use_gpu, nlist=nlist,
+                                               index_spec=index_spec, metric=metric)
+
+    def index_config(self, index_spec=None, metric=None):
+        """
+        (index_spec, metric) for a rebuild: the explicit arguments, else the type and metric of the
+        loaded index (describe_index, ValueError if its type cannot be named), else
+        DEFAULT_INDEX_SPEC / DEFAULT_METRIC.
+        """
+        if metric is None:
+            metric = index_metric(self.index) or DEFAULT_METRIC
+        if index_spec is None:
+            index_spec = describe_index(self.index)[0] or DEFAULT_INDEX_SPEC
+        return index_spec, metric
+
+    def sync_index_with_store(self, save_path=None, verbose=True, removed=None):
         """
-        Build FAISS index from all images in self.id2img_fps.
-        - Batch encode images for speed.
-        - Use IndexIVFFlat for faster search on large datasets.
-        - Optionally use GPU if available.
+        Replace the index entries of every dirty store row (new or re-encoded since the last sync),
+        drop the `removed` ids from the index and the store, and save the index.
+        Safe to re-run after a crash: remove + add under the same id is idempotent, and removed
+        rows leave the store only once the index without them is saved.
         """
+        dirty = self.store.dirty_ids()
+        removed = np.empty(0, dtype=np.int64) if removed is None else np.asarray(removed, dtype=np.int64)
+        if len(dirty) == 0 and len(removed) == 0:
+            if verbose:
+                print(f"[Myfaiss] Index is up to date ({self.index.ntotal} vectors)")
+            return self.index
+        with self._reconstruct_lock:
+            drop_direct_map(self.index)
+        stale = np.union1d(dirty, removed)
+        self.index.remove_ids(faiss.IDSelectorBatch(len(stale), faiss.swig_ptr(stale)))
+        # Collapsed group members stay out of the index
+        added = dirty[self.groups.indexed(dirty)] if self.groups is not None else dirty
+        for start in range(0, len(added), self.store.shard_size):
+            chunk = added[start:start + self.store.shard_size]
+            self.index.add_with_ids(self._index_vectors(self.store.read(chunk)), chunk)
+        if save_path is None:
+            save_path = self.bin_file
+        write_index(self.index, save_path)
+        self.store.mark_clean(dirty)
+        if len(removed):
+            self.store.discard(removed)
+        if verbose:
+            print(f"[Myfaiss] Added {len(added)} and removed {len(removed)} embeddings "
+                  f"({self.index.ntotal} total), saved to {save_path}")
+        return self.index
+
+    def _removed_ids(self):
+        """Ids that still have a stored vector but no longer appear in image_path.json."""
+        stored = self.store.ids()
+        return stored[~self.id2img_fps.valid(stored)]
+
+    def _source_stamps(self, ids):
+        """mtime (ns) of each image file, -1 if it cannot be read."""
+        stamps = np.full(len(ids), -1, dtype=np.int64)
+        for i, image_id in enumerate(ids):
+            try:
+                stamps[i] = os.stat(self.id2img_fps[int(image_id)]).st_mtime_ns
+            except OSError:
+                pass
+        return stamps
+
+    def _encode_into_store(self, ids, stamps, batch_size, checkpoint_every, verbose, num_workers=4, prefetch=2):
+        import time
         import torch
         from tqdm import tqdm
-        image_paths = [self.id2img_fps[k] for k in sorted(self.id2img_fps.keys())]
-        features = []
-        total = len(image_paths)
-        # Batch encode with tqdm
-        for start in tqdm(range(0, total, batch_size), desc="Encoding images", unit="batch"):
-            end = min(start + batch_size, total)
-            batch_imgs = []
-            for img_path in image_paths[start:end]:
-                try:
-                    image = Image.open(img_path).convert("RGB")
-                    batch_imgs.append(self.preprocess(image))
-                except Exception as e:
-                    print(f"[Myfaiss] Error processing {img_path}: {e}")
-                    batch_imgs.append(torch.zeros((3, 224, 224)))
-            batch_tensor = torch.stack(batch_imgs).to(self.device)
+        total = len(ids)
+        loader = PrefetchLoader(self.id2img_fps, ids, stamps, self.preprocess, batch_size=batch_size,
+                                num_workers=num_workers, prefetch=prefetch)
+        num_batches = 0
+        done = 0
+        # Batch encode with tqdm; decoding of the next batches runs on the loader's worker pool
+        progress = tqdm(loader, desc="Encoding images", unit="batch")
+        for batch_ids, batch_stamps, batch_tensor in progress:
+            done += batch_size
+            if batch_tensor is None:
+                continue
+            began = time.perf_counter()
             with torch.no_grad():
-                feats = self.model.encode_image(batch_tensor).cpu().numpy().astype(np.float32)
-            features.append(feats)
-            if verbose:
-                print(f"Processed {end}/{total} images...")
-        feats_np = np.concatenate(features, axis=0)
-        dim = feats_np.shape[1]
+                feats = self.model.encode_image(batch_tensor.to(self.device)).cpu().numpy().astype(np.float32)
+            loader.stats.encode_seconds += time.perf_counter() - began
+            self.store.write(batch_ids, feats, batch_stamps)
+            num_batches += 1
+            if num_batches % checkpoint_every == 0:
+                self.store.flush()
+                progress.set_postfix(decode=f"{loader.stats.rates()['decode_img_per_s']:.0f}/s",
+                                     encode=f"{loader.stats.rates()['encode_img_per_s']:.0f}/s")
+                if verbose:
+                    print(f"[Myfaiss] Checkpoint: {min(done, total)}/{total} images encoded")
+        self.store.flush()
+        if verbose and total:
+            print(f"[Myfaiss] Encoding throughput: {loader.stats.report()}")
+        return loader.stats
+
+    def build_index_from_store(self, save_path=None, verbose=True, use_gpu=True, nlist=None, index_spec=None,
+                               metric=None, train_size=None, collapse_threshold=None, max_group=32):
+        """
+        Build the index from vectors already in the embedding store, without running CLIP.
+        - `index_spec`: "flat", "ivf-flat", "ivf-pq", "hnsw", "opq-ivf-pq" or any faiss factory string;
+          None keeps the type of the loaded index (see index_config), as does metric=None.
+        - `nlist` defaults to auto_nlist(number of stored vectors).
+        - `metric`: "l2" on raw vectors, or "ip"/"cosine" on L2-normalized vectors (queries are
+          normalized too); pair it with an SQ8/fp16 spec for a 2-4x smaller index.
+        - `collapse_threshold`: regroup runs of consecutive keyframes with cosine >= threshold
+          (see collapse_keyframes); with existing groups only their representatives are indexed.
+        The index is trained on a sample and vectors are added one store shard at a time
+        under their image ids, so changing the index type or nlist only costs this step.
+        """
+        if self.store is None or len(self.store) == 0:
+            raise ValueError(f"Embedding store {self.embedding_dir} is empty, run build_index_from_images first.")
+        index_spec, metric = self.index_config(index_spec, metric)
+        if not self.store.readonly:
+            # Images dropped from image_path.json leave the store with the old index
+            removed = self._removed_ids()
+            if len(removed):
+                self.store.discard(removed)
+                if verbose:
+                    print(f"[Myfaiss] Dropped {len(removed)} embeddings of removed images from the store")
+        if collapse_threshold is not None:
+            self.collapse_keyframes(collapse_threshold, max_group, verbose=verbose)
+        dim = self.store.dim
+        groups = self.groups
+
+        def grouped_batches():
+            for ids, feats in self.store.iter_batches():
+                keep = groups.indexed(ids)
+                yield ids[keep], feats[keep]
+        store_batches = grouped_batches if groups is not None else self.store.iter_batches
+        num_vectors = int(self.groups.indexed(self.store.ids()).sum()) if self.groups is not None else len(self.store)
+        index = make_index(index_spec, dim, num_vectors, nlist, metric)
+        normalized = uses_inner_product(index)
+        if train_size is None:
+            train_size = default_train_size(index, num_vectors)
+        train_feats = None
+        if not index.is_trained:
+            train_feats = self.store.sample(train_size)
+            if normalized:
+                train_feats = normalize(train_feats)
         # FAISS index
         if use_gpu:
             try:
-                import faiss.contrib.torch_utils
                 res = faiss.StandardGpuResources()
-                quantizer = faiss.IndexFlatL2(dim)
-                index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
-                index.train(feats_np)
                 gpu_index = faiss.index_cpu_to_gpu(res, 0, index)
-                gpu_index.add(feats_np)
-                self.index = faiss.index_gpu_to_cpu(gpu_index)
+                if train_feats is not None:
+                    gpu_index.train(train_feats)
+                for ids, feats in store_batches():
+                    gpu_index.add_with_ids(normalize(feats) if normalized else feats, ids)
+                index = faiss.index_gpu_to_cpu(gpu_index)
             except Exception as e:
                 print(f"[Myfaiss] GPU indexing failed, fallback to CPU: {e}")
-                quantizer = faiss.IndexFlatL2(dim)
-                index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
-                index.train(feats_np)
-                index.add(feats_np)
-                self.index = index
-        else:
-            quantizer = faiss.IndexFlatL2(dim)
-            index = faiss.IndexIVFFlat(quantizer, dim, nlist, faiss.METRIC_L2)
-            index.train(feats_np)
-            index.add(feats_np)
-            self.index = index
+                index = make_index(index_spec, dim, num_vectors, nlist, metric)
+                use_gpu = False
+        if not use_gpu:
+            if train_feats is not None:
+                index.train(train_feats)
+            for ids, feats in store_batches():
+                index.add_with_ids(normalize(feats) if normalized else feats, ids)
+        set_default_search_parameters(index, self.nprobe, self.ef_search)
+        self.index = index
         if save_path is None:
             save_path = self.bin_file
-        faiss.write_index(self.index, save_path)
+        write_index(self.index, save_path)
+        self.store.mark_clean()
         if verbose:
-            print(f"[Myfaiss] FAISS index (IVF) built and saved to {save_path}")
+            spec = resolve_spec(index_spec, dim, num_vectors, nlist)
+            print(f"[Myfaiss] FAISS index ({spec}, {metric}) built from {self.index.ntotal} stored embeddings and saved to {save_path}")
         return self.index
-    def load_bin_file(self, bin_file: str):
-        return faiss.read_index(bin_file)
+
+    def collapse_keyframes(self, threshold=0.95, max_group=32, verbose=True):
+        """Group near-identical consecutive keyframes of each video from the stored vectors and save the groups."""
+        self.groups = KeyframeGroups.build(self.id2img_fps, self.store, threshold, max_group, verbose=verbose)
+        self.groups.save(self.groups_file)
+        return self.groups
+
+    def get_vectors(self, ids):
+        """
+        Return the float32 embeddings of `ids` as a (len(ids), dim) matrix.
+        Reads from the embedding store, and reconstructs the ids it lacks from the index (a
+        collapsed keyframe gets its group representative's vector). VectorNotFound when an id
+        has no vector in either.
+        """
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        stored = self.store.contains(ids) if self.store is not None else np.zeros(len(ids), dtype=bool)
+        if stored.all():
+            return self.store.read(ids)
+        if self.index is None:
+            raise VectorNotFound(f"No vector for image ids {ids[~stored][:10].tolist()}: embedding store incomplete")
+        out = np.empty((len(ids), self.index.d), dtype=np.float32)
+        if stored.any():
+            out[stored] = self.store.read(ids[stored])
+        missing = ids[~stored]
+        sources = self.groups.representative(missing) if self.groups is not None else missing
+        with self._reconstruct_lock:
+            enable_reconstruct(self.index)
+        try:
+            out[~stored] = np.stack([self.index.reconstruct(int(i)) for i in sources])
+        except RuntimeError:
+            raise VectorNotFound(f"No vector for some of image ids {missing[:10].tolist()}: "
+                                 f"not in the embedding store nor in the index") from None
+        return out
+
+    def load_bin_file(self, bin_file: str, mode=None):
+        index, self.index_load_mode = read_index(bin_file, mode or self.load_mode)
+        return index
     
     def show_images(self, image_paths):
         fig = plt.figure(figsize=(15, 10))
@@ -117,64 +348,173 @@ class Myfaiss:
 
         plt.show()
         
-    def image_search(self, query, k, is_path=True): 
+    def index_info(self):
+        """Summary of the loaded index for health checks."""
+        loaded = self.index is not None
+        return {
+            "index_metric": self.metric,
+            "index_load_mode": self.index_load_mode if loaded else None,
+            "index_vectors": int(self.index.ntotal) if loaded else 0,
+            "index_dim": int(self.index.d) if loaded else None,
+            "index_file_mb": os.path.getsize(self.bin_file) / 2**20 if loaded and os.path.exists(self.bin_file) else None,
+        }
+
+    @property
+    def metric(self):
+        """Metric of the loaded index file: "ip" (normalized, cosine scores) or "l2"."""
+        return "ip" if uses_inner_product(self.index) else "l2"
+
+    def _index_vectors(self, feats):
+        """Raw CLIP vectors as the index expects them (normalized for inner-product indexes)."""
+        return normalize(feats) if uses_inner_product(self.index) else feats
+
+    @property
+    def video_ids(self):
+        """Video -> id ranges used to turn a SearchFilter into an IDSelector (built on first use)."""
+        if self._video_ids is None:
+            self._video_ids = VideoIdRanges(self.id2img_fps)
+        return self._video_ids
+
+    def search(self, query_feats, k, nprobe=None, ef_search=None, id_filter=None):
+        """
+        index.search with optional per-call nprobe (IVF) / efSearch (HNSW) overrides.
+        The metric is read from the loaded index, so queries against an inner-product index are
+        normalized the same way the indexed vectors were; scores are then cosine similarities
+        (higher is better) instead of L2 distances (lower is better).
+        `id_filter` (utils.search_filter.make_filter) restricts the search to some videos / ids,
+        so all k hits pass the filter (see filtered_search).
+        """
+        query_feats = self._index_vectors(query_feats)
+        if id_filter is not None:
+            return self._filtered_search(query_feats, k, nprobe, ef_search, id_filter)
+        params = search_parameters(self.index, nprobe, ef_search)
+        if params is None:
+            return self.index.search(query_feats, k=k)
+        return self.index.search(query_feats, k=k, params=params)
+
+    def _filtered_search(self, query_feats, k, nprobe, ef_search, id_filter):
+        allowed = self.video_ids.ids(id_filter)
+        exact = self.store is not None and len(allowed) <= EXACT_FILTER_MAX_IDS
+        if exact:
+            # only ids that are in the index: stored, and not a collapsed group member
+            allowed = allowed[self.store.contains(allowed)]
+            if self.groups is not None:
+                allowed = allowed[self.groups.indexed(allowed)]
+
+        def read_rows(ids):
+            return self._index_vectors(self.store.read(ids))
+
+        return filtered_search(self.index, query_feats, k, self.video_ids.selector(id_filter), allowed,
+                               nprobe, ef_search, read_rows if exact else None)
+
+    def image_search(self, query, k, is_path=True, nprobe=None, ef_search=None, id_filter=None): 
         if is_path:
             # Search by image ID (original behavior)
-            query_feats = self.index.reconstruct(query).reshape(1,-1)
-        else:
-            # Search by image array (new behavior for uploaded images)
-            import torch
-            if isinstance(query, np.ndarray):
-                # Convert numpy array to PIL Image
-                from PIL import Image
-                if len(query.shape) == 3:
-                    if query.shape[2] == 3:  # RGB
-                        pil_image = Image.fromarray(query)
-                    else:  # BGR
-                        pil_image = Image.fromarray(query[:,:,::-1])
-                else:
-                    raise ValueError("Invalid image shape")
+            return self.batch_search(image_ids=[query], k=k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)[0]
+        # Search by image array (new behavior for uploaded images)
+        return self.batch_search(images=[query], k=k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)[0]
+
+    def text_search(self, text, k, nprobe=None, ef_search=None, id_filter=None):
+        return self.batch_search(texts=[text], k=k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)[0]
+
+    def batch_text_search(self, texts, k, nprobe=None, ef_search=None, id_filter=None):
+        """One result tuple per text, like text_search, from a single CLIP forward and index.search call."""
+        return self.batch_search(texts=texts, k=k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)
+
+    def batch_image_search(self, image_ids, k, nprobe=None, ef_search=None, id_filter=None):
+        """One result tuple per image id, like image_search, from a single index.search call."""
+        return self.batch_search(image_ids=image_ids, k=k, nprobe=nprobe, ef_search=ef_search, id_filter=id_filter)
+
+    def batch_search(self, texts=(), image_ids=(), images=(), k=100, nprobe=None, ef_search=None, id_filter=None):
+        """
+        Search many queries at once: all texts are tokenized and encoded in one forward pass,
+        image ids are looked up in the embedding store, uploaded images are encoded in one pass,
+        and the whole query matrix goes through a single index.search.
+        Returns one (scores, ids, infos, paths) tuple per query, in the order texts, image_ids, images.
+        """
+        query_feats = []
+        if len(texts):
+            query_feats.append(self.encode_texts(texts))
+        if len(image_ids):
+            query_feats.append(self.get_vectors(image_ids))
+        if len(images):
+            query_feats.append(self.encode_images(images))
+        if not query_feats:
+            return []
+        return self.vector_search(np.concatenate(query_feats, axis=0), k, nprobe, ef_search, id_filter)
+
+    def vector_search(self, query_feats, k=100, nprobe=None, ef_search=None, id_filter=None):
+        """Search raw query vectors (e.g. cached or refined ones, no CLIP); one result tuple per row."""
+        query_feats = np.asarray(query_feats, dtype=np.float32).reshape(-1, self.index.d)
+        scores, idx_image = self.search(query_feats, k, nprobe, ef_search, id_filter)
+        return [self._collect_results(scores[i], idx_image[i]) for i in range(len(query_feats))]
+
+    def translate_query(self, text):
+        return self._translate(text)[0]
+
+    def _translate(self, text):
+        """Returns (query in English, cacheable); a translation that fell back is not cached."""
+        if self.query_cache is not None:
+            cached = self.query_cache.get_translation(text)
+            if cached is not None:
+                return cached, True
+        translated, ok = text, True
+        if is_vietnamese(text, ascii_fallback=getattr(self.translater, "ascii_fallback", True)):
+            if hasattr(self.translater, "translate_with_status"):
+                translated, ok = self.translater.translate_with_status(text)
             else:
-                pil_image = query
-            
-            # Get features
-            image_input = self.preprocess(pil_image).unsqueeze(0).to(self.device)
+                translated = self.translater(text)
+        if ok and self.query_cache is not None:
+            self.query_cache.put_translation(text, translated)
+        return translated, ok
+
+    def encode_texts(self, texts):
+        """
+        CLIP text features of `texts` (Vietnamese queries are translated first), shape (n, dim).
+        With a query cache, only queries never seen before are translated and encoded.
+        """
+        import torch
+        feats = [None] * len(texts)
+        if self.query_cache is not None:
+            feats = [self.query_cache.get_embedding(text) for text in texts]
+        missing = [i for i, feat in enumerate(feats) if feat is None]
+        if missing:
+            translated, cacheable = zip(*[self._translate(texts[i]) for i in missing])
+
+            ###### TEXT FEATURES EXACTING ######
+            tokens = clip.tokenize(list(translated)).to(self.device)
             with torch.no_grad():
-                query_feats = self.model.encode_image(image_input).cpu().numpy().astype(np.float32)
+                encoded = self.model.encode_text(tokens).cpu().numpy().astype(np.float32)
+            for i, feat, ok in zip(missing, encoded, cacheable):
+                feats[i] = feat
+                if ok and self.query_cache is not None:
+                    self.query_cache.put_embedding(texts[i], feat)
+        return np.stack(feats).astype(np.float32)
 
-        scores, idx_image = self.index.search(query_feats, k=k)
-        idx_image = idx_image.flatten()
+    def encode_images(self, images):
+        """CLIP image features of PIL images / numpy arrays, encoded in one batch, shape (n, dim)."""
+        import torch
+        batch = torch.stack([self.preprocess(self._to_pil(image)) for image in images]).to(self.device)
+        with torch.no_grad():
+            return self.model.encode_image(batch).cpu().numpy().astype(np.float32)
 
-        # Only keep results with valid path
-        valid_results = [(score, idx, self.id2img_fps.get(int(idx))) for score, idx in zip(scores[0], idx_image)]
-        valid_results = [r for r in valid_results if r[2] is not None]
-        # Unpack
-        scores_valid = [r[0] for r in valid_results]
-        idx_image_valid = [r[1] for r in valid_results]
-        infos_query_valid = [r[2] for r in valid_results]
-        image_paths_valid = [r[2] for r in valid_results]
+    @staticmethod
+    def _to_pil(image):
+        if not isinstance(image, np.ndarray):
+            return image
+        # Convert numpy array to PIL Image
+        if len(image.shape) == 3:
+            if image.shape[2] == 3:  # RGB
+                return Image.fromarray(image)
+            else:  # BGR
+                return Image.fromarray(image[:,:,::-1])
+        raise ValueError("Invalid image shape")
 
-        return [scores_valid], idx_image_valid, infos_query_valid, image_paths_valid
-    
-    def text_search(self, text, k):
-        if detect(text) == 'vi':
-            text = self.translater(text)
-
-        ###### TEXT FEATURES EXACTING ######
-        text = clip.tokenize([text]).to(self.device)  
-        text_features = self.model.encode_text(text).cpu().detach().numpy().astype(np.float32)
-
-        ###### SEARCHING #####
-        scores, idx_image = self.index.search(text_features, k=k)
-        idx_image = idx_image.flatten()
-
-        # Only keep results with valid path
-        valid_results = [(score, idx, self.id2img_fps.get(int(idx))) for score, idx in zip(scores[0], idx_image)]
-        valid_results = [r for r in valid_results if r[2] is not None]
-        # Unpack
-        scores_valid = [r[0] for r in valid_results]
-        idx_image_valid = [r[1] for r in valid_results]
-        infos_query_valid = [r[2] for r in valid_results]
-        image_paths_valid = [r[2] for r in valid_results]
-
-        return [scores_valid], idx_image_valid, infos_query_valid, image_paths_valid
\ No newline at end of file
+    def _collect_results(self, scores, idx_image):
+        # Only keep results with valid path (one vectorized lookup instead of a dict.get per hit)
+        valid = self.id2img_fps.valid(idx_image)
+        scores_valid = scores[valid]
+        idx_image_valid = idx_image[valid]
+        image_paths_valid = self.id2img_fps.paths(idx_image_valid)
+
+        return [scores_valid], idx_image_valid, image_paths_valid, image_paths_valid
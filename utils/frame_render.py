@@ -0,0 +1,107 @@
+import asyncio
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+
+# Size the /get_img frames were always rendered at
+DEFAULT_WIDTH = 1280
+DEFAULT_HEIGHT = 720
+
+
+class FrameRenderer:
+    """
+    Renders keyframes for the view page: resize, caption "<video>/<frame>" and JPEG-encode.
+
+    Encoded frames are kept in an LRU bounded by `max_bytes` and keyed by path, source mtime
+    and render parameters, so flipping back and forth through neighbouring keyframes is served
+    from memory. Rendering runs on a pool of `max_workers` threads; concurrent requests for the
+    same frame share one render.
+    """
+    def __init__(self, max_bytes=128 * 1024 * 1024, max_workers=4, missing_image="./static/images/404.jpg"):
+        self.max_bytes = max_bytes
+        self.missing_image = missing_image
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="render")
+        self._cache = OrderedDict()
+        self._inflight = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def submit(self, fpath, width=DEFAULT_WIDTH, quality=95) -> Future:
+        """Future of the encoded JPEG bytes (None if neither `fpath` nor the 404 image can be read)."""
+        width = int(min(max(width, 64), 3840))
+        quality = int(min(max(quality, 10), 100))
+        source = fpath if os.path.exists(fpath) else self.missing_image
+        try:
+            mtime_ns = os.stat(source).st_mtime_ns
+        except OSError:
+            mtime_ns = 0
+        key = (fpath, source, mtime_ns, width, quality)
+        with self._lock:
+            data = self._cache.get(key)
+            if data is not None:
+                self._cache.move_to_end(key)
+                self._hits += 1
+                future = Future()
+                future.set_result(data)
+                return future
+            future = self._inflight.get(key)
+            if future is not None:
+                self._hits += 1
+                return future
+            self._misses += 1
+            future = self._inflight[key] = self._pool.submit(self._render, key)
+        future.add_done_callback(lambda done: self._store(key, done))
+        return future
+
+    def render(self, fpath, width=DEFAULT_WIDTH, quality=95):
+        return self.submit(fpath, width, quality).result()
+
+    async def arender(self, fpath, width=DEFAULT_WIDTH, quality=95):
+        return await asyncio.wrap_future(self.submit(fpath, width, quality))
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "items": len(self._cache),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": self._hits / lookups if lookups else 0.0,
+            }
+
+    @staticmethod
+    def _render(key):
+        fpath, source, _, width, quality = key
+        img = cv2.imread(source)
+        if img is None:
+            return None
+        height = width * DEFAULT_HEIGHT // DEFAULT_WIDTH
+        img = cv2.resize(img, (width, height), interpolation=cv2.INTER_AREA if width < img.shape[1] else cv2.INTER_LINEAR)
+        # Caption scaled with the frame so smaller renders keep the 1280x720 look
+        scale = width / DEFAULT_WIDTH
+        image_name = "/".join(fpath.split("/")[-2:])
+        img = cv2.putText(img, image_name, (int(30 * scale), int(80 * scale)), cv2.FONT_HERSHEY_SIMPLEX,
+                          3 * scale, (255, 0, 0), max(1, int(round(4 * scale))), cv2.LINE_AA)
+        ok, jpeg = cv2.imencode('.jpg', img, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return jpeg.tobytes() if ok else None
+
+    def _store(self, key, future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            if future.exception() is not None:
+                return
+            data = future.result()
+            if data is None or len(data) > self.max_bytes or key in self._cache:
+                return
+            self._cache[key] = data
+            self._bytes += len(data)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._cache.popitem(last=False)
+                self._bytes -= len(evicted)
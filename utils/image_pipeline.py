@@ -0,0 +1,95 @@
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+
+class PipelineStats:
+    """Wall-clock time spent in each stage of an index build, to size the decode pool."""
+    def __init__(self, num_workers):
+        self.num_workers = num_workers
+        self.images = 0
+        self.decode_seconds = 0.0   # summed over workers
+        self.wait_seconds = 0.0     # encoder idle, waiting for a decoded batch
+        self.encode_seconds = 0.0
+        self.started = time.perf_counter()
+
+    def rates(self):
+        wall = max(time.perf_counter() - self.started, 1e-9)
+        return {
+            "images": self.images,
+            "decode_img_per_s": self.images / max(self.decode_seconds, 1e-9) * self.num_workers,
+            "decode_img_per_s_per_worker": self.images / max(self.decode_seconds, 1e-9),
+            "encode_img_per_s": self.images / max(self.encode_seconds, 1e-9),
+            "overall_img_per_s": self.images / wall,
+            "encoder_wait_ratio": self.wait_seconds / wall,
+        }
+
+    def report(self):
+        r = self.rates()
+        return (f"{r['images']} images | decode {r['decode_img_per_s']:.1f} img/s "
+                f"({self.num_workers} workers, {r['decode_img_per_s_per_worker']:.1f} img/s each) | "
+                f"encode {r['encode_img_per_s']:.1f} img/s | overall {r['overall_img_per_s']:.1f} img/s | "
+                f"encoder waiting {r['encoder_wait_ratio']:.0%} of the time")
+
+
+class PrefetchLoader:
+    """
+    Producer/consumer loader for index builds: a thread pool opens, converts and preprocesses
+    whole batches while the caller runs CLIP on the previous one.
+
+    At most `num_workers + prefetch` batches are in flight, so memory stays bounded.
+    Iterating yields (batch_ids, batch_stamps, batch_tensor); images that fail to load are
+    dropped from the batch, and a batch where every image failed yields a None tensor.
+    """
+    def __init__(self, id2img_fps, ids, stamps, preprocess, batch_size=64, num_workers=4, prefetch=2):
+        self.id2img_fps = id2img_fps
+        self.ids = ids
+        self.stamps = stamps
+        self.preprocess = preprocess
+        self.batch_size = batch_size
+        self.num_workers = max(1, num_workers)
+        self.prefetch = max(0, prefetch)
+        self.stats = PipelineStats(self.num_workers)
+
+    def __len__(self):
+        return (len(self.ids) + self.batch_size - 1) // self.batch_size
+
+    def _load_batch(self, start):
+        import torch
+        began = time.perf_counter()
+        batch_ids = []
+        batch_stamps = []
+        batch_imgs = []
+        for image_id, stamp in zip(self.ids[start:start + self.batch_size], self.stamps[start:start + self.batch_size]):
+            img_path = self.id2img_fps[image_id]
+            try:
+                image = Image.open(img_path).convert("RGB")
+                batch_imgs.append(self.preprocess(image))
+                batch_ids.append(image_id)
+                batch_stamps.append(stamp)
+            except Exception as e:
+                print(f"[Myfaiss] Error processing {img_path}: {e}")
+        tensor = torch.stack(batch_imgs) if batch_imgs else None
+        return batch_ids, batch_stamps, tensor, time.perf_counter() - began
+
+    def __iter__(self):
+        starts = iter(range(0, len(self.ids), self.batch_size))
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="decode") as pool:
+            for start in starts:
+                pending.append(pool.submit(self._load_batch, start))
+                if len(pending) >= self.num_workers + self.prefetch:
+                    break
+            while pending:
+                waited = time.perf_counter()
+                batch_ids, batch_stamps, tensor, decode_seconds = pending.popleft().result()
+                self.stats.wait_seconds += time.perf_counter() - waited
+                self.stats.decode_seconds += decode_seconds
+                self.stats.images += len(batch_ids)
+                # Refill before handing the batch to the encoder so workers never sit idle
+                start = next(starts, None)
+                if start is not None:
+                    pending.append(pool.submit(self._load_batch, start))
+                yield batch_ids, batch_stamps, tensor
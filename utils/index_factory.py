@@ -0,0 +1,335 @@
+import math
+import os
+import re
+
+import faiss
+import numpy as np
+
+# Short names accepted by Myfaiss.build_index_from_store(index_spec=...).
+# Anything else is handed to faiss.index_factory as is ("{nlist}" and "{m}" are filled in).
+# Flat and HNSW indexes have no ids of their own, so they are wrapped in IDMap2 to keep
+# image_path.json ids; IVF indexes store ids natively.
+INDEX_SPECS = {
+    "flat": "IDMap2,Flat",
+    "ivf-flat": "IVF{nlist},Flat",
+    "ivf-pq": "IVF{nlist},PQ{m}",
+    "hnsw": "IDMap2,HNSW32",
+    "opq-ivf-pq": "OPQ{m},IVF{nlist},PQ{m}",
+    # Compact storage: 8-bit scalar quantizer (4x smaller than float32) or float16 (2x)
+    "flat-sq8": "IDMap2,SQ8",
+    "flat-fp16": "IDMap2,SQfp16",
+    "ivf-sq8": "IVF{nlist},SQ8",
+    "ivf-fp16": "IVF{nlist},SQfp16",
+    "hnsw-sq8": "IDMap2,HNSW32,SQ8",
+}
+
+# "cosine" = inner product on L2-normalized vectors, which is how CLIP embeddings are meant to be compared
+METRICS = {
+    "l2": faiss.METRIC_L2,
+    "ip": faiss.METRIC_INNER_PRODUCT,
+    "cosine": faiss.METRIC_INNER_PRODUCT,
+}
+
+
+def auto_nlist(num_vectors):
+    """
+    Number of IVF lists for a corpus: about 4 * sqrt(N), rounded to a power of two,
+    capped so every centroid still gets at least 39 training points.
+    """
+    if num_vectors <= 0:
+        return 1
+    nlist = 2 ** int(round(math.log2(max(1.0, 4 * math.sqrt(num_vectors)))))
+    return max(1, min(nlist, num_vectors // 39))
+
+
+def resolve_spec(index_spec, dim, num_vectors, nlist=None):
+    """Turn a short name or factory string into a concrete faiss factory string."""
+    factory = INDEX_SPECS.get(index_spec.lower(), index_spec)
+    if nlist is None:
+        nlist = auto_nlist(num_vectors)
+    # PQ with 8 dims per sub-quantizer (64 bytes per ViT-B/32 vector)
+    m = max(1, dim // 8)
+    return factory.format(nlist=nlist, m=m)
+
+
+def make_index(index_spec, dim, num_vectors, nlist=None, metric="l2"):
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric!r}, expected one of {sorted(METRICS)}")
+    return faiss.index_factory(dim, resolve_spec(index_spec, dim, num_vectors, nlist), METRICS[metric])
+
+
+def describe_index(index):
+    """
+    (index_spec, metric) that rebuilds an index like `index`: its INDEX_SPECS short name when it
+    is one of them, otherwise its factory string with the IVF list count left as "{nlist}" (so a
+    rebuild still sizes it for the current corpus). (None, None) without an index, spec None for
+    the id-less clear_index() placeholder. ValueError when the index type cannot be named.
+    """
+    if index is None:
+        return None, None
+    metric = index_metric(index)
+    factory = _factory_string(index)
+    if factory is None:
+        raise ValueError(f"Cannot infer the type of the loaded index ({type(faiss.downcast_index(index)).__name__}), "
+                         f"pass index_spec (--index-spec)")
+    if factory == "Flat":
+        return None, metric
+    factory = re.sub(r"IVF\d+", "IVF{nlist}", factory)
+    # reverse_index_factory spells out defaults: PQ64 -> PQ64x8, OPQ64 -> OPQ64_512
+    plain = re.sub(r"PQ(\d+)x8\b", r"PQ\1", factory)
+    plain = re.sub(r"OPQ(\d+)_(\d+)", lambda m: f"OPQ{m.group(1)}" if int(m.group(2)) == index.d else m.group(0), plain)
+    for name in INDEX_SPECS:
+        if resolve_spec(name, index.d, 0, nlist="{nlist}") == plain:
+            return name, metric
+    return factory, metric
+
+
+def _factory_string(index):
+    try:
+        from faiss.contrib.factory_tools import reverse_index_factory
+    except ImportError:
+        return None
+    try:
+        return reverse_index_factory(index)
+    except (NotImplementedError, RuntimeError, AssertionError):
+        pass
+    # An OPQ rotation is written as a plain LinearTransform, so reverse_index_factory cannot name
+    # a loaded OPQ index: a square rotation in front of a PQ index is taken as OPQ{M of the PQ}
+    index = faiss.downcast_index(index)
+    if not isinstance(index, faiss.IndexPreTransform):
+        return None
+    parts = []
+    for i in range(index.chain.size()):
+        transform = faiss.downcast_VectorTransform(index.chain.at(i))
+        if isinstance(transform, faiss.OPQMatrix):
+            parts.append(f"OPQ{transform.M}_{transform.d_out}")
+        elif type(transform) is faiss.LinearTransform and transform.d_in == transform.d_out and _pq_m(index.index):
+            parts.append(f"OPQ{_pq_m(index.index)}_{transform.d_out}")
+        elif isinstance(transform, faiss.PCAMatrix):
+            parts.append(f"PCA{transform.d_out}")
+        elif isinstance(transform, faiss.NormalizationTransform):
+            parts.append("L2norm")
+        else:
+            return None
+    inner = _factory_string(index.index)
+    return None if inner is None else ",".join(parts + [inner])
+
+
+def _pq_m(index):
+    """Number of PQ sub-quantizers of an (IVF)PQ index, 0 for other types."""
+    try:
+        index = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        pass
+    pq = getattr(faiss.downcast_index(index), "pq", None)
+    return int(pq.M) if pq is not None else 0
+
+
+def index_metric(index):
+    """"cosine" for inner-product indexes, "l2" otherwise, None without an index."""
+    if index is None:
+        return None
+    return "cosine" if uses_inner_product(index) else "l2"
+
+
+def uses_inner_product(index):
+    """True for indexes built with metric="ip"/"cosine": vectors and queries must be L2-normalized."""
+    return index is not None and index.metric_type == faiss.METRIC_INNER_PRODUCT
+
+
+def normalize(feats):
+    """L2-normalized float32 copy of `feats` (the input, e.g. a store memmap, is left untouched)."""
+    feats = np.array(feats, dtype=np.float32, copy=True)
+    faiss.normalize_L2(feats)
+    return feats
+
+
+def read_index(path, mode="heap"):
+    """
+    Load an index file; returns (index, mode actually used).
+    mode="mmap" maps the file read-only instead of copying it onto the heap, so every worker
+    process serving the same file shares one page-cache copy and cold start only costs page
+    faults. IVF inverted lists can always be mapped; flat/SQ/HNSW code arrays need a faiss
+    build with IO_FLAG_MMAP_IFC. Types that cannot be mapped are loaded on the heap.
+    """
+    if mode == "mmap":
+        last_error = None
+        for flag_name in ("IO_FLAG_MMAP_IFC", "IO_FLAG_MMAP"):
+            flag = getattr(faiss, flag_name, None)
+            if flag is None:
+                continue
+            try:
+                index = faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                last_error = e
+                continue
+            if flag_name == "IO_FLAG_MMAP" and not _is_ivf(index):
+                # Plain IO_FLAG_MMAP only maps inverted lists, anything else was read onto the heap
+                return index, "heap"
+            return index, "mmap"
+        print(f"[Myfaiss] Cannot memory-map {path} ({last_error}), loading it on the heap")
+    return faiss.read_index(path), "heap"
+
+
+def enable_reconstruct(index):
+    """
+    Let index.reconstruct(id) work on IVF indexes, which need an id -> list position map for it.
+    The map is a hashtable built in memory from the inverted lists (also on a read-only mapping).
+    """
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return
+    if ivf.direct_map.type == faiss.DirectMap.NoMap:
+        ivf.set_direct_map_type(faiss.DirectMap.Hashtable)
+
+
+def drop_direct_map(index):
+    """Undo enable_reconstruct before remove_ids (a hashtable map only accepts IDSelectorArray) and writes."""
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return
+    if ivf.direct_map.type != faiss.DirectMap.NoMap:
+        ivf.set_direct_map_type(faiss.DirectMap.NoMap)
+
+
+def write_index(index, path):
+    """
+    Write to a temporary file and rename it over `path`, so processes that memory-mapped the
+    old file keep their (unlinked) copy instead of reading a half-written one.
+    """
+    tmp_path = path + ".tmp"
+    faiss.write_index(index, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def _is_ivf(index):
+    try:
+        faiss.extract_index_ivf(index)
+        return True
+    except RuntimeError:
+        return False
+
+
+def default_train_size(index, num_vectors):
+    """Enough points to train the coarse quantizer well without clustering the whole corpus."""
+    try:
+        nlist = faiss.extract_index_ivf(index).nlist
+    except RuntimeError:
+        nlist = 1
+    return min(num_vectors, max(100000, 64 * nlist))
+
+
+def search_parameters(index, nprobe=None, ef_search=None, sel=None):
+    """
+    Per-call search parameters (nprobe for IVF, efSearch for HNSW, an IDSelector `sel` to
+    restrict the ids searched), or None to use the index defaults. Passed to
+    index.search(params=...), so concurrent requests with different settings do not race on
+    shared index attributes. With only `sel`, nprobe / efSearch keep the index defaults.
+    nprobe above nlist is clamped (it cannot probe more lists than exist); values below 1 are a ValueError.
+    """
+    if nprobe is None and ef_search is None and sel is None:
+        return None
+    if (nprobe is not None and int(nprobe) < 1) or (ef_search is not None and int(ef_search) < 1):
+        raise ValueError("nprobe and ef_search must be >= 1")
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None and (nprobe is not None or sel is not None):
+        params = faiss.SearchParametersIVF(nprobe=min(int(nprobe if nprobe is not None else ivf.nprobe), ivf.nlist))
+        if sel is not None:
+            params.sel = sel
+        return params
+    hnsw = _find_hnsw(index)
+    if hnsw is not None and (ef_search is not None or sel is not None):
+        params = faiss.SearchParametersHNSW(efSearch=int(ef_search if ef_search is not None else hnsw.hnsw.efSearch))
+        if sel is not None:
+            params.sel = sel
+        return params
+    if sel is not None:
+        return faiss.SearchParameters(sel=sel)
+    return None
+
+
+# Upper bound of the efSearch a filtered HNSW search is raised to
+MAX_FILTERED_EF_SEARCH = 16384
+
+
+def filtered_effort(index, nprobe, ef_search, k, selectivity):
+    """
+    nprobe / efSearch for a search restricted by an IDSelector to a `selectivity` fraction of
+    the index. The selector only drops ids among the lists probed / nodes visited, so the
+    effort is scaled by 1 / selectivity to see about as many allowed ids as an unfiltered search.
+    """
+    selectivity = min(max(float(selectivity), 1e-6), 1.0)
+    try:
+        ivf = faiss.extract_index_ivf(index)
+    except RuntimeError:
+        ivf = None
+    if ivf is not None:
+        base = int(nprobe if nprobe is not None else ivf.nprobe)
+        nprobe = min(ivf.nlist, max(base, math.ceil(base / selectivity)))
+    hnsw = _find_hnsw(index)
+    if hnsw is not None:
+        base = max(int(ef_search if ef_search is not None else hnsw.hnsw.efSearch), int(k))
+        ef_search = min(MAX_FILTERED_EF_SEARCH, max(base, math.ceil(base / selectivity)))
+    return nprobe, ef_search
+
+
+def exact_search(queries, ids, read, k, inner_product, chunk_size=65536):
+    """
+    Brute-force top-k of `queries` over the vectors of `ids` (read(ids) -> float32 rows as the
+    index holds them), a chunk at a time. Same layout as index.search: (scores, ids), best
+    first, padded with id -1 when there are fewer than k ids.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    ids = np.asarray(ids, dtype=np.int64)
+    sign = -1.0 if inner_product else 1.0  # sort key: smaller is better
+    best_scores = np.empty((len(queries), 0), dtype=np.float32)
+    best_ids = np.empty((len(queries), 0), dtype=np.int64)
+    query_norms = (queries ** 2).sum(axis=1)[:, None]
+    for start in range(0, len(ids), chunk_size):
+        chunk = ids[start:start + chunk_size]
+        vectors = read(chunk)
+        scores = queries @ vectors.T
+        if not inner_product:
+            scores = np.maximum(query_norms + (vectors ** 2).sum(axis=1)[None, :] - 2 * scores, 0)
+        scores = np.concatenate([best_scores, scores.astype(np.float32)], axis=1)
+        chunk_ids = np.concatenate([best_ids, np.broadcast_to(chunk, (len(queries), len(chunk)))], axis=1)
+        if scores.shape[1] > k:
+            top = np.argpartition(sign * scores, k - 1, axis=1)[:, :k]
+            scores, chunk_ids = np.take_along_axis(scores, top, 1), np.take_along_axis(chunk_ids, top, 1)
+        best_scores, best_ids = scores, chunk_ids
+    order = np.argsort(sign * best_scores, axis=1, kind="stable")
+    best_scores, best_ids = np.take_along_axis(best_scores, order, 1), np.take_along_axis(best_ids, order, 1)
+    missing = k - best_scores.shape[1]
+    if missing > 0:
+        pad = -sign * np.finfo(np.float32).max
+        best_scores = np.pad(best_scores, ((0, 0), (0, missing)), constant_values=pad)
+        best_ids = np.pad(best_ids, ((0, 0), (0, missing)), constant_values=-1)
+    return best_scores, best_ids
+
+
+def set_default_search_parameters(index, nprobe=None, ef_search=None):
+    """Store deployment-wide defaults on the index itself (used when a request gives none)."""
+    if nprobe is not None:
+        try:
+            ivf = faiss.extract_index_ivf(index)
+            ivf.nprobe = min(int(nprobe), ivf.nlist)
+        except RuntimeError:
+            pass
+    if ef_search is not None:
+        hnsw = _find_hnsw(index)
+        if hnsw is not None:
+            hnsw.hnsw.efSearch = int(ef_search)
+
+
+def _find_hnsw(index):
+    while index is not None:
+        index = faiss.downcast_index(index)
+        if isinstance(index, faiss.IndexHNSW):
+            return index
+        index = getattr(index, "index", None)
+    return None
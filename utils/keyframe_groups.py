@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+
+
+class KeyframeGroups:
+    """
+    Runs of near-identical consecutive keyframes collapsed to one representative each.
+
+    Within a video folder, keyframes are taken in frame order and a run continues while each
+    frame's cosine similarity to the previous one is >= `threshold` (and the run is shorter
+    than `max_group`, which bounds drift along slow pans). The member closest to the run's
+    mean vector becomes its representative; only representatives go into the FAISS index.
+
+    Stored as CSR arrays: reps (sorted ids), indptr, members (frame order), plus rep_of, an
+    id-indexed array mapping every grouped id to its representative (-1: not grouped, the id
+    stands for itself).
+    """
+    def __init__(self, reps, indptr, members, rep_of, threshold=0.95, max_group=32):
+        self.reps = np.asarray(reps, dtype=np.int64)
+        self.indptr = np.asarray(indptr, dtype=np.int64)
+        self.members = np.asarray(members, dtype=np.int64)
+        self.rep_of = np.asarray(rep_of, dtype=np.int64)
+        self.threshold = float(threshold)
+        self.max_group = int(max_group)
+
+    @staticmethod
+    def default_path(bin_file):
+        """faiss_normal_ViT.bin -> faiss_normal_ViT_groups.npz (next to the index, like the embedding store)."""
+        return os.path.splitext(bin_file)[0] + "_groups.npz"
+
+    @classmethod
+    def build(cls, path_table, store, threshold=0.95, max_group=32, verbose=True):
+        """Group the keyframes of every video folder of `path_table` that have a vector in `store`."""
+        size = path_table.id_bound
+        rep_of = np.full(size, -1, dtype=np.int64)
+        dir_of = path_table.dir_idx
+        has_vector = np.zeros(size, dtype=bool)
+        stored = store.ids()
+        has_vector[stored[stored < size]] = True
+        # ids ordered by (folder, frame number)
+        candidates = np.flatnonzero((dir_of >= 0) & has_vector)
+        order = candidates[np.lexsort((path_table.frames[candidates], dir_of[candidates]))]
+        bounds = np.flatnonzero(np.diff(dir_of[order])) + 1
+        reps, sizes, members = [], [], []
+        for ids in np.split(order, bounds):
+            if len(ids) == 0:
+                continue
+            unit = store.read(ids)
+            unit /= np.maximum(np.linalg.norm(unit, axis=1, keepdims=True), 1e-12)
+            # a new run starts where consecutive frames differ
+            starts = np.ones(len(ids), dtype=bool)
+            starts[1:] = np.einsum("ij,ij->i", unit[1:], unit[:-1]) < threshold
+            run = np.cumsum(starts) - 1
+            # split runs longer than max_group
+            run_start = np.flatnonzero(starts)
+            offset = np.arange(len(ids)) - run_start[run]
+            starts |= offset % max_group == 0
+            run_start = np.flatnonzero(starts)
+            run = np.cumsum(starts) - 1
+            # representative: member with the highest similarity to its run's mean direction
+            means = np.add.reduceat(unit, run_start, axis=0)
+            closeness = np.einsum("ij,ij->i", unit, means[run])
+            best = np.full(len(run_start), -np.inf, dtype=np.float32)
+            np.maximum.at(best, run, closeness)
+            is_best = closeness >= best[run]
+            # first member reaching the maximum, per run
+            first_best = np.full(len(run_start), len(ids), dtype=np.int64)
+            np.minimum.at(first_best, run[is_best], np.flatnonzero(is_best))
+            run_reps = ids[first_best]
+            rep_of[ids] = run_reps[run]
+            reps.append(run_reps)
+            sizes.append(np.diff(np.append(run_start, len(ids))))
+            members.append(ids)
+        if not reps:
+            return cls(np.empty(0), np.zeros(1), np.empty(0), rep_of, threshold, max_group)
+        reps, sizes, members = np.concatenate(reps), np.concatenate(sizes), np.concatenate(members)
+        indptr = np.concatenate([[0], np.cumsum(sizes)])
+        # CSR rows sorted by representative id, so expand() is a binary search
+        by_rep = np.argsort(reps, kind="stable")
+        starts, stops = indptr[:-1][by_rep], indptr[1:][by_rep]
+        members = np.concatenate([members[a:b] for a, b in zip(starts, stops)])
+        indptr = np.concatenate([[0], np.cumsum(sizes[by_rep])])
+        groups = cls(reps[by_rep], indptr, members, rep_of, threshold, max_group)
+        if verbose:
+            print(f"[Myfaiss] Collapsed {len(members)} keyframes into {len(groups.reps)} groups "
+                  f"(threshold {threshold}, max {max_group} per group)")
+        return groups
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, reps=self.reps, indptr=self.indptr, members=self.members, rep_of=self.rep_of,
+                 threshold=np.float64(self.threshold), max_group=np.int64(self.max_group))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["reps"], data["indptr"], data["members"], data["rep_of"],
+                       float(data["threshold"]), int(data["max_group"]))
+
+    def __len__(self):
+        return len(self.reps)
+
+    def representative(self, ids):
+        """Representative id of each id (ungrouped ids map to themselves)."""
+        ids = np.asarray(ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self.rep_of))
+        rep = np.where(in_range, self.rep_of[np.where(in_range, ids, 0)] if len(self.rep_of) else -1, -1)
+        return np.where(rep >= 0, rep, ids)
+
+    def indexed(self, ids):
+        """Mask of the ids that go into the index: representatives and ungrouped ids."""
+        ids = np.asarray(ids, dtype=np.int64)
+        return self.representative(ids) == ids
+
+    def group_sizes(self, rep_ids):
+        """Number of keyframes behind each representative (1 for ungrouped ids)."""
+        rep_ids = np.asarray(rep_ids, dtype=np.int64)
+        pos = np.minimum(np.searchsorted(self.reps, rep_ids), max(len(self.reps) - 1, 0))
+        found = (self.reps[pos] == rep_ids) if len(self.reps) else np.zeros(len(rep_ids), dtype=bool)
+        return np.where(found, self.indptr[pos + 1] - self.indptr[pos], 1)
+
+    def expand(self, rep_ids):
+        """Member ids (frame order) of each representative; an ungrouped id expands to itself."""
+        rep_ids = np.asarray(rep_ids, dtype=np.int64).reshape(-1)
+        pos = np.searchsorted(self.reps, rep_ids)
+        out = []
+        for rep_id, p in zip(rep_ids.tolist(), pos.tolist()):
+            if p < len(self.reps) and self.reps[p] == rep_id:
+                out.append(self.members[self.indptr[p]:self.indptr[p + 1]])
+            else:
+                out.append(np.asarray([rep_id], dtype=np.int64))
+        return out
@@ -0,0 +1,161 @@
+import csv
+import hashlib
+import os
+
+import numpy as np
+
+DEFAULT_FPS = 25.0
+
+
+def read_map_csv(path):
+    """map-keyframes CSV (n, pts_time, fps, frame_idx) -> (n, frame_idx, pts_time) arrays."""
+    n, frame_idx, pts = [], [], []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            n.append(int(float(row["n"])))
+            frame_idx.append(int(float(row["frame_idx"])))
+            pts.append(float(row["pts_time"]))
+    return np.asarray(n, dtype=np.int64), np.asarray(frame_idx, dtype=np.int64), np.asarray(pts, dtype=np.float64)
+
+
+class KeyframeIndex:
+    """
+    Image id -> (video, frame index, pts seconds), as flat NumPy arrays indexed by id.
+
+    Built from the keyframe layout (<dir>/<video>/<number>.jpg in the PathTable). When the
+    challenge's map-keyframes/<video>.csv exists, <number> is its keyframe n and frame_idx /
+    pts_time come from the CSV; otherwise <number> is the frame index itself and the time is
+    frame / fps from the video catalog. Saved as one .npz, so loading is a few array reads;
+    `source_key` fingerprints the inputs (see sources_key) so a saved index is only reused for them.
+    """
+    def __init__(self, videos, video_idx, keyframe_n, frame_idx, pts, source_mtime=0.0, source_key=""):
+        self.videos = list(videos)
+        self.video_idx = np.asarray(video_idx, dtype=np.int32)
+        self.keyframe_n = np.asarray(keyframe_n, dtype=np.int64)
+        self.frame_idx = np.asarray(frame_idx, dtype=np.int64)
+        self.pts = np.asarray(pts, dtype=np.float64)
+        self.source_mtime = float(source_mtime)
+        self.source_key = str(source_key)
+        self._video_lookup = {name: i for i, name in enumerate(self.videos)}
+        self._order = None  # (ids sorted by video and keyframe number, their video column), built by find()
+
+    @staticmethod
+    def sources_key(path_table, catalog=None, map_dir=None, source_mtime=0.0):
+        """
+        Fingerprint of everything build() reads: the image_path.json mtime, and per video its
+        catalog fps / file mtime and its map CSV mtime (so fallback times are redone once they are known).
+        """
+        digest = hashlib.sha1(repr(float(source_mtime)).encode())
+        for name in sorted({os.path.basename(directory) for directory in path_table.dirs}):
+            info = (catalog.get(name, probe_missing=False) if catalog is not None else None) or {}
+            try:
+                csv_mtime = os.stat(os.path.join(map_dir, name + ".csv")).st_mtime_ns if map_dir else -1
+            except OSError:
+                csv_mtime = -1
+            digest.update(f"{name}\0{info.get('fps')}\0{info.get('mtime_ns')}\0{csv_mtime}\n".encode("utf-8"))
+        return digest.hexdigest()
+
+    @classmethod
+    def build(cls, path_table, catalog=None, map_dir=None, source_mtime=0.0, source_key=None):
+        size = path_table.id_bound
+        video_idx = np.full(size, -1, dtype=np.int32)
+        keyframe_n = np.zeros(size, dtype=np.int64)
+        frame_idx = np.zeros(size, dtype=np.int64)
+        pts = np.zeros(size, dtype=np.float64)
+        videos, lookup = [], {}
+        dir_of = path_table.dir_idx
+        order = np.argsort(dir_of, kind="stable")
+        bounds = np.searchsorted(dir_of[order], np.arange(len(path_table.dirs) + 1))
+        for d, directory in enumerate(path_table.dirs):
+            ids = order[bounds[d]:bounds[d + 1]]
+            if len(ids) == 0:
+                continue
+            name = os.path.basename(directory)
+            v = lookup.get(name)
+            if v is None:
+                v = lookup[name] = len(videos)
+                videos.append(name)
+            n = path_table.frames[ids]
+            video_idx[ids] = v
+            keyframe_n[ids] = n
+            info = catalog.get(name, probe_missing=False) if catalog is not None else None
+            fps = (info or {}).get("fps") or DEFAULT_FPS
+            frame_idx[ids] = n
+            pts[ids] = n / fps
+            csv_path = os.path.join(map_dir, name + ".csv") if map_dir else None
+            if csv_path and os.path.exists(csv_path):
+                map_n, map_frame, map_pts = read_map_csv(csv_path)
+                if len(map_n):
+                    sort = np.argsort(map_n)
+                    map_n, map_frame, map_pts = map_n[sort], map_frame[sort], map_pts[sort]
+                    pos = np.minimum(np.searchsorted(map_n, n), len(map_n) - 1)
+                    found = map_n[pos] == n
+                    frame_idx[ids[found]] = map_frame[pos[found]]
+                    pts[ids[found]] = map_pts[pos[found]]
+        if source_key is None:
+            source_key = cls.sources_key(path_table, catalog, map_dir, source_mtime)
+        return cls(videos, video_idx, keyframe_n, frame_idx, pts, source_mtime, source_key)
+
+    def save(self, path):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, videos=np.asarray(self.videos, dtype=str), video_idx=self.video_idx,
+                 keyframe_n=self.keyframe_n, frame_idx=self.frame_idx, pts=self.pts,
+                 source_mtime=np.float64(self.source_mtime), source_key=np.asarray(self.source_key))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["videos"].tolist(), data["video_idx"], data["keyframe_n"], data["frame_idx"],
+                       data["pts"], float(data["source_mtime"]), str(data["source_key"]))
+
+    @classmethod
+    def load_or_build(cls, path, path_table, catalog=None, map_dir=None, source_mtime=0.0):
+        """Reuse `path` if it was built from the same inputs (sources_key), otherwise rebuild and save it."""
+        source_key = cls.sources_key(path_table, catalog, map_dir, source_mtime)
+        if path and os.path.exists(path):
+            try:
+                index = cls.load(path)
+                if index.source_key == source_key and len(index.video_idx) == path_table.id_bound:
+                    return index
+            except (OSError, ValueError, KeyError) as e:
+                print(f"[Myfaiss] Rebuilding unreadable keyframe index {path}: {e}")
+        index = cls.build(path_table, catalog, map_dir, source_mtime, source_key)
+        if path:
+            index.save(path)
+        return index
+
+    def __len__(self):
+        return int((self.video_idx >= 0).sum())
+
+    def lookup(self, ids):
+        """Columnar (video, frame_idx, seconds) of many ids; unknown ids get video None and -1 / -1.0."""
+        ids = np.asarray(ids, dtype=np.int64).reshape(-1)
+        in_range = (ids >= 0) & (ids < len(self.video_idx))
+        safe = np.where(in_range, ids, 0)
+        video_idx = np.where(in_range, self.video_idx[safe] if len(self.video_idx) else -1, -1)
+        valid = video_idx >= 0
+        return {
+            "ids": ids.tolist(),
+            "video": [self.videos[v] if v >= 0 else None for v in video_idx.tolist()],
+            "frame_idx": np.where(valid, self.frame_idx[safe] if len(self.frame_idx) else -1, -1).tolist(),
+            "seconds": np.where(valid, self.pts[safe] if len(self.pts) else -1.0, -1.0).tolist(),
+        }
+
+    def find(self, video, keyframe_n):
+        """Image id of keyframe <keyframe_n> of `video` (the number in its file name), or None."""
+        v = self._video_lookup.get(video)
+        if v is None:
+            return None
+        sorted_ids = self._order
+        if sorted_ids is None:
+            # ids sorted by (video, keyframe number) for binary search, published as one tuple so
+            # a concurrent find() never sees an order without its video column
+            order = np.lexsort((self.keyframe_n, self.video_idx))
+            sorted_ids = self._order = (order, self.video_idx[order])
+        order, keys_v = sorted_ids
+        lo, hi = np.searchsorted(keys_v, v, side="left"), np.searchsorted(keys_v, v, side="right")
+        pos = lo + np.searchsorted(self.keyframe_n[order[lo:hi]], int(keyframe_n))
+        if pos < hi and self.keyframe_n[order[pos]] == int(keyframe_n):
+            return int(order[pos])
+        return None
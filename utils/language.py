@@ -0,0 +1,50 @@
+import unicodedata
+
+from langdetect import DetectorFactory, detect
+
+# langdetect is randomized by default; seed it so the fallback gives the same answer every time
+DetectorFactory.seed = 0
+
+# Letters that only occur in Vietnamese: ă đ ơ ư, and vowels with hook above, dot below,
+# or tone marks stacked on a circumflex / breve / horn
+_VI_ONLY = set(
+    "ăđơư"
+    "ảẻỉỏủỷ"
+    "ạẹịọụỵ"
+    "ẽĩũỹ"
+    "ằắẳẵặầấẩẫậềếểễệồốổỗộờớởỡợừứửữự"
+)
+# Accented letters Vietnamese shares with French, Portuguese, ...
+_VI_SHARED = set("àáâãèéêìíòóôõùúý")
+
+
+def is_vietnamese(text, ascii_fallback=True):
+    """
+    Fast, deterministic check whether a query is Vietnamese.
+    - any Vietnamese-only letter (ă, đ, ơ, ư, ả, ạ, ế, ...) -> True
+    - letters from another script (CJK, Cyrillic, ...) -> False
+    - only accents shared with other languages (à, é, ô, ...) -> seeded langdetect decides
+    - plain ASCII of several words -> True unless langdetect says English, for users typing
+      Vietnamese without diacritics (langdetect rarely answers "vi" for it, more often tl / fr / id);
+      a single ASCII word, or any ASCII with `ascii_fallback` off -> False (searched as English)
+    """
+    text = unicodedata.normalize("NFC", text.lower())
+    shared = False
+    for ch in text:
+        if ch in _VI_ONLY:
+            return True
+        if ch in _VI_SHARED:
+            shared = True
+        elif ord(ch) > 127 and ch.isalpha():
+            return False
+    if not shared:
+        if not ascii_fallback or len(text.split()) < 2:
+            return False
+        try:
+            return detect(text) != "en"
+        except Exception:
+            return False
+    try:
+        return detect(text) == "vi"
+    except Exception:
+        return False
@@ -0,0 +1,134 @@
+import os
+
+import numpy as np
+
+
+class PathTable:
+    """
+    Compact, array-backed replacement for the {id: keyframe path} dict.
+
+    Keyframe paths look like "<dir>/<zero-padded frame number><ext>", so a path is stored as an
+    index into one interned list of directories (int32) plus the frame number (int64); the pad
+    width and extension are kept once per directory. Paths that do not follow the pattern are
+    kept as is in `overrides`. Ids index the arrays directly (dir_idx == -1 marks a missing id),
+    which turns invalid-id masking of FAISS results into one vectorized lookup.
+
+    Reads like the dict it replaces: table[id], table.get(id), id in table, keys(), items(), len().
+    """
+    def __init__(self, dirs, widths, exts, dir_idx, frames, overrides=None):
+        self.dirs = list(dirs)
+        self.widths = np.asarray(widths, dtype=np.int32)
+        self.exts = list(exts)
+        self.dir_idx = np.asarray(dir_idx, dtype=np.int32)
+        self.frames = np.asarray(frames, dtype=np.int64)
+        self.overrides = dict(overrides or {})
+        self._prefixes = [d + "/" if d else "" for d in self.dirs]
+        self._override_ids = np.fromiter(self.overrides, dtype=np.int64, count=len(self.overrides))
+        self._count = int((self.dir_idx >= 0).sum()) + len(self.overrides)
+
+    @classmethod
+    def from_dict(cls, id2path):
+        size = max((int(k) for k in id2path), default=-1) + 1
+        dir_idx = np.full(size, -1, dtype=np.int32)
+        frames = np.zeros(size, dtype=np.int64)
+        dirs, widths, exts, overrides = [], [], [], {}
+        dir_lookup = {}
+        for key, path in id2path.items():
+            image_id = int(key)
+            directory, name = os.path.split(path)
+            stem, ext = os.path.splitext(name)
+            d = dir_lookup.get(directory)
+            if d is None and stem.isdigit():
+                d = dir_lookup[directory] = len(dirs)
+                dirs.append(directory)
+                widths.append(len(stem))
+                exts.append(ext)
+            # The frame number must format back to exactly the same file name
+            if d is not None and stem.isdigit() and ext == exts[d] and f"{int(stem):0{widths[d]}d}" == stem:
+                dir_idx[image_id] = d
+                frames[image_id] = int(stem)
+            else:
+                overrides[image_id] = path
+        return cls(dirs, widths, exts, dir_idx, frames, overrides)
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, image_id):
+        return self.get(image_id) is not None
+
+    def __getitem__(self, image_id):
+        path = self.get(image_id)
+        if path is None:
+            raise KeyError(image_id)
+        return path
+
+    def __iter__(self):
+        return iter(self.keys().tolist())
+
+    def get(self, image_id, default=None):
+        image_id = int(image_id)
+        if 0 <= image_id < len(self.dir_idx):
+            d = self.dir_idx[image_id]
+            if d >= 0:
+                return f"{self._prefixes[d]}{self.frames[image_id]:0{self.widths[d]}d}{self.exts[d]}"
+        return self.overrides.get(image_id, default)
+
+    def keys(self):
+        """Sorted int64 array of every id with a path."""
+        ids = np.flatnonzero(self.dir_idx >= 0)
+        if self.overrides:
+            ids = np.union1d(ids, self._override_ids)
+        return ids.astype(np.int64)
+
+    def items(self):
+        for image_id in self.keys().tolist():
+            yield image_id, self.get(image_id)
+
+    def valid(self, ids):
+        """Boolean mask of the ids (e.g. FAISS results, -1 for empty slots) that have a path."""
+        ids = np.asarray(ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self.dir_idx))
+        mask = np.zeros(ids.shape, dtype=bool)
+        mask[in_range] = self.dir_idx[ids[in_range]] >= 0
+        if self.overrides:
+            mask |= np.isin(ids, self._override_ids)
+        return mask
+
+    def paths(self, ids):
+        """Paths of valid `ids` as a list of str."""
+        ids = np.asarray(ids, dtype=np.int64)
+        in_range = (ids >= 0) & (ids < len(self.dir_idx))
+        dir_idx = np.full(ids.shape, -1, dtype=np.int32)
+        dir_idx[in_range] = self.dir_idx[ids[in_range]]
+        frames = self.frames[np.where(in_range, ids, 0)] if len(self.frames) else np.zeros(ids.shape, dtype=np.int64)
+        prefixes, widths, exts = self._prefixes, self.widths.tolist(), self.exts
+        return [f"{prefixes[d]}{f:0{widths[d]}d}{exts[d]}" if d >= 0 else self.overrides[i]
+                for i, d, f in zip(ids.tolist(), dir_idx.tolist(), frames.tolist())]
+
+    def columns(self, start, stop):
+        """
+        Ids in [start, stop) in columnar form for the browse API: a small table of the
+        directories they use plus per-id directory index and frame number (no path strings).
+        """
+        start = max(0, int(start))
+        stop = max(start, int(stop))
+        ids = np.arange(start, min(stop, len(self.dir_idx)), dtype=np.int64)
+        dir_idx = self.dir_idx[start:start + len(ids)]
+        regular = dir_idx >= 0
+        used, local_idx = np.unique(dir_idx[regular], return_inverse=True)
+        overrides = {i: p for i, p in self.overrides.items() if start <= i < stop}
+        return {
+            "videos": [self.dirs[d] for d in used.tolist()],
+            "widths": self.widths[used].tolist(),
+            "exts": [self.exts[d] for d in used.tolist()],
+            "ids": ids[regular].tolist(),
+            "video_idx": local_idx.astype(np.int32).tolist(),
+            "frames": self.frames[start:start + len(ids)][regular].tolist(),
+            "overrides": {str(i): p for i, p in sorted(overrides.items())},
+        }
+
+    @property
+    def id_bound(self):
+        """One past the largest id (ids live in [0, id_bound))."""
+        return len(self.dir_idx)
@@ -0,0 +1,174 @@
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+
+def normalize_query(text):
+    """Cache key of a query: lowercased with collapsed whitespace (CLIP and Translation lowercase anyway)."""
+    return " ".join(text.lower().split())
+
+
+class QueryCache:
+    """
+    Two-level cache for text queries: normalized query -> translation and
+    normalized query -> CLIP text embedding.
+
+    Level 1 is an in-process LRU (`max_memory_items` entries); level 2 is a SQLite file
+    that survives restarts and is shared by every worker process (`max_disk_items` rows
+    per table, least recently used rows are evicted). Embeddings are namespaced by the
+    CLIP backbone so switching models never returns stale vectors.
+
+    Disk reads do not write: a hit only queues a new access time when the stored one is older
+    than `touch_after` seconds, and queued times are written with the next insert. A locked or
+    busy database (several workers on one file) is treated as a miss / a memory-only insert.
+    """
+    TABLES = ("translation", "embedding")
+
+    def __init__(self, path=None, namespace="", max_memory_items=4096, max_disk_items=200000, touch_after=3600.0):
+        self.namespace = namespace
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+        self.touch_after = touch_after
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # the SQLite connection is used by one thread at a time, without holding the memory lock
+        self._disk_lock = threading.Lock()
+        self._touched = {table: {} for table in self.TABLES}  # key -> access time not written yet
+        self._counters = {table: {"memory_hits": 0, "disk_hits": 0, "misses": 0} for table in self.TABLES}
+        self._evictions = {"memory": 0, "disk": 0}
+        self._disk_errors = 0
+        self._disk = None
+        if path is not None:
+            self._open(path)
+
+    def _open(self, path):
+        self._disk = sqlite3.connect(path, timeout=5.0, check_same_thread=False)
+        try:
+            # WAL is persistent: when another worker holds the lock it has usually set it already
+            self._disk.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            print(f"[Myfaiss] Could not switch the query cache database to WAL ({e})")
+        try:
+            for table in self.TABLES:
+                self._disk.execute(f"CREATE TABLE IF NOT EXISTS {table} "
+                                   f"(key TEXT PRIMARY KEY, value BLOB NOT NULL, used REAL NOT NULL)")
+                self._disk.execute(f"CREATE INDEX IF NOT EXISTS {table}_used ON {table}(used)")
+            self._disk.commit()
+            self._disk_counts = {table: self._count(table) for table in self.TABLES}
+        except sqlite3.OperationalError as e:
+            self._disk.close()
+            self._disk = None
+            self._disk_error(e)
+
+    def get_translation(self, query):
+        value = self._get("translation", normalize_query(query))
+        return None if value is None else value.decode("utf-8") if isinstance(value, bytes) else value
+
+    def put_translation(self, query, translated):
+        self._put("translation", normalize_query(query), translated, translated.encode("utf-8"))
+
+    def get_embedding(self, query):
+        value = self._get("embedding", self.namespace + "\0" + normalize_query(query))
+        if isinstance(value, bytes):
+            value = np.frombuffer(value, dtype=np.float32)
+        return value
+
+    def put_embedding(self, query, embedding):
+        embedding = np.ascontiguousarray(embedding, dtype=np.float32).reshape(-1)
+        self._put("embedding", self.namespace + "\0" + normalize_query(query), embedding, embedding.tobytes())
+
+    def stats(self):
+        with self._lock:
+            stats = {table: dict(counters) for table, counters in self._counters.items()}
+            for table, counters in stats.items():
+                lookups = sum(counters.values())
+                counters["hit_rate"] = (counters["memory_hits"] + counters["disk_hits"]) / lookups if lookups else 0.0
+            stats["memory_items"] = len(self._memory)
+            stats["disk_items"] = dict(self._disk_counts) if self._disk is not None else None
+            stats["evictions"] = dict(self._evictions)
+            stats["disk_errors"] = self._disk_errors
+            return stats
+
+    def _get(self, table, key):
+        with self._lock:
+            value = self._memory.get((table, key))
+            if value is not None:
+                self._memory.move_to_end((table, key))
+                self._counters[table]["memory_hits"] += 1
+                return value
+        if self._disk is not None:
+            now = time.time()
+            try:
+                with self._disk_lock:
+                    row = self._disk.execute(f"SELECT value, used FROM {table} WHERE key = ?", (key,)).fetchone()
+                    if row is not None and now - row[1] > self.touch_after:
+                        self._touched[table][key] = now
+            except sqlite3.OperationalError as e:
+                row = None
+                self._disk_error(e)
+            if row is not None:
+                value = bytes(row[0])
+                with self._lock:
+                    self._counters[table]["disk_hits"] += 1
+                    self._remember(table, key, value)
+                return value
+        with self._lock:
+            self._counters[table]["misses"] += 1
+        return None
+
+    def _put(self, table, key, value, blob):
+        with self._lock:
+            self._remember(table, key, value)
+        if self._disk is None:
+            return
+        try:
+            with self._disk_lock:
+                self._write_touched()
+                cursor = self._disk.execute(f"INSERT OR REPLACE INTO {table} (key, value, used) VALUES (?, ?, ?)",
+                                            (key, blob, time.time()))
+                count = self._disk_counts[table] + cursor.rowcount
+                evicted = 0
+                if count > self.max_disk_items:
+                    # Evict the least recently used 10% at once so eviction does not run on every insert
+                    count = self._count(table)
+                    evicted = max(0, count - int(self.max_disk_items * 0.9))
+                    if evicted:
+                        self._disk.execute(f"DELETE FROM {table} WHERE key IN "
+                                           f"(SELECT key FROM {table} ORDER BY used LIMIT ?)", (evicted,))
+                        count -= evicted
+                self._disk.commit()
+                # Only what was committed: a rolled-back transaction keeps the queued access times
+                for touched in self._touched.values():
+                    touched.clear()
+                self._disk_counts[table] = count
+            if evicted:
+                with self._lock:
+                    self._evictions["disk"] += evicted
+        except sqlite3.OperationalError as e:
+            self._disk.rollback()
+            self._disk_error(e)
+
+    def _write_touched(self):
+        # Called with self._disk_lock held, inside the insert's transaction; _put clears the queue after the commit
+        for table, touched in self._touched.items():
+            if touched:
+                self._disk.executemany(f"UPDATE {table} SET used = ? WHERE key = ?",
+                                       [(used, key) for key, used in touched.items()])
+
+    def _disk_error(self, error):
+        with self._lock:
+            self._disk_errors += 1
+        print(f"[Myfaiss] Query cache database unavailable ({error}), using the memory cache only")
+
+    def _remember(self, table, key, value):
+        self._memory[(table, key)] = value
+        self._memory.move_to_end((table, key))
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self._evictions["memory"] += 1
+
+    def _count(self, table):
+        return self._disk.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
@@ -1,22 +1,138 @@
 from pyvi import ViUtils, ViTokenizer
-import googletrans
-import translate
 from difflib import SequenceMatcher
-from langdetect import detect
 import underthesea
+import asyncio
+import inspect
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+
+class TranslationTimeout(Exception):
+    pass
+
+
+class TranslationBackend():
+    """Interface of a translation backend: translate() is required, atranslate() defaults to a thread."""
+    name = "base"
+
+    def translate(self, text, from_lang, to_lang):
+        raise NotImplementedError
+
+    async def atranslate(self, text, from_lang, to_lang):
+        return await asyncio.to_thread(self.translate, text, from_lang, to_lang)
+
+
+class GoogleTransBackend(TranslationBackend):
+    name = "googletrans"
+
+    def __init__(self):
+        import googletrans
+        self.translator = googletrans.Translator()
+
+    def translate(self, text, from_lang, to_lang):
+        result = self.translator.translate(text, src=from_lang, dest=to_lang)
+        # googletrans >= 4 returns a coroutine
+        if inspect.isawaitable(result):
+            result = asyncio.run(result)
+        return result.text
+
+    async def atranslate(self, text, from_lang, to_lang):
+        result = self.translator.translate(text, src=from_lang, dest=to_lang)
+        if inspect.isawaitable(result):
+            return (await result).text
+        return result.text
+
+
+class TranslatePackageBackend(TranslationBackend):
+    name = "translate"
+
+    def __init__(self, from_lang='vi', to_lang='en'):
+        import translate
+        self.translator = translate.Translator(from_lang=from_lang, to_lang=to_lang)
+
+    def translate(self, text, from_lang, to_lang):
+        return self.translator.translate(text)
+
+
+class DictionaryBackend(TranslationBackend):
+    """
+    Offline backend: greedy longest-phrase lookup in a vi->en dictionary (a dict, or a JSON / TSV file).
+    Words that are not in the dictionary are kept as they are.
+    """
+    name = "dictionary"
+
+    def __init__(self, dictionary=None, max_phrase_words=4):
+        if isinstance(dictionary, str):
+            dictionary = self.load(dictionary)
+        self.dictionary = {k.lower(): v for k, v in (dictionary or {}).items()}
+        self.max_phrase_words = max_phrase_words
+
+    @staticmethod
+    def load(path):
+        with open(path, encoding="utf-8") as f:
+            if path.endswith(".json"):
+                return json.load(f)
+            pairs = (line.rstrip("\n").split("\t", 1) for line in f if "\t" in line)
+            return {src: dst for src, dst in pairs}
+
+    def translate(self, text, from_lang, to_lang):
+        words = re.findall(r"\w+|[^\w\s]", text.lower())
+        out = []
+        i = 0
+        while i < len(words):
+            for n in range(min(self.max_phrase_words, len(words) - i), 0, -1):
+                phrase = " ".join(words[i:i + n])
+                if phrase in self.dictionary:
+                    out.append(self.dictionary[phrase])
+                    i += n
+                    break
+            else:
+                out.append(words[i])
+                i += 1
+        return " ".join(out)
+
+
+class IdentityBackend(TranslationBackend):
+    """Stand-in backend that searches the untranslated text."""
+    name = "none"
+
+    def translate(self, text, from_lang, to_lang):
+        return text
+
+
+# Shared by all Translation instances: a hung upstream can only tie up these threads
+_TRANSLATION_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="translate")
 
 
 class Translation():
-    def __init__(self, from_lang='vi', to_lang='en', mode='google'):
-        # The class Translation is a wrapper for the two translation libraries, googletrans and translate. 
+    def __init__(self, from_lang='vi', to_lang='en', mode='google', timeout=3.0, fallback='source', backend=None,
+                 ascii_fallback=True):
+        # The class Translation is a wrapper around a TranslationBackend (googletrans, translate, an offline
+        # dictionary or none). Each call is bounded by `timeout` seconds; when the backend is slow or fails,
+        # `fallback` decides what happens: 'source' returns the untranslated text, 'raise' raises
+        # TranslationTimeout, or another TranslationBackend (e.g. DictionaryBackend) is tried instead.
+        # `ascii_fallback` lets is_vietnamese treat multi-word ASCII queries as Vietnamese without diacritics.
         self.__mode = mode
         self.__from_lang = from_lang
         self.__to_lang = to_lang
-
-        if mode in 'googletrans':
-            self.translator = googletrans.Translator()
+        self.timeout = timeout
+        self.fallback = fallback
+        self.ascii_fallback = ascii_fallback
+
+        if backend is not None:
+            self.backend = backend
+        elif mode in 'googletrans':
+            self.backend = GoogleTransBackend()
         elif mode in 'translate':
-            self.translator = translate.Translator(from_lang=from_lang,to_lang=to_lang)
+            self.backend = TranslatePackageBackend(from_lang=from_lang, to_lang=to_lang)
+        elif mode == 'dictionary':
+            self.backend = DictionaryBackend()
+        elif mode == 'none':
+            self.backend = IdentityBackend()
+        else:
+            raise ValueError(f"Unknown translation mode {mode!r}")
 
     def preprocessing(self, text):
 
@@ -24,9 +140,46 @@ class Translation():
 
     def __call__(self, text):
 
+        return self.translate_with_status(text)[0]
+
+    def translate_with_status(self, text):
+        """Returns (translation, ok); ok is False when the fallback produced the text."""
+        text = self.preprocessing(text)
+        future = _TRANSLATION_POOL.submit(self.backend.translate, text, self.__from_lang, self.__to_lang)
+        try:
+            return future.result(timeout=self.timeout), True
+        except Exception as e:
+            future.cancel()
+            return self._fallback(text, e), False
+
+    async def atranslate(self, text):
         text = self.preprocessing(text)
-        return self.translator.translate(text) if self.__mode in 'translate' \
-                else self.translator.translate(text, dest=self.__to_lang).text
+        try:
+            return await asyncio.wait_for(self.backend.atranslate(text, self.__from_lang, self.__to_lang), self.timeout)
+        except Exception as e:
+            return self._fallback(text, e)
+
+    def _fallback(self, text, error):
+        print(f"[Translation] {self.backend.name} failed or timed out ({error!r}), fallback: {getattr(self.fallback, 'name', self.fallback)}")
+        if self.fallback == 'raise':
+            raise TranslationTimeout(str(error)) from error
+        if isinstance(self.fallback, TranslationBackend):
+            return self.fallback.translate(text, self.__from_lang, self.__to_lang)
+        return text
+
+def translation_from_env():
+    """
+    Translation configured from the environment: TRANSLATION_BACKEND (googletrans | translate | dictionary | none),
+    TRANSLATION_TIMEOUT (seconds), TRANSLATION_DICT (offline vi -> en dictionary, also used as fallback)
+    and TRANSLATION_ASCII_FALLBACK (0 searches ASCII-only queries as English, see is_vietnamese).
+    """
+    mode = os.getenv("TRANSLATION_BACKEND", "google")
+    offline_dict = DictionaryBackend(os.getenv("TRANSLATION_DICT")) if os.getenv("TRANSLATION_DICT") else None
+    return Translation(mode=mode,
+                       timeout=float(os.getenv("TRANSLATION_TIMEOUT", "3")),
+                       fallback=offline_dict or "source",
+                       backend=offline_dict if mode == "dictionary" else None,
+                       ascii_fallback=os.getenv("TRANSLATION_ASCII_FALLBACK", "1") != "0")
 
 class Text_Preprocessing():
     def __init__(self, stopwords_path='./dict/vietnamese-stopwords-dash.txt'):
@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def _unit(vectors):
+    vectors = np.asarray(vectors, dtype=np.float32)
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=-1, keepdims=True), 1e-12)
+
+
+def rocchio(query=None, positives=(), negatives=(), alpha=1.0, beta=0.75, gamma=0.15):
+    """
+    Rocchio relevance feedback on CLIP vectors:
+        q' = alpha * q + beta * mean(positives) - gamma * mean(negatives)
+    computed on unit vectors (so one long vector does not dominate), then scaled back to the
+    norm of the original query (or of the positives when there is no query), which keeps the
+    result usable against L2 indexes of raw CLIP vectors as well as inner-product ones.
+    Returns a (1, dim) float32 query.
+    """
+    positives = np.asarray(positives, dtype=np.float32)
+    negatives = np.asarray(negatives, dtype=np.float32)
+    parts = []
+    if query is not None:
+        query = np.asarray(query, dtype=np.float32).reshape(-1)
+        parts.append(alpha * _unit(query))
+        norm = np.linalg.norm(query)
+    elif len(positives):
+        norm = float(np.linalg.norm(positives, axis=1).mean())
+    else:
+        raise ValueError("Refinement needs a query or at least one positive example")
+    if len(positives):
+        parts.append(beta * _unit(positives).mean(axis=0))
+    if len(negatives):
+        parts.append(-gamma * _unit(negatives).mean(axis=0))
+    refined = np.sum(parts, axis=0)
+    return (_unit(refined) * norm).reshape(1, -1).astype(np.float32)
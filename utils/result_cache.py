@@ -0,0 +1,137 @@
+import secrets
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+# Rough per-entry bookkeeping cost on top of the arrays
+ENTRY_OVERHEAD_BYTES = 512
+
+
+class CachedRanking:
+    """One cursor: the query vector, its search settings and the ranking fetched so far."""
+    __slots__ = ("vector", "params", "ranking", "exhausted", "expires", "lock")
+
+    def __init__(self, vector, params, ids, scores, exhausted, expires):
+        self.vector = vector
+        self.params = params
+        # (ids, scores) replaced as one tuple, so readers never see ids and scores of different depths
+        self.ranking = (ids, scores)
+        self.exhausted = exhausted
+        self.expires = expires
+        self.lock = threading.Lock()
+
+    @property
+    def ids(self):
+        return self.ranking[0]
+
+    @property
+    def scores(self):
+        return self.ranking[1]
+
+    @property
+    def depth(self):
+        return len(self.ranking[0])
+
+    @property
+    def nbytes(self):
+        return self.vector.nbytes + self.ids.nbytes + self.scores.nbytes + ENTRY_OVERHEAD_BYTES
+
+
+class ResultCache:
+    """
+    Server-side search rankings behind opaque cursor ids, so result pages are slices of a cached
+    ranking instead of new searches. Bounded by total bytes (LRU eviction) and by a TTL that
+    restarts on every access. Each entry keeps its query vector, so reading past the cached depth
+    re-runs only the index search with a larger k (no CLIP encode, no translation).
+    """
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=900.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._expired = 0
+        self._evicted = 0
+        self._extended = 0
+
+    def put(self, vector, ids, scores, params=None, exhausted=False):
+        """Cache a ranking and return its cursor id."""
+        entry = CachedRanking(np.asarray(vector, dtype=np.float32).reshape(-1), params,
+                              np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float32),
+                              exhausted, time.monotonic() + self.ttl)
+        cursor = secrets.token_urlsafe(12)
+        with self._lock:
+            self._entries[cursor] = entry
+            self._bytes += entry.nbytes
+            self._evict()
+        return cursor
+
+    def get(self, cursor):
+        """The cached ranking of `cursor`, or None when it expired or was evicted."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(cursor)
+            if entry is None:
+                return None
+            if entry.expires < now:
+                self._drop(cursor)
+                self._expired += 1
+                return None
+            entry.expires = now + self.ttl
+            self._entries.move_to_end(cursor)
+            self._hits += 1
+            return entry
+
+    def ensure_depth(self, cursor, entry, depth, search):
+        """
+        Make `entry` hold at least `depth` results (unless the index has no more): `search(k)`
+        returns (ids, scores) of the same query at depth k. Only hits not already cached are
+        appended, so pages a client has seen keep their order even if the deeper (approximate)
+        search ranks the top differently. Concurrent readers of one cursor wait for a single extension.
+        """
+        with entry.lock:
+            if entry.exhausted or entry.depth >= depth:
+                return entry
+            ids, scores = search(depth)
+            ids, scores = np.asarray(ids, dtype=np.int64), np.asarray(scores, dtype=np.float32)
+            old_ids, old_scores = entry.ranking
+            new = ~np.isin(ids, old_ids)
+            with self._lock:
+                before = entry.nbytes
+                entry.ranking = (np.concatenate([old_ids, ids[new]]), np.concatenate([old_scores, scores[new]]))
+                entry.exhausted = len(ids) < depth
+                self._extended += 1
+                if cursor in self._entries:
+                    self._bytes += entry.nbytes - before
+                    self._evict()
+            return entry
+
+    def _drop(self, cursor):
+        entry = self._entries.pop(cursor)
+        self._bytes -= entry.nbytes
+
+    def _evict(self):
+        # Called with self._lock held; drops expired entries first, then least recently used ones
+        now = time.monotonic()
+        for cursor in [c for c, e in self._entries.items() if e.expires < now]:
+            self._drop(cursor)
+            self._expired += 1
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            self._drop(next(iter(self._entries)))
+            self._evicted += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cursors": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl,
+                "hits": self._hits,
+                "extended": self._extended,
+                "expired": self._expired,
+                "evicted": self._evicted,
+            }
@@ -0,0 +1,288 @@
+import itertools
+import queue
+import socket
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, TimeoutError
+
+import numpy as np
+
+from utils.executor import QueueFull
+from utils.embedding_store import VectorNotFound
+from utils.search_protocol import FRAME, check_sizes, decode_frame, encode_frame, parse_address
+
+
+class SearchServerError(RuntimeError):
+    pass
+
+
+def _recv_exact(sock, n):
+    buf = bytearray(n)
+    view = memoryview(buf)
+    while n:
+        got = sock.recv_into(view[len(buf) - n:], n)
+        if got == 0:
+            raise ConnectionError("search server closed the connection")
+        n -= got
+    return bytes(buf)
+
+
+class _Connection:
+    """
+    One socket with a writer and a reader thread; requests are pipelined and matched to futures by id.
+    Connecting and sending run on the writer thread, so send() never blocks the caller (e.g. an
+    event loop). Requests still unanswered after `timeout` seconds fail with TimeoutError.
+    """
+    def __init__(self, address, timeout):
+        self.address = address
+        self.timeout = timeout
+        self.sock = None
+        self.pending = {}  # request id -> (future, deadline)
+        self.lock = threading.Lock()
+        self.alive = True
+        self.outbox = queue.SimpleQueue()
+        self.writer = threading.Thread(target=self._write_loop, name="search-client-send", daemon=True)
+        self.writer.start()
+
+    def _connect(self):
+        family, target = parse_address(self.address)
+        if family == "unix":
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        else:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            sock.settimeout(self.timeout)
+            sock.connect(target)
+            sock.settimeout(None)
+        except OSError:
+            sock.close()
+            raise
+        return sock
+
+    def send(self, request_id, frame, future):
+        with self.lock:
+            if not self.alive:
+                raise ConnectionError("connection to search server is closed")
+            self.pending[request_id] = (future, time.monotonic() + self.timeout)
+        self.outbox.put(frame)
+
+    def discard(self, request_id):
+        """Forget a request the caller gave up on; a late answer is dropped."""
+        with self.lock:
+            self.pending.pop(request_id, None)
+
+    def _write_loop(self):
+        try:
+            sock = self._connect()
+            with self.lock:
+                if not self.alive:
+                    sock.close()
+                    return
+                self.sock = sock
+            threading.Thread(target=self._read_loop, name="search-client", daemon=True).start()
+            next_expiry = time.monotonic() + 1.0
+            while self.alive:
+                try:
+                    frame = self.outbox.get(timeout=1.0)
+                except queue.Empty:
+                    frame = None
+                if frame is not None and self.alive:
+                    sock.sendall(frame)
+                if time.monotonic() >= next_expiry:
+                    self._expire()
+                    next_expiry = time.monotonic() + 1.0
+        except Exception as e:
+            with self.lock:
+                self._fail(e if isinstance(e, ConnectionError) else ConnectionError(f"search server: {e}"))
+
+    def _expire(self):
+        now = time.monotonic()
+        with self.lock:
+            expired = [request_id for request_id, (_, deadline) in self.pending.items() if deadline <= now]
+            futures = [self.pending.pop(request_id)[0] for request_id in expired]
+        for future in futures:
+            if not future.done():
+                future.set_exception(TimeoutError(f"search server did not answer within {self.timeout}s"))
+
+    def _read_loop(self):
+        try:
+            while True:
+                head_len, body_len = FRAME.unpack(_recv_exact(self.sock, FRAME.size))
+                check_sizes(head_len, body_len)
+                header, arrays = decode_frame(_recv_exact(self.sock, head_len), _recv_exact(self.sock, body_len))
+                with self.lock:
+                    future, _ = self.pending.pop(header.get("id"), (None, None))
+                if future is not None and not future.done():
+                    future.set_result((header, arrays))
+        except Exception as e:
+            with self.lock:
+                self._fail(e if isinstance(e, ConnectionError) else ConnectionError(str(e)))
+
+    def _fail(self, error):
+        # Called with self.lock held
+        self.alive = False
+        pending, self.pending = self.pending, {}
+        for future, _ in pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self.outbox.put(None)  # wake the writer
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+
+    def close(self):
+        with self.lock:
+            self._fail(ConnectionError("client closed"))
+
+
+class SearchClient:
+    """
+    Thin client of search_server.py with the Myfaiss search API (text_search, image_search,
+    batch_search, get_vectors, ...) and the SearchBatcher submit/stats API, so web workers do not
+    load CLIP or the index themselves. Keeps `pool_size` connections open (reconnecting lazily)
+    and pipelines requests on each of them.
+    """
+    query_cache = None
+
+    def __init__(self, address, pool_size=4, timeout=30.0):
+        self.address = address
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self._connections = [None] * self.pool_size
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._next = itertools.count()
+
+    def _connection(self):
+        slot = next(self._next) % self.pool_size
+        with self._lock:
+            conn = self._connections[slot]
+            if conn is None or not conn.alive:
+                conn = self._connections[slot] = _Connection(self.address, self.timeout)
+            return conn
+
+    def call_async(self, op, args=None, arrays=(), unpack=None) -> Future:
+        """
+        Future of (result, arrays) of one server op, or of unpack(result, arrays).
+        Cancelling it (e.g. a cancelled asyncio.wrap_future) drops the pending request.
+        """
+        request_id = next(self._ids)
+        raw = Future()
+        result = Future()
+
+        def finish(done):
+            try:
+                header, out_arrays = done.result()
+                if not header.get("ok"):
+                    raise self._server_error(header)
+                value = (header.get("result"), out_arrays)
+                if unpack is not None:
+                    value = unpack(*value)
+            except Exception as e:
+                settle, value = result.set_exception, e
+            else:
+                settle = result.set_result
+            try:
+                settle(value)
+            except InvalidStateError:
+                pass  # cancelled by the caller meanwhile
+
+        raw.add_done_callback(finish)
+        frame = encode_frame({"id": request_id, "op": op, "args": args or {}}, arrays)
+        conn = self._connection()
+        conn.send(request_id, frame, raw)
+        result.add_done_callback(lambda done: done.cancelled() and conn.discard(request_id))
+        return result
+
+    @staticmethod
+    def _server_error(header):
+        if header.get("error_type") == "QueueFull":
+            return QueueFull(header.get("error"))
+        if header.get("error_type") == "VectorNotFound":
+            return VectorNotFound(header.get("error"))
+        return SearchServerError(f"{header.get('error_type')}: {header.get('error')}")
+
+    def _wait(self, future):
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def call(self, op, args=None, arrays=()):
+        return self._wait(self.call_async(op, args, arrays))
+
+    @staticmethod
+    def _unpack_results(result, arrays):
+        """Server hits -> the Myfaiss tuples ([scores], ids, infos, paths), one per query."""
+        tuples = []
+        for i, paths in enumerate(result["paths"]):
+            scores, ids = arrays[2 * i], arrays[2 * i + 1]
+            tuples.append(([scores], ids, paths, paths))
+        return tuples
+
+    @staticmethod
+    def _image_array(image):
+        image = np.asarray(image.convert("RGB") if hasattr(image, "convert") else image)
+        return np.ascontiguousarray(image, dtype=np.uint8)
+
+    # SearchBatcher API (the server batches concurrent requests from every web worker)
+    @staticmethod
+    def _filter_args(id_filter):
+        return {"filter": id_filter._asdict()} if id_filter is not None else {}
+
+    def submit(self, kind, query, k, nprobe=None, ef_search=None, id_filter=None) -> Future:
+        args = {"k": int(k), "nprobe": nprobe, "ef_search": ef_search, **self._filter_args(id_filter)}
+        arrays = ()
+        if kind == "text":
+            args["texts"] = [query]
+        elif kind == "image_id":
+            args["image_ids"] = [int(query)]
+        elif kind == "image":
+            arrays = (self._image_array(query),)
+        else:
+            raise ValueError(f"Unknown query kind {kind!r}")
+        return self.call_async("search", args, arrays,
+                               unpack=lambda result, out_arrays: self._unpack_results(result, out_arrays)[0])
+
+    def stats(self):
+        return self.call("stats")[0]
+
+    # Myfaiss API
+    def text_search(self, text, k, nprobe=None, ef_search=None, id_filter=None):
+        return self._wait(self.submit("text", text, k, nprobe, ef_search, id_filter))
+
+    def image_search(self, query, k, is_path=True, nprobe=None, ef_search=None, id_filter=None):
+        return self._wait(self.submit("image_id" if is_path else "image", query, k, nprobe, ef_search, id_filter))
+
+    def batch_search(self, texts=(), image_ids=(), images=(), k=100, nprobe=None, ef_search=None, id_filter=None):
+        args = {"texts": list(texts), "image_ids": [int(i) for i in image_ids], "k": int(k),
+                "nprobe": nprobe, "ef_search": ef_search, **self._filter_args(id_filter)}
+        return self._unpack_results(*self.call("batch_search", args, [self._image_array(im) for im in images]))
+
+    def vector_search(self, query_feats, k=100, nprobe=None, ef_search=None, id_filter=None):
+        args = {"k": int(k), "nprobe": nprobe, "ef_search": ef_search, **self._filter_args(id_filter)}
+        feats = np.ascontiguousarray(query_feats, dtype=np.float32)
+        return self._unpack_results(*self.call("vector_search", args, (feats.reshape(len(feats), -1),)))
+
+    def encode_texts(self, texts):
+        return self.call("encode_texts", {"texts": list(texts)})[1][0]
+
+    def encode_images(self, images):
+        return self.call("encode_images", arrays=[self._image_array(im) for im in images])[1][0]
+
+    def get_vectors(self, ids):
+        return self.call("get_vectors", arrays=(np.asarray(ids, dtype=np.int64).reshape(-1),))[1][0]
+
+    def index_info(self):
+        return self.call("index_info")[0]
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                if conn is not None:
+                    conn.close()
+            self._connections = [None] * self.pool_size
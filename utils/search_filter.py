@@ -0,0 +1,133 @@
+import bisect
+import os
+import threading
+from collections import OrderedDict, namedtuple
+
+import faiss
+import numpy as np
+
+from utils.index_factory import exact_search, filtered_effort, search_parameters, uses_inner_product
+
+# Hashable restriction of a search (requests with equal filters can share one index.search):
+# videos: tuple of video names, prefix: video name prefix (e.g. "L21_"), id_range: (start, stop)
+SearchFilter = namedtuple("SearchFilter", "videos prefix id_range")
+
+# Filters allowing at most this fraction of the index (and this many ids) are searched exactly
+# over the allowed ids' stored vectors: IVF / HNSW only filter the lists probed / nodes visited
+EXACT_FILTER_FRACTION = 0.1
+EXACT_FILTER_MAX_IDS = 200000
+
+
+def make_filter(videos=None, prefix=None, id_range=None):
+    """SearchFilter from request fields (lists / JSON accepted), or None when nothing is filtered."""
+    videos = tuple(sorted(set(videos))) if videos else None
+    prefix = prefix or None
+    if id_range is not None:
+        start, stop = (int(v) for v in id_range)
+        if stop <= start:
+            raise ValueError(f"Empty id range [{start}, {stop})")
+        id_range = (max(start, 0), stop)
+    if videos is None and prefix is None and id_range is None:
+        return None
+    return SearchFilter(videos, prefix, id_range)
+
+
+class VideoIdRanges:
+    """
+    Video name -> image ids, precomputed once from the PathTable (video = keyframe folder name),
+    turning a SearchFilter into a FAISS IDSelector (IDSelectorRange for a plain id range,
+    otherwise an IDSelectorBitmap over all ids) and the sorted array of allowed ids used by
+    filtered_search. Both are cached for recent filters.
+    """
+    def __init__(self, path_table, cache_size=32):
+        self.id_bound = path_table.id_bound
+        dir_of = path_table.dir_idx
+        order = np.argsort(dir_of, kind="stable")
+        bounds = np.searchsorted(dir_of[order], np.arange(len(path_table.dirs) + 1))
+        by_name = {}
+        for d, directory in enumerate(path_table.dirs):
+            ids = order[bounds[d]:bounds[d + 1]]
+            if len(ids):
+                by_name.setdefault(os.path.basename(directory), []).append(ids)
+        self._ids = {name: np.sort(np.concatenate(parts)) for name, parts in by_name.items()}
+        self.names = sorted(self._ids)
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    def videos_with_prefix(self, prefix):
+        lo = bisect.bisect_left(self.names, prefix)
+        hi = bisect.bisect_left(self.names, prefix + "\uffff")
+        return self.names[lo:hi]
+
+    def mask(self, search_filter):
+        """Boolean mask over ids [0, id_bound) of the ids `search_filter` allows."""
+        mask = np.zeros(self.id_bound, dtype=bool)
+        if search_filter.videos is None and search_filter.prefix is None:
+            mask[:] = True
+        else:
+            names = set(search_filter.videos or ())
+            if search_filter.prefix is not None:
+                names.update(self.videos_with_prefix(search_filter.prefix))
+            for name in names:
+                ids = self._ids.get(name)
+                if ids is not None:
+                    mask[ids] = True
+        if search_filter.id_range is not None:
+            start, stop = search_filter.id_range
+            mask[:min(start, self.id_bound)] = False
+            mask[min(stop, self.id_bound):] = False
+        return mask
+
+    def selector(self, search_filter):
+        """FAISS IDSelector for `search_filter`. Keep the returned object alive during the search."""
+        return self._entry(search_filter)[0]
+
+    def ids(self, search_filter):
+        """Sorted ids (< id_bound) that `search_filter` allows."""
+        return self._entry(search_filter)[1]
+
+    def _entry(self, search_filter):
+        with self._lock:
+            entry = self._cache.get(search_filter)
+            if entry is not None:
+                self._cache.move_to_end(search_filter)
+                return entry
+        if search_filter.videos is None and search_filter.prefix is None:
+            start, stop = search_filter.id_range
+            selector = faiss.IDSelectorRange(start, stop)
+            ids = np.arange(min(start, self.id_bound), min(stop, self.id_bound), dtype=np.int64)
+        else:
+            mask = self.mask(search_filter)
+            bits = np.packbits(mask, bitorder="little")
+            selector = faiss.IDSelectorBitmap(len(bits), faiss.swig_ptr(bits))
+            selector.bits_ref = bits  # the selector does not own its bitmap
+            ids = np.flatnonzero(mask).astype(np.int64)
+        entry = (selector, ids)
+        with self._lock:
+            self._cache[search_filter] = entry
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return entry
+
+
+def filtered_search(index, queries, k, selector, allowed_ids, nprobe=None, ef_search=None, read=None):
+    """
+    index.search restricted to `allowed_ids`, returning k hits whenever that many ids are allowed.
+    `read(ids)` gives the stored vectors as the index holds them (None: no embedding store).
+    Selective filters (see EXACT_FILTER_FRACTION) are searched exactly over the allowed vectors;
+    otherwise the index is searched with the selector and nprobe / efSearch raised by
+    filtered_effort, and rows that still come back short are redone exactly.
+    """
+    inner_product = uses_inner_product(index)
+    exact_ok = read is not None and len(allowed_ids) <= EXACT_FILTER_MAX_IDS
+    selectivity = len(allowed_ids) / max(index.ntotal, 1)
+    if exact_ok and selectivity <= EXACT_FILTER_FRACTION:
+        return exact_search(queries, allowed_ids, read, k, inner_product)
+    nprobe, ef_search = filtered_effort(index, nprobe, ef_search, k, selectivity)
+    scores, ids = index.search(queries, k=k, params=search_parameters(index, nprobe, ef_search, selector))
+    if exact_ok:
+        short = (ids >= 0).sum(axis=1) < min(k, len(allowed_ids))
+        if short.any():
+            scores[short], ids[short] = exact_search(queries[short], allowed_ids, read, k, inner_product)
+    return scores, ids
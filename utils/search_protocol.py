@@ -0,0 +1,54 @@
+import json
+import struct
+
+import numpy as np
+
+# Wire format shared by search_server.py and utils/search_client.py. Every message is one frame:
+#   !II header length, body length | JSON header | body
+# The header carries the request id, op / result and the dtype + shape of each array; the body is
+# the raw bytes of those arrays back to back (scores, ids, query vectors, images), so nothing
+# numeric goes through JSON. Ids let a connection pipeline many requests and get answers out of order.
+FRAME = struct.Struct("!II")
+MAX_HEADER_BYTES = 16 * 1024 * 1024
+MAX_BODY_BYTES = 512 * 1024 * 1024
+
+
+def encode_frame(header, arrays=()):
+    arrays = [np.ascontiguousarray(a) for a in arrays]
+    header = dict(header, arrays=[[a.dtype.str, list(a.shape)] for a in arrays])
+    head = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    body = b"".join(a.tobytes() for a in arrays)
+    return FRAME.pack(len(head), len(body)) + head + body
+
+
+def check_sizes(head_len, body_len):
+    if head_len > MAX_HEADER_BYTES or body_len > MAX_BODY_BYTES:
+        raise ValueError(f"Frame too large ({head_len} + {body_len} bytes)")
+
+
+def decode_frame(head, body):
+    """(header dict, list of numpy arrays) from the two parts of a frame."""
+    header = json.loads(head)
+    arrays = []
+    offset = 0
+    for dtype, shape in header.pop("arrays", []):
+        dtype = np.dtype(dtype)
+        if dtype.hasobject:
+            raise ValueError("Object arrays are not allowed")
+        size = dtype.itemsize * int(np.prod(shape, dtype=np.int64))
+        arrays.append(np.frombuffer(body, dtype=dtype, count=size // dtype.itemsize if dtype.itemsize else 0,
+                                    offset=offset).reshape(shape))
+        offset += size
+    if offset != len(body):
+        raise ValueError("Frame body does not match its array list")
+    return header, arrays
+
+
+def parse_address(address):
+    """"unix:/path/to.sock" or "/path/to.sock" -> ("unix", path); "host:port" / ":port" -> ("tcp", (host, port))."""
+    if address.startswith("unix:"):
+        return "unix", address[len("unix:"):]
+    if address.startswith("/") or address.endswith(".sock"):
+        return "unix", address
+    host, _, port = address.rpartition(":")
+    return "tcp", (host or "127.0.0.1", int(port))
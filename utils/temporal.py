@@ -0,0 +1,100 @@
+import numpy as np
+
+
+def _similarity(scores):
+    """FAISS scores of one ranked list as higher-is-better values (L2 distances are negated)."""
+    scores = np.asarray(scores, dtype=np.float32)
+    if len(scores) > 1 and scores[0] < scores[-1]:
+        return -scores
+    return scores
+
+
+class _RangeArgmax:
+    """Sparse table: position of the maximum of values[lo:hi] for many (lo, hi) at once, O(n log n) build."""
+    def __init__(self, values):
+        self.values = values
+        self.levels = [np.arange(len(values))]
+        width = 1
+        while 2 * width <= len(values):
+            prev = self.levels[-1]
+            a, b = prev[:-width], prev[width:]
+            self.levels.append(np.where(values[a] >= values[b], a, b))
+            width *= 2
+
+    def query(self, lo, hi):
+        """argmax positions for non-empty ranges lo < hi."""
+        out = np.empty(len(lo), dtype=np.int64)
+        level = np.floor(np.log2(np.maximum(hi - lo, 1))).astype(np.int64)
+        for j in np.unique(level):
+            sel = level == j
+            table = self.levels[j]
+            a, b = table[lo[sel]], table[hi[sel] - (1 << int(j))]
+            out[sel] = np.where(self.values[a] >= self.values[b], a, b)
+        return out
+
+
+def temporal_join(candidates, video_idx, pts, max_gap, k=100, min_gap=0.0):
+    """
+    Best ordered sequences over per-clause search results.
+
+    `candidates`: one (ids, scores) per clause, in query order. `video_idx` / `pts` map an image
+    id to its video and timestamp (KeyframeIndex arrays). A sequence picks one hit per clause,
+    all in the same video, each strictly later than the previous one by more than `min_gap` and
+    at most `max_gap` seconds. Sequences are ranked by the sum of per-step similarities
+    (cosine scores, or negated L2 distances); the per-step scores returned are the FAISS ones.
+    Each last-step hit yields at most one sequence (its best chain).
+
+    Each step is a dynamic-programming pass: the previous step's chains are sorted by
+    (video, time), every new hit finds its time window with searchsorted and takes the best
+    chain in it from a range-max table, so a join over thousands of hits is a few array ops.
+    Returns (ids, step_scores, totals) with shapes (n, clauses), (n, clauses), (n,), best first.
+    """
+    video_idx = np.asarray(video_idx)
+    pts = np.asarray(pts, dtype=np.float64)
+    num_steps = len(candidates)
+    step_ids, step_scores, back = [], [], []
+    chain = None
+    for step, (ids, scores) in enumerate(candidates):
+        ids = np.asarray(ids, dtype=np.int64)
+        raw = np.asarray(scores, dtype=np.float32)
+        sims = _similarity(raw)
+        known = (ids >= 0) & (ids < len(video_idx))
+        known[known] = video_idx[ids[known]] >= 0
+        ids, sims, raw = ids[known], sims[known], raw[known]
+        # order hits of this step by (video, time)
+        order = np.lexsort((pts[ids], video_idx[ids]))
+        ids, sims, raw = ids[order], sims[order], raw[order]
+        if step == 0:
+            chain = sims.astype(np.float64)
+            prev = np.full(len(ids), -1, dtype=np.int64)
+        else:
+            prev_ids = step_ids[-1]
+            span = (pts.max() if len(pts) else 0.0) + max_gap + 1.0
+            # one sortable key per hit: video block + time, so a window never crosses videos
+            prev_key = video_idx[prev_ids] * span + pts[prev_ids]
+            key = video_idx[ids] * span + pts[ids]
+            lo = np.searchsorted(prev_key, key - max_gap, side="left")
+            hi = np.searchsorted(prev_key, key - min_gap, side="left")
+            ok = hi > lo
+            prev = np.full(len(ids), -1, dtype=np.int64)
+            if ok.any() and len(chain):
+                prev[ok] = _RangeArgmax(chain).query(lo[ok], hi[ok])
+            ids, sims, raw, prev = ids[ok], sims[ok], raw[ok], prev[ok]
+            chain = chain[prev] + sims
+        step_ids.append(ids)
+        step_scores.append(raw)
+        back.append(prev)
+        if len(ids) == 0:
+            break
+    if len(step_ids) < num_steps or len(step_ids[-1]) == 0:
+        empty = np.empty((0, num_steps))
+        return empty.astype(np.int64), empty.astype(np.float32), np.empty(0)
+    best = np.argsort(-chain, kind="stable")[:k]
+    out_ids = np.empty((len(best), num_steps), dtype=np.int64)
+    out_scores = np.empty((len(best), num_steps), dtype=np.float32)
+    pos = best
+    for step in range(num_steps - 1, -1, -1):
+        out_ids[:, step] = step_ids[step][pos]
+        out_scores[:, step] = step_scores[step][pos]
+        pos = back[step][pos]
+    return out_ids, out_scores, chain[best]
@@ -0,0 +1,101 @@
+import glob
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image, features
+
+# Longest edge in pixels of each variant: small for result / browse grids, medium for previews
+THUMB_SIZES = {
+    "small": 320,
+    "medium": 720,
+}
+
+
+class ThumbnailCache:
+    """
+    On-disk cache of downscaled keyframes, keyed by image id and source file mtime.
+
+    Files live in <root>/<size>/<id // 1000>/<id>_<mtime_ns>.<ext>, so a re-extracted keyframe
+    gets a new file and the stale one is removed when it is regenerated. Thumbnails are built
+    lazily on first request (get) or ahead of time for the whole catalog (build_all).
+    WebP is used when Pillow supports it, JPEG otherwise.
+    """
+    def __init__(self, id2img_fps, root="thumbnails", fmt=None, quality=80):
+        self.id2img_fps = id2img_fps
+        self.root = root
+        if fmt is None:
+            fmt = "webp" if features.check("webp") else "jpeg"
+        self.fmt = fmt.lower()
+        self.ext = "jpg" if self.fmt == "jpeg" else self.fmt
+        self.media_type = f"image/{self.fmt}"
+        self.quality = quality
+
+    def _path(self, image_id, size, mtime_ns):
+        return os.path.join(self.root, size, str(image_id // 1000), f"{image_id}_{mtime_ns}.{self.ext}")
+
+    def get(self, image_id, size="small"):
+        """Path of the thumbnail of `image_id`, generated if missing or stale; None if the id / source is unknown."""
+        if size not in THUMB_SIZES:
+            raise ValueError(f"Unknown thumbnail size {size!r}, expected one of {sorted(THUMB_SIZES)}")
+        image_id = int(image_id)
+        source = self.id2img_fps.get(image_id)
+        if source is None:
+            return None
+        try:
+            mtime_ns = os.stat(source).st_mtime_ns
+        except OSError:
+            return None
+        path = self._path(image_id, size, mtime_ns)
+        if not os.path.exists(path):
+            self._generate(source, path, THUMB_SIZES[size])
+        return path
+
+    def _generate(self, source, path, max_side):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        with Image.open(source) as image:
+            # JPEG: let the decoder downscale by 1/2, 1/4 or 1/8 instead of decoding full resolution
+            image.draft("RGB", (max_side, max_side))
+            image = image.convert("RGB")
+            image.thumbnail((max_side, max_side), Image.BILINEAR)
+            # Write next to the target and rename, so concurrent requests never serve a partial file
+            fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    image.save(f, format=self.fmt.upper(), quality=self.quality)
+                os.replace(tmp_path, path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+        # Drop variants of older versions of the same keyframe
+        prefix = os.path.basename(path).rsplit("_", 1)[0]
+        for stale in glob.glob(os.path.join(directory, f"{prefix}_*.{self.ext}")):
+            if stale != path:
+                try:
+                    os.unlink(stale)
+                except OSError:
+                    pass
+
+    def build_all(self, ids=None, sizes=tuple(THUMB_SIZES), num_workers=8, verbose=True):
+        """Generate every missing / stale thumbnail with a thread pool; returns the number of failures."""
+        from tqdm import tqdm
+        if ids is None:
+            ids = self.id2img_fps.keys()
+        jobs = [(int(image_id), size) for image_id in ids for size in sizes]
+        failed = 0
+        with ThreadPoolExecutor(max_workers=max(1, num_workers), thread_name_prefix="thumb") as pool:
+            results = pool.map(self._build_one, jobs)
+            for ok in tqdm(results, total=len(jobs), desc="Thumbnails", unit="img", disable=not verbose):
+                failed += not ok
+        if verbose:
+            print(f"[Myfaiss] Thumbnails ready in {self.root} ({len(jobs) - failed}/{len(jobs)}, {failed} failed)")
+        return failed
+
+    def _build_one(self, job):
+        image_id, size = job
+        try:
+            return self.get(image_id, size) is not None
+        except Exception as e:
+            print(f"[Myfaiss] Error creating {size} thumbnail of {image_id}: {e}")
+            return False
@@ -0,0 +1,142 @@
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+
+
+def probe_video(path):
+    """fps, frame count, duration and size read from the container (one VideoCapture open)."""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            return None
+        fps = cap.get(cv2.CAP_PROP_FPS)
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return {
+            "fps": fps,
+            "frame_count": frame_count,
+            "duration": frame_count / fps if fps > 0 else 0,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+    finally:
+        cap.release()
+
+
+class VideoCatalog:
+    """
+    Video name -> {path, fps, frame_count, duration, width, height}, scanned once over all video
+    folders and persisted to `cache_path`. On refresh, files whose size and mtime did not change
+    reuse the stored metadata, so only new or replaced videos are opened with OpenCV.
+    When a name is in several folders the first folder wins (same order as before).
+    """
+    def __init__(self, folders, cache_path="video_catalog.json", extensions=(".mp4",), num_workers=8):
+        self.folders = list(folders)
+        self.cache_path = cache_path
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.num_workers = max(1, num_workers)
+        self._videos = {}
+        self._refresh_lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        if self.cache_path and os.path.exists(self.cache_path):
+            try:
+                with open(self.cache_path, encoding="utf-8") as f:
+                    self._videos = json.load(f).get("videos", {})
+            except (OSError, ValueError) as e:
+                print(f"[Myfaiss] Ignoring unreadable video catalog {self.cache_path}: {e}")
+
+    def _save(self, videos):
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"folders": self.folders, "videos": videos}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def _scan_folder(self, folder):
+        found = []
+        try:
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    name, ext = os.path.splitext(entry.name)
+                    if ext.lower() in self.extensions and entry.is_file():
+                        st = entry.stat()
+                        found.append((name, entry.path, st.st_size, st.st_mtime_ns))
+        except OSError:
+            pass
+        return found
+
+    def refresh(self):
+        """Rescan every folder in parallel, probe new / changed videos, persist; returns scan stats."""
+        with self._refresh_lock:
+            began = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=self.num_workers, thread_name_prefix="video-scan") as pool:
+                per_folder = list(pool.map(self._scan_folder, self.folders))
+                files = {}
+                for found in per_folder:
+                    for name, path, size, mtime_ns in found:
+                        files.setdefault(name, (path, size, mtime_ns))
+
+                old = self._videos
+                videos = {}
+                to_probe = []
+                for name, (path, size, mtime_ns) in files.items():
+                    cached = old.get(name)
+                    if cached and cached.get("path") == path and cached.get("size") == size \
+                            and cached.get("mtime_ns") == mtime_ns:
+                        videos[name] = cached
+                    else:
+                        to_probe.append((name, path, size, mtime_ns))
+                for (name, path, size, mtime_ns), info in zip(to_probe, pool.map(lambda t: probe_video(t[1]), to_probe)):
+                    if info is not None:
+                        videos[name] = {"path": path, "size": size, "mtime_ns": mtime_ns, **info}
+            self._videos = videos
+            self._save(videos)
+            return {
+                "videos": len(videos),
+                "probed": len(to_probe),
+                "reused": len(videos) - sum(1 for t in to_probe if t[0] in videos),
+                "removed": len(set(old) - set(videos)),
+                "seconds": time.perf_counter() - began,
+            }
+
+    def get(self, name, probe_missing=True):
+        """Metadata of one video; a name not seen by the last scan is looked up on disk once and added."""
+        info = self._videos.get(name)
+        if info is not None or not probe_missing:
+            return info
+        for folder in self.folders:
+            for ext in self.extensions:
+                path = os.path.join(folder, name + ext)
+                if os.path.isfile(path):
+                    probed = probe_video(path)
+                    if probed is None:
+                        return None
+                    st = os.stat(path)
+                    info = {"path": path, "size": st.st_size, "mtime_ns": st.st_mtime_ns, **probed}
+                    videos = dict(self._videos)
+                    videos[name] = info
+                    self._videos = videos
+                    return info
+        return None
+
+    def path(self, name):
+        info = self.get(name)
+        return info["path"] if info else None
+
+    def get_many(self, names, probe_missing=False):
+        return {name: self.get(name, probe_missing) for name in names}
+
+    def names(self):
+        return sorted(self._videos)
+
+    def __len__(self):
+        return len(self._videos)
+
+    def __contains__(self, name):
+        return name in self._videos
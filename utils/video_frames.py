@@ -0,0 +1,181 @@
+import threading
+from collections import OrderedDict
+
+import cv2
+
+from utils.executor import QueueFull
+
+# Reading forward this many frames is cheaper than a seek (which decodes from the previous keyframe anyway)
+FORWARD_READ_LIMIT = 64
+
+
+class _Handle:
+    __slots__ = ("cap", "position", "fps", "frame_count")
+
+    def __init__(self, path):
+        self.cap = cv2.VideoCapture(path)
+        self.position = 0
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 0.0
+        self.frame_count = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+
+
+class CapturePool:
+    """
+    Bounded pool of open cv2.VideoCapture handles, LRU-evicted, for decoding single frames or
+    short bursts at a frame number / timestamp.
+
+    A handle remembers the next frame it will decode; a request at or a little past that
+    position reads forward instead of seeking, so scrubbing around one result neither reopens
+    the file nor seeks again. A handle is used by one request at a time; concurrent reads of
+    the same video open a second handle. At most `max_handles` are open: an idle handle of
+    another video is closed to make room, and when all are busy a request waits up to
+    `wait_timeout` seconds for one, then raises QueueFull.
+    """
+    def __init__(self, max_handles=16, forward_read_limit=FORWARD_READ_LIMIT, wait_timeout=10.0):
+        self.max_handles = max(1, max_handles)
+        self.forward_read_limit = forward_read_limit
+        self.wait_timeout = wait_timeout
+        self._idle = OrderedDict()  # (path, serial) -> _Handle, least recently used first
+        self._busy = 0
+        self._serial = 0
+        self._lock = threading.Lock()
+        self._released = threading.Condition(self._lock)  # a handle went idle or was closed
+        self._opens = 0
+        self._seeks = 0
+        self._forward_reads = 0
+
+    def _checkout(self, path, target):
+        evicted = None
+        with self._lock:
+            while True:
+                best = None
+                for key, handle in self._idle.items():
+                    if key[0] != path:
+                        continue
+                    distance = target - handle.position
+                    # prefer a handle that can read forward to the target, closest first
+                    rank = distance if 0 <= distance <= self.forward_read_limit else self.forward_read_limit + 1
+                    if best is None or rank < best[0]:
+                        best = (rank, key)
+                if best is not None:
+                    self._busy += 1
+                    return self._idle.pop(best[1])
+                if len(self._idle) + self._busy < self.max_handles:
+                    break
+                if self._idle:
+                    # reuse the slot of the least recently used idle handle (another video)
+                    evicted = self._idle.popitem(last=False)[1]
+                    break
+                if not self._released.wait_for(
+                        lambda: self._idle or len(self._idle) + self._busy < self.max_handles, self.wait_timeout):
+                    raise QueueFull(f"all {self.max_handles} video handles are busy")
+            self._busy += 1
+            self._opens += 1
+        if evicted is not None:
+            evicted.cap.release()
+        handle = None
+        try:
+            handle = _Handle(path)
+            if handle.cap.isOpened():
+                return handle
+            handle.cap.release()
+            handle = None
+        finally:
+            if handle is None:
+                with self._lock:
+                    self._busy -= 1
+                    self._released.notify()
+        return None
+
+    def _checkin(self, path, handle):
+        evicted = []
+        with self._lock:
+            self._busy -= 1
+            self._serial += 1
+            self._idle[(path, self._serial)] = handle
+            while self._idle and len(self._idle) + self._busy > self.max_handles:
+                evicted.append(self._idle.popitem(last=False)[1])
+            self._released.notify()
+        for old in evicted:
+            old.cap.release()
+
+    def read(self, path, frame=None, seconds=None, count=1, step=1):
+        """
+        Decode `count` frames starting at `frame` (or at `seconds`), `step` frames apart.
+        Returns (fps, [(frame_idx, BGR array), ...]) or None when the video cannot be opened.
+        """
+        step = max(1, int(step))
+        target = max(0, int(frame or 0))
+        handle = self._checkout(path, target if seconds is None else 0)
+        if handle is None:
+            return None
+        frames = []
+        moves = {"seeks": 0, "forward_reads": 0}
+        ok = False
+        try:
+            if seconds is not None:
+                target = max(0, int(round(float(seconds) * handle.fps))) if handle.fps > 0 else 0
+            if handle.frame_count > 0:
+                target = min(target, handle.frame_count - 1)
+            for i in range(max(1, int(count))):
+                image = self._read_at(handle, target + i * step, moves)
+                if image is None:
+                    break
+                frames.append((target + i * step, image))
+            ok = True
+        finally:
+            with self._lock:
+                self._seeks += moves["seeks"]
+                self._forward_reads += moves["forward_reads"]
+            if ok:
+                self._checkin(path, handle)
+            else:
+                # a handle that failed mid-read is dropped instead of being returned to the pool
+                handle.cap.release()
+                with self._lock:
+                    self._busy -= 1
+                    self._released.notify()
+        return handle.fps, frames
+
+    def _read_at(self, handle, target, moves):
+        distance = target - handle.position
+        if 0 <= distance <= self.forward_read_limit:
+            for _ in range(distance):
+                if not handle.cap.grab():
+                    return None
+            moves["forward_reads"] += 1
+        else:
+            handle.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+            moves["seeks"] += 1
+        ok, image = handle.cap.read()
+        if not ok:
+            handle.position = -self.forward_read_limit - 1  # unknown, force a seek next time
+            return None
+        handle.position = target + 1
+        return image
+
+    def stats(self):
+        with self._lock:
+            return {
+                "open_handles": len(self._idle) + self._busy,
+                "busy_handles": self._busy,
+                "max_handles": self.max_handles,
+                "opens": self._opens,
+                "seeks": self._seeks,
+                "forward_reads": self._forward_reads,
+            }
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, OrderedDict()
+        for handle in idle.values():
+            handle.cap.release()
+
+
+def encode_jpeg(image, width=None, quality=90):
+    """BGR frame -> JPEG bytes, downscaled to `width` (aspect kept) when it is narrower than the frame."""
+    if width and image.shape[1] > width:
+        height = max(1, int(round(image.shape[0] * width / image.shape[1])))
+        image = cv2.resize(image, (int(width), height), interpolation=cv2.INTER_AREA)
+    ok, buf = cv2.imencode(".jpg", image, [cv2.IMWRITE_JPEG_QUALITY, int(min(max(quality, 10), 100))])
+    return buf.tobytes() if ok else None